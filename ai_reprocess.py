@@ -1,6 +1,6 @@
 import asyncio
 import json
-import aiohttp
+from http_clients import pooled_aiohttp_session
 from concept_graph import build_graph
 
 async def ai_reprocess_nodes(note_text, current_nodes, analysis_type='bridges', ai_provider=None, 
@@ -172,7 +172,7 @@ async def _call_openai_api(prompt, api_key, model=None):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -197,7 +197,7 @@ async def _call_openrouter_api(prompt, api_key, model=None):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -220,7 +220,7 @@ async def _call_google_api(prompt, api_key, model=None):
         }
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -246,7 +246,7 @@ async def _call_groq_api(prompt, api_key, model=None):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -265,7 +265,7 @@ async def _call_lmstudio_api(prompt, model, host, port):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -284,7 +284,7 @@ async def _call_ollama_api(prompt, model, host, port):
         "options": {"temperature": 0.1, "num_predict": 800}
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -402,7 +402,7 @@ async def _call_openai_generic(prompt, api_key, model=None):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -426,7 +426,7 @@ async def _call_openrouter_generic(prompt, api_key, model=None):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -445,7 +445,7 @@ async def _call_google_generic(prompt, api_key, model=None):
         "generationConfig": {"maxOutputTokens": 2000, "temperature": 0.1}
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -469,7 +469,7 @@ async def _call_groq_generic(prompt, api_key, model=None):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -490,7 +490,7 @@ async def _call_lmstudio_generic(prompt, model, host, port):
         "temperature": 0.1
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -511,7 +511,7 @@ async def _call_ollama_generic(prompt, model, host, port):
         "options": {"temperature": 0.1}
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
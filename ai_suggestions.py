@@ -4,7 +4,7 @@ AI Suggestions module for generating bridge concepts, knowledge gaps, and explor
 """
 import asyncio
 import json
-import aiohttp
+from http_clients import pooled_aiohttp_session
 from typing import List, Dict, Any, Optional
 
 async def generate_ai_suggestions(note_text: str, current_nodes: List[Dict], 
@@ -289,7 +289,7 @@ async def _call_openai_api(prompt: str, api_key: str, model: str = None) -> Opti
         "temperature": 0.7
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -316,7 +316,7 @@ async def _call_openrouter_api(prompt: str, api_key: str, model: str = None) ->
         "temperature": 0.7
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -341,7 +341,7 @@ async def _call_google_api(prompt: str, api_key: str, model: str = None) -> Opti
         }
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -370,7 +370,7 @@ async def _call_groq_api(prompt: str, api_key: str, model: str = None) -> Option
         "temperature": 0.7
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -393,7 +393,7 @@ async def _call_lmstudio_api(prompt: str, model: str, host: str, port: int) -> O
         "temperature": 0.7
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -416,7 +416,7 @@ async def _call_ollama_api(prompt: str, model: str, host: str, port: int) -> Opt
         "options": {"temperature": 0.7}
     }
     
-    async with aiohttp.ClientSession() as session:
+    async with pooled_aiohttp_session() as session:
         async with session.post(url, headers=headers, json=data) as response:
             if response.status == 200:
                 result = await response.json()
@@ -3,7 +3,7 @@ let authToken = '';
 let currentUser = '';
 let isAdmin = false;
 
-const TRANSCRIPTION_PROVIDERS = ['openai', 'local', 'sensevoice'];
+const TRANSCRIPTION_PROVIDERS = ['openai', 'local', 'sensevoice', 'remote'];
 const POSTPROCESS_PROVIDERS = ['openai', 'google', 'openrouter', 'groq', 'lmstudio', 'ollama'];
 let allowedTranscriptionProviders = [];
 let allowedPostprocessProviders = [];
@@ -14,6 +14,7 @@ const PROVIDER_LABELS = {
     openai: 'OpenAI',
     local: 'Local Whisper',
     sensevoice: 'SenseVoice',
+    remote: 'Remote workers',
     google: 'Google',
     openrouter: 'OpenRouter',
     groq: 'Groq',
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+WhisPad async runtime
+One long-lived asyncio event loop on a dedicated thread. Flask handlers hand
+it coroutines with submit() and block until they finish, so aiohttp
+sessions, semaphores and caches created on the loop survive from one
+request to the next instead of being torn down with a per-request loop.
+"""
+
+import os
+import atexit
+import asyncio
+import threading
+import logging
+import concurrent.futures
+from typing import Any, Awaitable, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """Background event loop with a thread-safe submit() bridge"""
+
+    def __init__(self, name: str = 'whispad-async'):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.submitted = 0
+        self.active = 0
+        self.failed = 0
+        self.timed_out = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._limits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # The loop thread does not survive fork(); a forked worker starts its own
+            if self.loop is None or self._pid != os.getpid() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self.loop = loop
+                self._pid = os.getpid()
+                self._semaphores = {}
+                self._limits = {}
+            return self.loop
+
+    def submit(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the loop and wait for its result.
+
+        Raises:
+            concurrent.futures.TimeoutError: when it does not finish within
+                timeout; the coroutine is cancelled
+            RuntimeError: when called from the loop thread, which would deadlock
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError('submit() called from the async runtime thread; await the coroutine instead')
+        with self._lock:
+            self.submitted += 1
+            self.active += 1
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def semaphore(self, key: str, limit: int) -> asyncio.Semaphore:
+        """
+        Loop-wide semaphore shared by every request, e.g. to cap concurrent
+        calls to one provider. Call it from coroutines running on the loop.
+        """
+        with self._lock:
+            semaphore = self._semaphores.get(key)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(limit)
+                self._semaphores[key] = semaphore
+                self._limits[key] = limit
+            return semaphore
+
+    def stop(self, timeout: float = 5):
+        """Close the loop's pooled HTTP session and stop the loop"""
+        with self._lock:
+            loop, thread = self.loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self.loop = None
+        try:
+            from http_clients import close_async_session
+            asyncio.run_coroutine_threadsafe(close_async_session(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Could not close async HTTP session: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.loop is not None and self._pid == os.getpid(),
+                "active": self.active,
+                "submitted": self.submitted,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "semaphores": {key: {"limit": self._limits[key], "saturated": s.locked()}
+                               for key, s in self._semaphores.items()},
+            }
+
+
+_async_runtime = None
+
+
+def get_async_runtime() -> AsyncRuntime:
+    """Get the global runtime; its loop starts on first use"""
+    global _async_runtime
+    if _async_runtime is None:
+        _async_runtime = AsyncRuntime()
+        atexit.register(_async_runtime.stop)
+    return _async_runtime
+
+
+def run_async(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared loop from synchronous code"""
+    return get_async_runtime().submit(coro, timeout)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+WhisPad shared audio decode stage
+Pipes uploaded audio through ffmpeg stdin/stdout into a 16 kHz mono float32
+NumPy buffer that whisper.cpp, SenseVoice and pyannote consume directly.
+"""
+
+import io
+import os
+import hashlib
+import subprocess
+import tempfile
+import threading
+import wave
+import logging
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sample rate expected by whisper.cpp, SenseVoice and pyannote
+SAMPLE_RATE = 16000
+
+
+class AudioDecodeError(Exception):
+    """Raised when audio bytes cannot be decoded to PCM"""
+
+
+def _ffmpeg_decode_cmd(source: str, sample_rate: int) -> list:
+    return [
+        'ffmpeg',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-i', source,
+        '-f', 'f32le',          # Raw little-endian float32 samples
+        '-acodec', 'pcm_f32le',
+        '-ac', '1',             # Mono audio
+        '-ar', str(sample_rate),
+        'pipe:1',
+    ]
+
+
+def decode_audio_bytes(audio_bytes: bytes, sample_rate: int = SAMPLE_RATE,
+                       timeout: float = 300) -> np.ndarray:
+    """
+    Decode any ffmpeg-readable audio to mono float32 PCM without touching disk
+
+    Args:
+        audio_bytes: Encoded audio (webm, ogg, mp3, wav, ...)
+        sample_rate: Target sample rate
+
+    Returns:
+        1-D float32 array with samples in [-1, 1]
+    """
+    if not audio_bytes:
+        raise AudioDecodeError("Empty audio data")
+
+    try:
+        result = subprocess.run(
+            _ffmpeg_decode_cmd('pipe:0', sample_rate),
+            input=audio_bytes,
+            capture_output=True,
+            timeout=timeout,
+        )
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError("Audio decoding timed out")
+
+    if result.returncode == 0 and result.stdout:
+        return np.frombuffer(result.stdout, dtype=np.float32)
+
+    # Containers that keep their index at the end (e.g. some mp4/m4a files)
+    # cannot be demuxed from a non-seekable pipe; only those pay for a file.
+    logger.warning(f"Piped decode failed ({result.stderr.decode(errors='replace')[:200]}), retrying from a seekable file")
+    with tempfile.NamedTemporaryFile(suffix='.audio', delete=False) as temp_file:
+        temp_file.write(audio_bytes)
+        temp_path = temp_file.name
+    try:
+        result = subprocess.run(
+            _ffmpeg_decode_cmd(temp_path, sample_rate),
+            capture_output=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError("Audio decoding timed out")
+    finally:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+    if result.returncode != 0 or not result.stdout:
+        raise AudioDecodeError(f"ffmpeg could not decode audio: {result.stderr.decode(errors='replace')[:500]}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def pcm_to_int16(pcm: np.ndarray) -> np.ndarray:
+    """Convert float32 PCM in [-1, 1] to int16 samples"""
+    return (np.clip(pcm, -1.0, 1.0) * 32767).astype('<i2')
+
+
+def pcm_from_bytes(data: bytes, sample_format: str = 's16') -> np.ndarray:
+    """Raw little-endian samples (s16 or f32) as float32 PCM in [-1, 1]"""
+    width = 4 if sample_format == 'f32' else 2
+    if len(data) % width:
+        raise ValueError(f'{sample_format} audio must be a whole number of samples')
+    if sample_format == 'f32':
+        return np.frombuffer(data, dtype='<f4').astype(np.float32)
+    return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def pcm_to_wav_bytes(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Encode float32 PCM as an in-memory 16-bit mono WAV file"""
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm_to_int16(pcm).tobytes())
+    return buf.getvalue()
+
+
+def silence_aligned_windows(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                            max_seconds: float = 60, search_seconds: float = 5,
+                            frame_seconds: float = 0.1) -> list:
+    """
+    Split samples into windows of at most max_seconds, cutting each window at
+    the quietest frame of its last search_seconds so words are not split.
+
+    Returns:
+        List of (start, end) sample indices covering the whole buffer
+    """
+    total = len(pcm)
+    window = int(max_seconds * sample_rate)
+    if total <= window:
+        return [(0, total)]
+
+    windows = []
+    start = 0
+    while total - start > window:
+        cut = find_silence_cut(pcm, start, start + window, sample_rate, search_seconds, frame_seconds)
+        windows.append((start, cut))
+        start = cut
+    windows.append((start, total))
+    return windows
+
+
+def find_silence_cut(pcm: np.ndarray, start: int, limit: int, sample_rate: int = SAMPLE_RATE,
+                     search_seconds: float = 5, frame_seconds: float = 0.1) -> int:
+    """Sample index of the quietest frame in the last search_seconds before limit"""
+    frame = max(1, int(frame_seconds * sample_rate))
+    search = max(frame, int(search_seconds * sample_rate))
+    region = pcm[max(start, limit - search):limit]
+    n_frames = len(region) // frame
+    if not n_frames:
+        return limit
+    energy = np.square(region[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    return limit - len(region) + int(np.argmin(energy)) * frame + frame // 2
+
+
+def probe_duration(path: str, timeout: float = 30) -> Optional[float]:
+    """Container duration in seconds according to ffprobe, or None if unknown"""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, timeout=timeout,
+        )
+        return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def stream_pcm_chunks(path: str, chunk_seconds: float = 30, sample_rate: int = SAMPLE_RATE,
+                      search_seconds: float = 5, read_seconds: float = 1) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Decode a file with a single ffmpeg process and yield silence-aligned
+    chunks as soon as they are available. Only about one chunk of samples is
+    held in memory regardless of the recording length.
+
+    Yields:
+        (offset in samples, float32 PCM of the chunk)
+    """
+    try:
+        process = subprocess.Popen(
+            _ffmpeg_decode_cmd(path, sample_rate),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    stderr_tail = []
+    drain = threading.Thread(target=lambda: stderr_tail.append(process.stderr.read()), daemon=True)
+    drain.start()
+
+    target = max(1, int(chunk_seconds * sample_rate))
+    read_bytes = max(4, int(read_seconds * sample_rate) * 4)
+    buffer = np.empty(0, dtype=np.float32)
+    leftover = b''
+    offset = 0
+    try:
+        while True:
+            data = process.stdout.read(read_bytes)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 4
+            leftover = data[usable:]
+            buffer = np.concatenate([buffer, np.frombuffer(data[:usable], dtype=np.float32)])
+            while len(buffer) >= target:
+                cut = find_silence_cut(buffer, 0, target, sample_rate, search_seconds)
+                yield offset, buffer[:cut].copy()
+                buffer = buffer[cut:]
+                offset += cut
+        process.wait()
+        drain.join()
+        if process.returncode != 0 and not offset and not len(buffer):
+            stderr = (stderr_tail[0] if stderr_tail else b'').decode(errors='replace')
+            raise AudioDecodeError(f"ffmpeg could not decode audio: {stderr[:500]}")
+        if len(buffer):
+            yield offset, buffer
+    finally:
+        # Also reached when the consumer stops early (e.g. client disconnect)
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+class AudioArtifact:
+    """
+    One uploaded recording, decoded at most once and shared by every stage
+    of a request (transcription, diarization and WAV archiving).
+    """
+
+    def __init__(self, audio_bytes: bytes, filename: str = "audio.wav",
+                 sample_rate: int = SAMPLE_RATE):
+        self.audio_bytes = audio_bytes
+        self.filename = filename
+        self.sample_rate = sample_rate
+        self.content_hash = hashlib.sha256(audio_bytes).hexdigest()
+        self.wav_hash = None  # SHA-256 of the archived WAV, set by write_wav
+        self._pcm = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_pcm(cls, pcm: np.ndarray, filename: str = "audio.wav",
+                 sample_rate: int = SAMPLE_RATE) -> 'AudioArtifact':
+        """Wrap samples that were already decoded (e.g. a chunk of a longer file)"""
+        artifact = cls(pcm_to_wav_bytes(pcm, sample_rate), filename, sample_rate)
+        artifact._pcm = pcm
+        return artifact
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._pcm is not None
+
+    @property
+    def pcm(self) -> np.ndarray:
+        """Decoded mono float32 samples; decoding happens on first access"""
+        if self._pcm is None:
+            with self._lock:
+                if self._pcm is None:
+                    self._pcm = decode_audio_bytes(self.audio_bytes, self.sample_rate)
+        return self._pcm
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds"""
+        return len(self.pcm) / self.sample_rate
+
+    def wav_bytes(self) -> bytes:
+        """16-bit mono WAV encoding of the decoded samples"""
+        return pcm_to_wav_bytes(self.pcm, self.sample_rate)
+
+    def write_wav(self, path: str):
+        """Write the decoded samples to a WAV file"""
+        data = self.wav_bytes()
+        self.wav_hash = hashlib.sha256(data).hexdigest()
+        with open(path, 'wb') as wav_file:
+            wav_file.write(data)
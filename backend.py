@@ -5,6 +5,8 @@ import io
 import zipfile
 import re
 import requests
+import http_clients
+from async_runtime import run_async, get_async_runtime
 import json
 import time
 from dotenv import load_dotenv
@@ -17,6 +19,14 @@ from markdownify import markdownify
 from bs4 import BeautifulSoup
 from whisper_cpp_wrapper import WhisperCppWrapper
 from sensevoice_wrapper import get_sensevoice_wrapper
+from audio_decode import AudioArtifact, stream_pcm_chunks, probe_duration, pcm_to_int16, pcm_from_bytes, SAMPLE_RATE
+from transcription_pipeline import StagePipeline, TranscriptionProgress
+from transcription_cache import get_transcription_cache, TranscriptionCache
+from model_registry import get_model_registry
+from job_queue import get_job_queue, QueueFullError, FINISHED_STATES
+from model_warmup import get_model_warmup, configured_models, warmup_pcm
+from provider_registry import get_provider_registry
+from sensevoice_streaming import StreamSessionManager
 
 # Optional import for speaker diarization
 try:
@@ -27,6 +37,13 @@ except ImportError as e:
     SPEAKER_DIARIZATION_AVAILABLE = False
     def get_speaker_diarization_wrapper():
         return None
+from diarization_store import get_diarization_store
+from compute_scheduler import get_compute_scheduler
+from voice_activity import SpeechTimeline
+from inference_server import get_inference_client, diarize_pcm
+from remote_transcription import get_remote_worker_pool
+
+DIARIZATION_ENGINES = ('pyannote', 'fast')
 
 try:
     from mermaid import Mermaid
@@ -40,7 +57,6 @@ except Exception as e:  # noqa: F401
 from concept_graph import build_graph, build_concept_graph
 import ast
 import string
-from pydub import AudioSegment
 
 def extract_json(text: str):
     """Try to extract and parse a JSON object from raw text."""
@@ -69,6 +85,11 @@ def extract_json(text: str):
         except Exception:
             return None
 import threading
+import queue
+import wave
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------- Path utilities ----------
 def sanitize_filename(filename: str) -> str:
@@ -109,6 +130,9 @@ OLLAMA_HOST = os.getenv('OLLAMA_HOST', '127.0.0.1')
 OLLAMA_PORT = os.getenv('OLLAMA_PORT', '11434')
 # Enable or disable multi-user support (default True)
 MULTI_USER = os.getenv('MULTI_USER', 'true').lower() != 'false'
+# Web worker processes serving this app (set by gunicorn.conf.py); state that
+# must be seen by every worker lives in the database or on disk
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '1'))
 
 def load_server_config():
     """Load host/port settings from database if available."""
@@ -137,6 +161,15 @@ def save_server_config():
 
 # Load persisted config if present
 load_server_config()
+_server_config_loaded_at = time.time()
+
+@app.before_request
+def refresh_server_config():
+    """Pick up host/port changes saved by another worker process"""
+    global _server_config_loaded_at
+    if WEB_WORKERS > 1 and time.time() - _server_config_loaded_at > 5:
+        _server_config_loaded_at = time.time()
+        load_server_config()
 # Opcional: enviar las notas guardadas a un flujo de trabajo externo
 WORKFLOW_WEBHOOK_URL = os.getenv('WORKFLOW_WEBHOOK_URL')
 WORKFLOW_WEBHOOK_TOKEN = os.getenv('WORKFLOW_WEBHOOK_TOKEN')
@@ -144,8 +177,11 @@ WORKFLOW_WEBHOOK_USER = os.getenv('WORKFLOW_WEBHOOK_USER')
 
 # ---------- User management with PostgreSQL ---------
 SAVE_LOCK = threading.Lock()
-SESSIONS = {}
-ALL_TRANSCRIPTION_PROVIDERS = ["openai", "local", "sensevoice"]
+# Login tokens live in the database so any worker process can resolve them
+SESSION_MAX_AGE_HOURS = float(os.getenv('SESSION_MAX_AGE_HOURS', '168'))
+ALL_TRANSCRIPTION_PROVIDERS = ["openai", "local", "sensevoice", "remote"]
+# Providers that transcribe decoded PCM (VAD, diarization and alignment run here)
+PCM_PROVIDERS = ('local', 'sensevoice', 'remote')
 ALL_POSTPROCESS_PROVIDERS = ["openai", "google", "openrouter", "lmstudio", "ollama", "groq"]
 
 OPENROUTER_FREE_MODELS = [
@@ -195,6 +231,10 @@ from db import (
     get_user_preference,
     set_user_preference,
     get_user_preferences,
+    create_session as db_create_session,
+    get_session_username as db_get_session_username,
+    delete_session as db_delete_session,
+    purge_expired_sessions as db_purge_expired_sessions,
 )
 
 HASHER = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2, hash_len=32, type=Type.ID)
@@ -333,35 +373,99 @@ def get_current_username():
     token = request.headers.get('Authorization')
     if not token:
         return None
-    return SESSIONS.get(token)
+    return db_get_session_username(token, SESSION_MAX_AGE_HOURS)
 
 # Inicializar el wrapper de whisper.cpp local
 try:
     whisper_wrapper = WhisperCppWrapper()
-    WHISPER_CPP_AVAILABLE = whisper_wrapper.is_ready()
-    print(f"Whisper.cpp local available: {WHISPER_CPP_AVAILABLE}")
 except Exception as e:
     print(f"Error initializing whisper.cpp: {e}")
-    WHISPER_CPP_AVAILABLE = False
     whisper_wrapper = None
 
 # Inicializar el wrapper de SenseVoice
 try:
     sensevoice_wrapper = get_sensevoice_wrapper()
     print("SenseVoice wrapper initialized")
-    # Check initial availability (for logging purposes)
-    initial_sensevoice_available = sensevoice_wrapper.is_available()
-    print(f"SenseVoice initially available: {initial_sensevoice_available}")
-    # Note: We'll check availability dynamically instead of caching it
 except Exception as e:
     print(f"Error initializing SenseVoice wrapper: {e}")
     sensevoice_wrapper = None
 
+# With INFERENCE_SERVER_ENABLED the speech engines run in inference_server.py
+# and every web worker sends it decoded PCM instead of loading the models
+inference_client = get_inference_client()
+
+# REMOTE_WORKER_NODES lists worker_node.py instances for the 'remote' provider
+remote_workers = get_remote_worker_pool()
+
+def _remote_engine(model):
+    """Engine a 'remote' request runs on the node: SenseVoice or a whisper.cpp model"""
+    return 'sensevoice' if not model or model.lower().startswith('sensevoice') else 'local'
+
+# Provider availability is checked once and cached; model uploads, downloads,
+# deletions and /api/refresh-providers invalidate it
+provider_registry = get_provider_registry()
+provider_registry.register('local', lambda: bool(whisper_wrapper) and whisper_wrapper.is_ready())
+provider_registry.register('local_models', lambda: [m["name"] for m in whisper_wrapper.get_available_models()] if whisper_wrapper else [])
+provider_registry.register('sensevoice', lambda: bool(sensevoice_wrapper) and sensevoice_wrapper.is_available())
+print(f"Whisper.cpp local available: {provider_registry.is_available('local')}")
+print(f"SenseVoice available: {provider_registry.is_available('sensevoice')}")
+
+def _invalidate_model_providers():
+    """Re-check model-dependent providers after the models directory changed"""
+    provider_registry.invalidate('local_models')
+    provider_registry.invalidate('sensevoice')
+
+def _stop_whisper_model(model_path):
+    """Stop warm whisper-server workers before their model file is replaced or deleted"""
+    if inference_client:
+        inference_client.call('stop_model', model_path=model_path, timeout=30)
+    elif whisper_wrapper and whisper_wrapper.pool:
+        whisper_wrapper.pool.stop_model(model_path)
+
+# Warm up speech models in the background so the first request does not load them
+def _warm_sensevoice(_):
+    result = _run_local_engine(warmup_pcm(), 'auto', 'sensevoice', None, False, False, True)
+    if not result.get('success'):
+        raise RuntimeError(result.get('error') or 'SenseVoice warm-up failed')
+
+def _warm_pyannote(_):
+    if inference_client:
+        result = inference_client.call('diarize', pcm=warmup_pcm(2.0), sample_rate=SAMPLE_RATE, engine='pyannote')
+        if not result or result['engine'] != 'pyannote':
+            raise RuntimeError('Speaker diarization not available')
+        return
+    diarization_wrapper = get_speaker_diarization_wrapper()
+    if not diarization_wrapper or not diarization_wrapper.initialize():
+        raise RuntimeError('Speaker diarization not available')
+    diarization_wrapper.diarize_pcm(warmup_pcm(2.0))
+
+def _warm_whisper(model_filename):
+    model_path = os.path.join(os.getcwd(), 'whisper-cpp-models', sanitize_filename(model_filename))
+    if not os.path.exists(model_path):
+        raise RuntimeError(f'Model {model_filename} not found')
+    result = _run_local_engine(warmup_pcm(), None, 'local', model_filename, False, False, True)
+    if not result.get('success'):
+        raise RuntimeError(result.get('error') or 'Whisper warm-up failed')
+
+model_warmup = get_model_warmup()
+model_warmup.register('sensevoice', _warm_sensevoice)
+model_warmup.register('pyannote', _warm_pyannote)
+model_warmup.register('whisper:', _warm_whisper)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint para verificar que el backend está funcionando"""
     return jsonify({"status": "ok", "message": "Backend funcionando correctamente"})
 
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until every model in WARMUP_MODELS has warmed up"""
+    status = get_model_warmup().get_status()
+    registry = get_model_registry()
+    for name, state in status["models"].items():
+        state["resident"] = registry.is_resident(name)
+    return jsonify(status), 200 if status["ready"] else 503
+
 # --- Authentication and user management endpoints ---
 
 @app.route('/api/login', methods=['POST'])
@@ -379,7 +483,8 @@ def login_user():
     if HASHER.check_needs_rehash(user['password']):
         db_update_password(username, HASHER.hash(password))
     token = base64.urlsafe_b64encode(os.urandom(24)).decode('utf-8')
-    SESSIONS[token] = username
+    db_purge_expired_sessions(SESSION_MAX_AGE_HOURS)
+    db_create_session(token, username)
     tp, pp = get_user_providers(username)
     return jsonify({
         "success": True,
@@ -393,8 +498,8 @@ def login_user():
 @app.route('/api/logout', methods=['POST'])
 def logout_user():
     token = request.headers.get('Authorization')
-    if token in SESSIONS:
-        SESSIONS.pop(token, None)
+    if token:
+        db_delete_session(token)
     return jsonify({"success": True})
 
 
@@ -404,8 +509,7 @@ def session_info():
     if not MULTI_USER:
         username = 'admin'
     else:
-        token = request.headers.get('Authorization')
-        username = SESSIONS.get(token)
+        username = get_current_username()
         if not username:
             return jsonify({"authenticated": False}), 401
     user = get_user(username) or {}
@@ -537,6 +641,8 @@ def transcribe_audio():
         language = request.form.get('language', None)  # None = detección automática
         provider = request.form.get('provider', 'openai')  # openai o local
         enable_speaker_diarization = request.form.get('enable_speaker_diarization', 'false').lower() == 'true'
+        # 'fast' trades accuracy for speed; default from DIARIZATION_ENGINE
+        diarization_engine = request.form.get('diarization_engine') or None
 
         tp, _ = get_user_providers(username)
         if tp and provider not in tp:
@@ -545,13 +651,13 @@ def transcribe_audio():
         
         # Verificar disponibilidad del proveedor
         if provider == 'local':
-            if not WHISPER_CPP_AVAILABLE:
+            if not provider_registry.is_available('local'):
                 return jsonify({"error": "Whisper.cpp local no está disponible"}), 500
 
             if not model_name:
                 return jsonify({"error": "Model not specified"}), 400
 
-            audio_bytes = audio_file.read()
+            artifact = AudioArtifact(audio_file.read(), audio_file.filename)
 
             models_dir = os.path.join(os.getcwd(), 'whisper-cpp-models')
             model_filename = sanitize_filename(model_name)
@@ -559,85 +665,65 @@ def transcribe_audio():
             if not is_path_within_directory(models_dir, model_path):
                 return jsonify({"error": "Invalid model path"}), 400
 
-            result = whisper_wrapper.transcribe_audio_from_bytes(
-                audio_bytes,
-                audio_file.filename,
+            # ASR and (optional) diarization run in parallel on the decoded audio,
+            # on a queue worker so concurrent requests do not oversubscribe the CPU
+            outcome = transcription_queue.run_sync(lambda: _run_transcription_pipeline(
+                artifact,
                 language,
-                model_path
-            )
+                'local',
+                model_filename,
+                enable_speaker_diarization=enable_speaker_diarization,
+                diarization_engine=diarization_engine,
+                owner=username
+            ), username)
+            result = outcome['result']
             
             if result.get('success'):
-                transcription = result.get('transcription', '')
-                
-                # Apply speaker diarization if enabled
-                if enable_speaker_diarization and transcription:
-                    try:
-                        diarization_wrapper = get_speaker_diarization_wrapper()
-                        if diarization_wrapper.is_available() or diarization_wrapper.initialize():
-                            segments = diarization_wrapper.diarize_audio_bytes(audio_bytes, audio_file.filename)
-                            if segments:
-                                transcription = diarization_wrapper.apply_diarization_to_transcription(transcription, segments)
-                                print(f"Applied speaker diarization: {len(segments)} segments found")
-                        else:
-                            print("Speaker diarization not available, continuing without it")
-                    except Exception as e:
-                        print(f"Error applying speaker diarization: {e}")
-                        # Continue without diarization
-                
                 return jsonify({
-                    "transcription": transcription,
+                    "transcription": outcome['transcription'],
                     "provider": "local",
-                    "model": result.get('model')
+                    "model": result.get('model'),
+                    "timings": outcome['timings'],
+                    "cached": outcome['cached']
                 })
             else:
                 return jsonify({"error": f"Error en transcripción local: {result.get('error', 'Unknown error')}"}), 500
         
         elif provider == 'sensevoice':
             # Check SenseVoice availability dynamically
-            sensevoice_available = sensevoice_wrapper and sensevoice_wrapper.is_available()
+            sensevoice_available = provider_registry.is_available('sensevoice')
             if not sensevoice_available:
                 return jsonify({"error": "SenseVoice no está disponible. Asegúrate de haber descargado el modelo SenseVoiceSmall."}), 500
             
             # Usar SenseVoice
-            audio_bytes = audio_file.read()
+            artifact = AudioArtifact(audio_file.read(), audio_file.filename)
             
             # Obtener opciones adicionales
             detect_emotion = request.form.get('detect_emotion', 'true').lower() == 'true'
             detect_events = request.form.get('detect_events', 'true').lower() == 'true'
             use_itn = request.form.get('use_itn', 'true').lower() == 'true'
             
-            result = sensevoice_wrapper.transcribe_audio_from_bytes(
-                audio_bytes,
-                audio_file.filename,
+            outcome = transcription_queue.run_sync(lambda: _run_transcription_pipeline(
+                artifact,
                 language,
+                'sensevoice',
                 detect_emotion=detect_emotion,
                 detect_events=detect_events,
-                use_itn=use_itn
-            )
+                use_itn=use_itn,
+                enable_speaker_diarization=enable_speaker_diarization,
+                diarization_engine=diarization_engine,
+                owner=username
+            ), username)
+            result = outcome['result']
             
             if result.get('success'):
-                transcription = result.get('transcription', '')
-                
-                # Apply speaker diarization if enabled
-                if enable_speaker_diarization and transcription:
-                    try:
-                        diarization_wrapper = get_speaker_diarization_wrapper()
-                        if diarization_wrapper.is_available() or diarization_wrapper.initialize():
-                            segments = diarization_wrapper.diarize_audio_bytes(audio_bytes, audio_file.filename)
-                            if segments:
-                                transcription = diarization_wrapper.apply_diarization_to_transcription(transcription, segments)
-                                print(f"Applied speaker diarization: {len(segments)} segments found")
-                        else:
-                            print("Speaker diarization not available, continuing without it")
-                    except Exception as e:
-                        print(f"Error applying speaker diarization: {e}")
-                        # Continue without diarization
-                
                 response_data = {
-                    "transcription": transcription,
+                    "transcription": outcome['transcription'],
                     "provider": "sensevoice",
                     "model": result.get('model', 'SenseVoiceSmall'),
                     "language_detected": result.get('language_detected'),
+                    "timings": outcome['timings'],
+                    "cached": outcome['cached'],
                 }
                 
                 # Agregar información adicional si está disponible
@@ -649,6 +735,43 @@ def transcribe_audio():
                 return jsonify(response_data)
             else:
                 return jsonify({"error": f"Error en transcripción SenseVoice: {result.get('error', 'Unknown error')}"}), 500
+
+        elif provider == 'remote':
+            # Worker nodes run the engine; decoding, VAD and diarization stay here
+            if not remote_workers or not remote_workers.is_available(_remote_engine(model_name), model_name):
+                return jsonify({"error": "No remote worker node is available for this model"}), 503
+
+            artifact = AudioArtifact(audio_file.read(), audio_file.filename)
+            outcome = transcription_queue.run_sync(lambda: _run_transcription_pipeline(
+                artifact,
+                language,
+                'remote',
+                model_name,
+                detect_emotion=request.form.get('detect_emotion', 'true').lower() == 'true',
+                detect_events=request.form.get('detect_events', 'true').lower() == 'true',
+                use_itn=request.form.get('use_itn', 'true').lower() == 'true',
+                enable_speaker_diarization=enable_speaker_diarization,
+                diarization_engine=diarization_engine,
+                owner=username
+            ), username)
+            result = outcome['result']
+
+            if result.get('success'):
+                response_data = {
+                    "transcription": outcome['transcription'],
+                    "provider": "remote",
+                    "model": result.get('model'),
+                    "language_detected": result.get('language_detected'),
+                    "timings": outcome['timings'],
+                    "cached": outcome['cached'],
+                }
+                if result.get('emotion'):
+                    response_data["emotion"] = result.get('emotion')
+                if result.get('events'):
+                    response_data["events"] = result.get('events')
+                return jsonify(response_data)
+            else:
+                return jsonify({"error": f"Error en transcripción remota: {result.get('error', 'Unknown error')}"}), 500
                 
         else:  # OpenAI
             if not OPENAI_API_KEY:
@@ -672,7 +795,7 @@ def transcribe_audio():
                 'Authorization': f'Bearer {OPENAI_API_KEY}'
             }
             
-            response = requests.post(
+            response = http_clients.post(
                 'https://api.openai.com/v1/audio/transcriptions',
                 files=files,
                 headers=headers
@@ -688,6 +811,8 @@ def transcribe_audio():
             else:
                 return jsonify({"error": "Error en la transcripción"}), response.status_code
             
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 429, {'Retry-After': '30'}
     except Exception as e:
         return jsonify({"error": f"Error interno: {str(e)}"}), 500
 
@@ -875,7 +1000,7 @@ def improve_text_openai(text, improvement_type, model, custom_prompt=None):
         'temperature': 0.7
     }
     
-    response = requests.post(
+    response = http_clients.post(
         'https://api.openai.com/v1/chat/completions',
         headers=headers,
         json=payload
@@ -930,7 +1055,7 @@ def improve_text_google(text, improvement_type, model, custom_prompt=None):
         }]
     }
     
-    response = requests.post(url, headers=headers, json=payload)
+    response = http_clients.post(url, headers=headers, json=payload)
     
     if response.status_code == 200:
         result = response.json()
@@ -988,7 +1113,7 @@ def improve_text_openai_stream(text, improvement_type, model, custom_prompt=None
     
     def generate():
         try:
-            response = requests.post(
+            response = http_clients.post(
                 'https://api.openai.com/v1/chat/completions',
                 headers=headers,
                 json=payload,
@@ -1071,7 +1196,7 @@ def improve_text_google_stream(text, improvement_type, model, custom_prompt=None
     
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = http_clients.post(url, headers=headers, json=payload)
             
             if response.status_code != 200:
                 error_msg = f"Error de Google API: {response.status_code}"
@@ -1161,7 +1286,7 @@ def improve_text_openrouter(text, improvement_type, model, custom_prompt=None):
     }
     
     try:
-        response = requests.post(
+        response = http_clients.post(
             'https://openrouter.ai/api/v1/chat/completions',
             headers=headers,
             json=payload
@@ -1241,7 +1366,7 @@ def improve_text_openrouter_stream(text, improvement_type, model, custom_prompt=
     
     def generate():
         try:
-            response = requests.post(
+            response = http_clients.post(
                 'https://openrouter.ai/api/v1/chat/completions',
                 headers=headers,
                 json=payload,
@@ -1345,7 +1470,7 @@ def improve_text_groq(text, improvement_type, model, custom_prompt=None):
         max_tokens=1000
     )
 
-    response = requests.post('https://api.groq.com/openai/v1/chat/completions', headers=headers, json=payload)
+    response = http_clients.post('https://api.groq.com/openai/v1/chat/completions', headers=headers, json=payload)
 
     if response.status_code == 200:
         result = response.json()
@@ -1400,7 +1525,7 @@ def improve_text_groq_stream(text, improvement_type, model, custom_prompt=None):
 
     def generate():
         try:
-            response = requests.post('https://api.groq.com/openai/v1/chat/completions', headers=headers, json=payload, stream=True)
+            response = http_clients.post('https://api.groq.com/openai/v1/chat/completions', headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': f'Groq error {response.status_code}'})}\n\n"
                 return
@@ -1462,7 +1587,7 @@ def improve_text_lmstudio(text, improvement_type, model, host, port, custom_prom
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_clients.post(url, headers=headers, json=payload)
         if response.status_code == 200:
             result = response.json()
             improved_text = result['choices'][0]['message']['content']
@@ -1483,7 +1608,7 @@ def get_ollama_models():
 
     try:
         url = f"http://{host}:{port}/api/tags"
-        response = requests.get(url, timeout=5)
+        response = http_clients.get(url, timeout=5)
         if response.status_code != 200:
             return jsonify({"error": f"Ollama error {response.status_code}"}), response.status_code
         return jsonify(response.json())
@@ -1530,7 +1655,7 @@ def improve_text_lmstudio_stream(text, improvement_type, model, host, port, cust
 
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
+            response = http_clients.post(url, headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': f'LM Studio error {response.status_code}'})}\n\n"
                 return
@@ -1590,7 +1715,7 @@ def improve_text_ollama(text, improvement_type, model, host, port, custom_prompt
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_clients.post(url, headers=headers, json=payload)
         if response.status_code == 200:
             result = response.json()
             improved_text = result.get('message', {}).get('content', '')
@@ -1638,7 +1763,7 @@ def improve_text_ollama_stream(text, improvement_type, model, host, port, custom
 
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
+            response = http_clients.post(url, headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': f'Ollama error {response.status_code}'})}\n\n"
                 return
@@ -1673,7 +1798,7 @@ def chat_openai_stream(messages, model):
 
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
+            response = http_clients.post(url, headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': 'OpenAI error'})}\n\n"
                 return
@@ -1708,7 +1833,7 @@ def chat_google_stream(messages, model):
 
     def generate():
         try:
-            resp = requests.post(url, headers=headers, json=payload)
+            resp = http_clients.post(url, headers=headers, json=payload)
             if resp.status_code != 200:
                 yield f"data: {json.dumps({'error': f'Google error {resp.status_code}'})}\n\n"
                 return
@@ -1740,7 +1865,7 @@ def chat_openrouter_stream(messages, model):
 
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
+            response = http_clients.post(url, headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': f'OpenRouter error {response.status_code}'})}\n\n"
                 return
@@ -1782,7 +1907,7 @@ def chat_groq_stream(messages, model):
 
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
+            response = http_clients.post(url, headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': f'Groq error {response.status_code}'})}\n\n"
                 return
@@ -1817,7 +1942,7 @@ def chat_lmstudio_stream(messages, model, host, port):
 
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
+            response = http_clients.post(url, headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': f'LM Studio error {response.status_code}'})}\n\n"
                 return
@@ -1852,7 +1977,7 @@ def chat_ollama_stream(messages, model, host, port):
 
     def generate():
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
+            response = http_clients.post(url, headers=headers, json=payload, stream=True)
             if response.status_code != 200:
                 yield f"data: {json.dumps({'error': f'Ollama error {response.status_code}'})}\n\n"
                 return
@@ -1961,7 +2086,7 @@ def transcribe_audio_gpt4o():
         
         print(f"[DEBUG] Usando modo normal (OpenAI no soporta streaming para transcripciones)")
         # Manejar respuesta normal
-        response = requests.post(
+        response = http_clients.post(
             'https://api.openai.com/v1/audio/transcriptions',
             files=files,
             headers=headers
@@ -2151,7 +2276,7 @@ def save_note():
             if WORKFLOW_WEBHOOK_TOKEN:
                 headers["Authorization"] = f"Bearer {WORKFLOW_WEBHOOK_TOKEN}"
             try:
-                requests.post(
+                http_clients.post(
                     WORKFLOW_WEBHOOK_URL,
                     json={
                         "id": note_id,
@@ -2290,7 +2415,7 @@ def create_note_in_folder():
             if WORKFLOW_WEBHOOK_TOKEN:
                 headers["Authorization"] = f"Bearer {WORKFLOW_WEBHOOK_TOKEN}"
             try:
-                requests.post(
+                http_clients.post(
                     WORKFLOW_WEBHOOK_URL,
                     json={
                         "id": note_id,
@@ -2614,7 +2739,7 @@ def generate_mindmap_openai(note_md, topic, model):
             {'role': 'user', 'content': user_msg}
         ]
     }
-    resp = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=payload)
+    resp = http_clients.post('https://api.openai.com/v1/chat/completions', headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'OpenAI error'
     try:
@@ -2651,7 +2776,7 @@ def generate_mindmap_google(note_md, topic, model):
             } for m in messages
         ]
     }
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = http_clients.post(url, headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'Google error'
     try:
@@ -2689,7 +2814,7 @@ def generate_mindmap_openrouter(note_md, topic, model):
             {'role': 'user', 'content': user_msg}
         ]
     }
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = http_clients.post(url, headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'OpenRouter error'
     try:
@@ -2726,7 +2851,7 @@ def generate_mindmap_groq(note_md, topic, model):
         temperature=0.7,
         max_tokens=1000
     )
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = http_clients.post(url, headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'Groq error'
     try:
@@ -2757,7 +2882,7 @@ def generate_mindmap_lmstudio(note_md, topic, model, host, port):
         ]
     }
     try:
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = http_clients.post(url, headers=headers, json=payload)
     except requests.RequestException as e:
         return None, str(e)
     if resp.status_code != 200:
@@ -2790,7 +2915,7 @@ def generate_mindmap_ollama(note_md, topic, model, host, port):
         ]
     }
     try:
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = http_clients.post(url, headers=headers, json=payload)
     except requests.RequestException as e:
         return None, str(e)
     if resp.status_code != 200:
@@ -2859,7 +2984,7 @@ def generate_diagram_openai(note_md, diagram_type, model):
             {'role': 'user', 'content': note_md}
         ]
     }
-    resp = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=payload)
+    resp = http_clients.post('https://api.openai.com/v1/chat/completions', headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'OpenAI error'
     try:
@@ -2892,7 +3017,7 @@ def generate_diagram_google(note_md, diagram_type, model):
             } for m in messages
         ]
     }
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = http_clients.post(url, headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'Google error'
     try:
@@ -2926,7 +3051,7 @@ def generate_diagram_openrouter(note_md, diagram_type, model):
             {'role': 'user', 'content': note_md}
         ]
     }
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = http_clients.post(url, headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'OpenRouter error'
     try:
@@ -2958,7 +3083,7 @@ def generate_diagram_groq(note_md, diagram_type, model):
         temperature=0.7,
         max_tokens=1000
     )
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = http_clients.post(url, headers=headers, json=payload)
     if resp.status_code != 200:
         return None, 'Groq error'
     try:
@@ -2985,7 +3110,7 @@ def generate_diagram_lmstudio(note_md, diagram_type, model, host, port):
         ]
     }
     try:
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = http_clients.post(url, headers=headers, json=payload)
     except requests.RequestException as e:
         return None, str(e)
     if resp.status_code != 200:
@@ -3014,7 +3139,7 @@ def generate_diagram_ollama(note_md, diagram_type, model, host, port):
         ]
     }
     try:
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = http_clients.post(url, headers=headers, json=payload)
     except requests.RequestException as e:
         return None, str(e)
     if resp.status_code != 200:
@@ -3261,21 +3386,15 @@ def concept_graph():
         try:
             # Use enhanced build_graph function with AI support
             if ai_provider and api_key:
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    # Import the async function
-                    from concept_graph import build_enhanced_graph_with_ai
-                    
-                    # No limit on node generation - allow unlimited nodes
-                    max_nodes = None  # Remove all node generation limits
-                    
-                    graph_result = loop.run_until_complete(
-                        build_enhanced_graph_with_ai(note, analysis_type, ai_provider, api_key, language=language, enable_lemmatization=enable_lemmatization, exclusions=exclusions, inclusions=inclusions, max_terms=max_nodes)
-                    )
-                finally:
-                    loop.close()
+                # Import the async function
+                from concept_graph import build_enhanced_graph_with_ai
+                
+                # No limit on node generation - allow unlimited nodes
+                max_nodes = None  # Remove all node generation limits
+                
+                graph_result = run_async(
+                    build_enhanced_graph_with_ai(note, analysis_type, ai_provider, api_key, language=language, enable_lemmatization=enable_lemmatization, exclusions=exclusions, inclusions=inclusions, max_terms=max_nodes)
+                )
             else:
                 # No limit on node generation - allow unlimited nodes
                 max_nodes = None  # Remove all node generation limits
@@ -3397,35 +3516,28 @@ def concept_graph_ai_reprocess():
         return jsonify({"error": f"API key not configured for {ai_provider}"}), 400
     
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Import the async AI reprocessing function
+        from ai_reprocess import ai_reprocess_nodes, build_graph_with_selected_nodes
         
-        try:
-            # Import the async AI reprocessing function
-            from ai_reprocess import ai_reprocess_nodes, build_graph_with_selected_nodes
-            
-            # Convert language parameter from frontend format to backend format
-            language_param = 'spanish' if language == 'es' else 'english'
-            
-            # Prepare arguments based on provider type
-            if ai_provider in ['lmstudio', 'ollama']:
-                filtered_terms = loop.run_until_complete(
-                    ai_reprocess_nodes(note, current_nodes, analysis_type, ai_provider, 
-                                     api_key=None, ai_model=ai_model, host=host, port=port, language=language_param, enable_lemmatization=enable_lemmatization)
-                )
-            else:
-                filtered_terms = loop.run_until_complete(
-                    ai_reprocess_nodes(note, current_nodes, analysis_type, ai_provider, 
-                                     api_key=api_key, language=language_param, enable_lemmatization=enable_lemmatization)
-                )
-            
-            # Regenerate graph with AI-filtered terms (not nodes)
-            result = build_graph_with_selected_nodes(note, filtered_terms, analysis_type, language=language_param, enable_lemmatization=enable_lemmatization)
-            
-            return jsonify(result)
-        finally:
-            loop.close()
+        # Convert language parameter from frontend format to backend format
+        language_param = 'spanish' if language == 'es' else 'english'
+        
+        # Prepare arguments based on provider type
+        if ai_provider in ['lmstudio', 'ollama']:
+            filtered_terms = run_async(
+                ai_reprocess_nodes(note, current_nodes, analysis_type, ai_provider, 
+                                 api_key=None, ai_model=ai_model, host=host, port=port, language=language_param, enable_lemmatization=enable_lemmatization)
+            )
+        else:
+            filtered_terms = run_async(
+                ai_reprocess_nodes(note, current_nodes, analysis_type, ai_provider, 
+                                 api_key=api_key, language=language_param, enable_lemmatization=enable_lemmatization)
+            )
+        
+        # Regenerate graph with AI-filtered terms (not nodes)
+        result = build_graph_with_selected_nodes(note, filtered_terms, analysis_type, language=language_param, enable_lemmatization=enable_lemmatization)
+        
+        return jsonify(result)
             
     except Exception as e:
         print(f"AI reprocessing error: {str(e)}")
@@ -3504,29 +3616,22 @@ def concept_graph_ai_generate_nodes():
         return jsonify({"error": f"API key not configured for {ai_provider}"}), 400
     
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Import the async AI node generation function
+        from concept_graph import generate_ai_nodes
+        
+        # Prepare arguments based on provider type
+        if ai_provider in ['lmstudio', 'ollama']:
+            ai_nodes = run_async(
+                generate_ai_nodes(note, current_nodes, ai_provider, 
+                                api_key=None, ai_model=ai_model, host=host, port=port, language=language)
+            )
+        else:
+            ai_nodes = run_async(
+                generate_ai_nodes(note, current_nodes, ai_provider, 
+                                api_key=api_key, ai_model=ai_model, language=language)
+            )
         
-        try:
-            # Import the async AI node generation function
-            from concept_graph import generate_ai_nodes
-            
-            # Prepare arguments based on provider type
-            if ai_provider in ['lmstudio', 'ollama']:
-                ai_nodes = loop.run_until_complete(
-                    generate_ai_nodes(note, current_nodes, ai_provider, 
-                                    api_key=None, ai_model=ai_model, host=host, port=port, language=language)
-                )
-            else:
-                ai_nodes = loop.run_until_complete(
-                    generate_ai_nodes(note, current_nodes, ai_provider, 
-                                    api_key=api_key, ai_model=ai_model, language=language)
-                )
-            
-            return jsonify({"ai_nodes": ai_nodes})
-        finally:
-            loop.close()
+        return jsonify({"ai_nodes": ai_nodes})
             
     except Exception as e:
         print(f"AI node generation error: {str(e)}")
@@ -3606,29 +3711,22 @@ def concept_graph_ai_suggestions():
         return jsonify({"error": f"API key not configured for {ai_provider}"}), 400
     
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Import the AI suggestions function
+        from ai_suggestions import generate_ai_suggestions
+        
+        # Prepare arguments based on provider type
+        if ai_provider in ['lmstudio', 'ollama']:
+            suggestions = run_async(
+                generate_ai_suggestions(note, current_nodes, analysis_type, ai_provider, 
+                                      api_key=None, ai_model=ai_model, host=host, port=port, language=language)
+            )
+        else:
+            suggestions = run_async(
+                generate_ai_suggestions(note, current_nodes, analysis_type, ai_provider, 
+                                      api_key=api_key, ai_model=ai_model, language=language)
+            )
         
-        try:
-            # Import the AI suggestions function
-            from ai_suggestions import generate_ai_suggestions
-            
-            # Prepare arguments based on provider type
-            if ai_provider in ['lmstudio', 'ollama']:
-                suggestions = loop.run_until_complete(
-                    generate_ai_suggestions(note, current_nodes, analysis_type, ai_provider, 
-                                          api_key=None, ai_model=ai_model, host=host, port=port, language=language)
-                )
-            else:
-                suggestions = loop.run_until_complete(
-                    generate_ai_suggestions(note, current_nodes, analysis_type, ai_provider, 
-                                          api_key=api_key, ai_model=ai_model, language=language)
-                )
-            
-            return jsonify({"suggestions": suggestions})
-        finally:
-            loop.close()
+        return jsonify({"suggestions": suggestions})
             
     except Exception as e:
         print(f"AI suggestions error: {str(e)}")
@@ -3714,33 +3812,26 @@ def concept_graph_ai_single_suggestion():
         return jsonify({"error": f"API key not configured for {ai_provider}"}), 400
     
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Import the single suggestion function
+        from ai_suggestions import generate_single_ai_suggestion
+        
+        # Prepare arguments based on provider type
+        if ai_provider in ['lmstudio', 'ollama']:
+            suggestion = run_async(
+                generate_single_ai_suggestion(note, current_nodes, suggestion_type, analysis_type, ai_provider, 
+                                            api_key=None, ai_model=ai_model, host=host, port=port, language=language)
+            )
+        else:
+            suggestion = run_async(
+                generate_single_ai_suggestion(note, current_nodes, suggestion_type, analysis_type, ai_provider, 
+                                            api_key=api_key, ai_model=ai_model, language=language)
+            )
         
-        try:
-            # Import the single suggestion function
-            from ai_suggestions import generate_single_ai_suggestion
-            
-            # Prepare arguments based on provider type
-            if ai_provider in ['lmstudio', 'ollama']:
-                suggestion = loop.run_until_complete(
-                    generate_single_ai_suggestion(note, current_nodes, suggestion_type, analysis_type, ai_provider, 
-                                                api_key=None, ai_model=ai_model, host=host, port=port, language=language)
-                )
-            else:
-                suggestion = loop.run_until_complete(
-                    generate_single_ai_suggestion(note, current_nodes, suggestion_type, analysis_type, ai_provider, 
-                                                api_key=api_key, ai_model=ai_model, language=language)
-                )
+        if suggestion:
+            return jsonify({"suggestion": suggestion})
+        else:
+            return jsonify({"error": "Failed to generate suggestion"}), 500
             
-            if suggestion:
-                return jsonify({"suggestion": suggestion})
-            else:
-                return jsonify({"error": "Failed to generate suggestion"}), 500
-                
-        finally:
-            loop.close()
             
     except Exception as e:
         print(f"Single AI suggestion error: {str(e)}")
@@ -3820,37 +3911,30 @@ def concept_graph_ai_custom_suggestion():
         return jsonify({"error": f"API key not configured for {ai_provider}"}), 400
     
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Import the custom suggestion function
+        from ai_suggestions import generate_custom_suggestion
+        
+        # Prepare arguments based on provider type
+        if ai_provider in ['lmstudio', 'ollama']:
+            suggestion = run_async(
+                generate_custom_suggestion(question, note, current_nodes, ai_provider, 
+                                         api_key=None, ai_model=ai_model, host=host, port=port, language=language)
+            )
+        else:
+            suggestion = run_async(
+                generate_custom_suggestion(question, note, current_nodes, ai_provider, 
+                                         api_key=api_key, ai_model=ai_model, language=language)
+            )
         
-        try:
-            # Import the custom suggestion function
-            from ai_suggestions import generate_custom_suggestion
+        if suggestion:
+            return jsonify({
+                "suggestion": suggestion,
+                "type": "custom",
+                "question": question
+            })
+        else:
+            return jsonify({"error": "Failed to generate suggestion"}), 500
             
-            # Prepare arguments based on provider type
-            if ai_provider in ['lmstudio', 'ollama']:
-                suggestion = loop.run_until_complete(
-                    generate_custom_suggestion(question, note, current_nodes, ai_provider, 
-                                             api_key=None, ai_model=ai_model, host=host, port=port, language=language)
-                )
-            else:
-                suggestion = loop.run_until_complete(
-                    generate_custom_suggestion(question, note, current_nodes, ai_provider, 
-                                             api_key=api_key, ai_model=ai_model, language=language)
-                )
-            
-            if suggestion:
-                return jsonify({
-                    "suggestion": suggestion,
-                    "type": "custom",
-                    "question": question
-                })
-            else:
-                return jsonify({"error": "Failed to generate suggestion"}), 500
-                
-        finally:
-            loop.close()
             
     except Exception as e:
         print(f"Custom AI suggestion error: {str(e)}")
@@ -4637,77 +4721,279 @@ def export_pdf():
     except Exception as e:
         return jsonify({"error": f"Error generating PDF: {str(e)}"}), 500
 
-def _transcribe_bytes(audio_bytes, filename, language, provider, model=None,
-                      detect_emotion=True, detect_events=True, use_itn=True,
-                      enable_speaker_diarization=False):
-    transcription = ''
+def _diarization_engine(engine=None):
+    """Engine requested by the client, else DIARIZATION_ENGINE (pyannote by default)"""
+    engine = (engine or os.getenv('DIARIZATION_ENGINE', 'pyannote')).lower()
+    return engine if engine in DIARIZATION_ENGINES else 'pyannote'
+
+def _diarize_artifact(artifact, engine=None, owner=None):
+    """
+    Run speaker diarization on the request's decoded audio.
+
+    Returns {'engine', 'segments', 'embeddings'} or None. Results persisted
+    for one of the owner's saved recordings with the same audio are reused.
+    """
+    engine = _diarization_engine(engine)
+    store = get_diarization_store() if owner else None
+    if store:
+        stored = store.get(owner, artifact.content_hash, engine)
+        if stored is not None:
+            print(f"Reusing stored {engine} diarization for {artifact.filename}")
+            return stored
+    try:
+        if inference_client:
+            return inference_client.call('diarize', pcm=artifact.pcm, sample_rate=artifact.sample_rate,
+                                         engine=engine)
+        return diarize_pcm(artifact.pcm, artifact.sample_rate, engine)
+    except Exception as e:
+        print(f"Error applying speaker diarization: {e}")
+        # Continue without diarization
+    return None
+
+def _persist_diarization(artifact, username, diarization):
+    """Store diarization next to the archived WAV, keyed by the WAV's hash"""
+    store = get_diarization_store()
+    if not store or not diarization or not artifact.wav_hash:
+        return
+    store.put(username, artifact.wav_hash, diarization['engine'],
+              diarization['segments'], diarization.get('embeddings'))
+
+def _align_speakers(transcription, segments, asr_segments=None):
+    """Label speakers using diarization segments, by timestamps when the engine provides them"""
+    if not transcription or not segments:
+        return transcription
+    try:
+        diarization_wrapper = get_speaker_diarization_wrapper()
+        print(f"Applied speaker diarization: {len(segments)} segments found")
+        if asr_segments:
+            return diarization_wrapper.apply_diarization_to_segments(asr_segments, segments)
+        return diarization_wrapper.apply_diarization_to_transcription(transcription, segments)
+    except Exception as e:
+        print(f"Error applying speaker diarization: {e}")
+        return transcription
+
+def _detect_speech_timeline(artifact):
+    """VAD pre-pass: speech regions to decode, or None to decode the whole recording"""
+    if os.getenv('VAD_PREPASS_ENABLED', 'true').lower() == 'false':
+        return None
+    timeline = SpeechTimeline.detect(artifact.pcm, artifact.sample_rate,
+                                     min_silence_ratio=float(os.getenv('VAD_MIN_SILENCE_RATIO', '0.1')))
+    if timeline:
+        print(f"VAD pre-pass: decoding {timeline.speech_seconds:.1f}s of speech out of {artifact.duration:.1f}s")
+    return timeline
+
+def _run_local_asr(artifact, language, provider, model, detect_emotion, detect_events, use_itn,
+                   progress_callback=None, timeline=None):
+    """
+    Run a local engine on the artifact's PCM and return its result dict.
+    With a SpeechTimeline only the speech is decoded and segment timestamps
+    are mapped back to the recording.
+    """
+    result = _run_local_engine(artifact.pcm if timeline is None else timeline.compact(artifact.pcm),
+                               language, provider, model, detect_emotion, detect_events, use_itn,
+                               progress_callback)
+    if timeline is not None and result.get('segments'):
+        result['segments'] = timeline.map_segments(result['segments'])
+    return result
+
+def _run_local_engine(pcm, language, provider, model, detect_emotion, detect_events, use_itn,
+                      progress_callback=None):
+    if provider == 'remote':
+        if not remote_workers:
+            raise RuntimeError('No remote worker nodes configured')
+        engine = _remote_engine(model)
+        return remote_workers.transcribe(pcm, engine, model if engine == 'local' else None, language,
+                                         detect_emotion, detect_events, use_itn, progress_callback)
     if provider == 'local':
-        if not WHISPER_CPP_AVAILABLE:
+        if not provider_registry.is_available('local'):
             raise RuntimeError('Whisper.cpp local no disponible')
         models_dir = os.path.join(os.getcwd(), 'whisper-cpp-models')
         model_filename = sanitize_filename(model or '')
         model_path = os.path.join(models_dir, model_filename)
         if not is_path_within_directory(models_dir, model_path):
             raise RuntimeError('Invalid model path')
-        result = whisper_wrapper.transcribe_audio_from_bytes(audio_bytes, filename, language, model_path)
-        if result.get('success'):
-            transcription = result.get('transcription', '')
-            if enable_speaker_diarization and transcription:
-                try:
-                    diarization_wrapper = get_speaker_diarization_wrapper()
-                    if diarization_wrapper.is_available() or diarization_wrapper.initialize():
-                        segments = diarization_wrapper.diarize_audio_bytes(audio_bytes, filename)
-                        if segments:
-                            transcription = diarization_wrapper.apply_diarization_to_transcription(transcription, segments)
-                except Exception:
-                    pass
-    elif provider == 'sensevoice':
-        if not sensevoice_wrapper or not sensevoice_wrapper.is_available():
-            raise RuntimeError('SenseVoice no disponible')
-        result = sensevoice_wrapper.transcribe_audio_from_bytes(
-            audio_bytes,
-            filename,
-            language,
-            detect_emotion,
-            detect_events,
-            use_itn
-        )
-        if result.get('success'):
-            transcription = result.get('transcription', '')
-            if enable_speaker_diarization and transcription:
-                try:
-                    diarization_wrapper = get_speaker_diarization_wrapper()
-                    if diarization_wrapper.is_available() or diarization_wrapper.initialize():
-                        segments = diarization_wrapper.diarize_audio_bytes(audio_bytes, filename)
-                        if segments:
-                            transcription = diarization_wrapper.apply_diarization_to_transcription(transcription, segments)
-                except Exception:
-                    pass
-    else:
-        if not OPENAI_API_KEY:
-            raise RuntimeError('API key de OpenAI no configurada')
-        if not model:
-            raise RuntimeError('Model not specified')
-        files = {
-            'file': (filename, io.BytesIO(audio_bytes), 'application/octet-stream'),
-            'model': (None, model)
-        }
-        if language and language != 'auto':
-            files['language'] = (None, language)
-        headers = {'Authorization': f'Bearer {OPENAI_API_KEY}'}
-        resp = requests.post('https://api.openai.com/v1/audio/transcriptions', files=files, headers=headers)
-        if resp.status_code == 200:
-            transcription = resp.json().get('text', '')
+        if inference_client:
+            return inference_client.call('transcribe', progress_callback, pcm=pcm, provider=provider,
+                                         language=language, model_path=model_path)
+        return whisper_wrapper.transcribe_pcm(pcm, language, model_path, progress_callback)
+    if not provider_registry.is_available('sensevoice'):
+        raise RuntimeError('SenseVoice no disponible')
+    if inference_client:
+        return inference_client.call('transcribe', progress_callback, pcm=pcm, provider=provider,
+                                     language=language, detect_emotion=detect_emotion,
+                                     detect_events=detect_events, use_itn=use_itn)
+    return sensevoice_wrapper.transcribe_pcm(
+        pcm,
+        language,
+        detect_emotion,
+        detect_events,
+        use_itn,
+        progress_callback
+    )
+
+def _run_openai_asr(artifact, language, model):
+    if not OPENAI_API_KEY:
+        raise RuntimeError('API key de OpenAI no configurada')
+    if not model:
+        raise RuntimeError('Model not specified')
+    files = {
+        'file': (artifact.filename, io.BytesIO(artifact.audio_bytes), 'application/octet-stream'),
+        'model': (None, model)
+    }
+    if language and language != 'auto':
+        files['language'] = (None, language)
+    headers = {'Authorization': f'Bearer {OPENAI_API_KEY}'}
+    resp = http_clients.post('https://api.openai.com/v1/audio/transcriptions', files=files, headers=headers)
+    if resp.status_code != 200:
+        raise RuntimeError('Error en la transcripción')
+    return {"success": True, "transcription": resp.json().get('text', ''), "model": model}
+
+def _transcription_cache_key(artifact, language, provider, model,
+                             detect_emotion, detect_events, use_itn, enable_speaker_diarization,
+                             diarization_engine=None):
+    """Cache key covering the audio content and every option that changes the output"""
+    options = {}
+    if provider == 'local':
+        # A re-uploaded model under the same filename must not serve stale results
+        model_path = os.path.join(os.getcwd(), 'whisper-cpp-models', sanitize_filename(model or ''))
+        try:
+            st = os.stat(model_path)
+            options['model_file'] = [st.st_size, int(st.st_mtime)]
+        except OSError:
+            pass
+    if provider == 'sensevoice':
+        options.update(emotion=detect_emotion, events=detect_events, itn=use_itn,
+                       engine=os.getenv('SENSEVOICE_ENGINE', 'torch').lower(),
+                       quantized=os.getenv('SENSEVOICE_ONNX_QUANTIZE', 'false').lower() == 'true')
+    if provider == 'remote':
+        options.update(emotion=detect_emotion, events=detect_events, itn=use_itn)
+    if provider in PCM_PROVIDERS:
+        options['diarization'] = _diarization_engine(diarization_engine) if enable_speaker_diarization else False
+        options['vad'] = os.getenv('VAD_PREPASS_ENABLED', 'true').lower() != 'false'
+    return TranscriptionCache.make_key(artifact.content_hash, provider, model, language, **options)
+
+def _run_transcription_pipeline(artifact, language, provider, model=None,
+                                detect_emotion=True, detect_events=True, use_itn=True,
+                                enable_speaker_diarization=False, save_for=None,
+                                progress_callback=None, diarization_engine=None, owner=None):
+    """
+    Transcribe an AudioArtifact as a stage DAG:
+    decode -> (vad -> asr || diarization || save) -> alignment.
+    ASR and diarization only need the decoded audio, so they run in parallel;
+    local engines only decode the speech the VAD pre-pass found.
+
+    Args:
+        save_for: optional (note_id, username) to archive the audio as WAV
+        progress_callback: optional callable receiving ASR progress dicts
+            (percent, elapsed, rtf, eta) as the engine runs
+        diarization_engine: 'pyannote' or 'fast' (defaults to DIARIZATION_ENGINE)
+        owner: user whose persisted diarization results may be reused
+            (defaults to the user in save_for)
+
+    Returns:
+        dict with the transcription, the engine result, the saved filename
+        (if any), per-stage timings in seconds and whether it was a cache hit
+    """
+    local = provider in PCM_PROVIDERS
+    if owner is None and save_for:
+        owner = save_for[1]
+    pipeline = StagePipeline()
+
+    # A cache hit skips decoding and inference; only archiving still runs
+    cache = get_transcription_cache()
+    cache_key = None
+    if cache:
+        cache_key = _transcription_cache_key(artifact, language, provider, model, detect_emotion,
+                                             detect_events, use_itn, enable_speaker_diarization,
+                                             diarization_engine)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if save_for:
+                note_id, username = save_for
+                pipeline.add_stage('save', lambda _: _save_audio_file(artifact, note_id, username))
+            results = pipeline.run()
+            if progress_callback:
+                TranscriptionProgress(0, progress_callback).update(100)
+            return {
+                "transcription": cached['transcription'],
+                "result": cached['result'],
+                "filename": results.get('save'),
+                "timings": pipeline.timings,
+                "cached": True,
+            }
+
+    pipeline.add_stage('decode', lambda _: artifact.pcm if (local or save_for) else None)
+    if local:
+        # Silence is dropped before the engine sees it
+        pipeline.add_stage('vad', lambda _: _detect_speech_timeline(artifact), depends_on=['decode'])
+
+    def asr(inputs):
+        timeline = inputs.get('vad')
+        duration = (timeline.speech_seconds if timeline else artifact.duration) if local else 0
+        tracker = TranscriptionProgress(duration, progress_callback) if progress_callback else None
+        if local:
+            result = _run_local_asr(artifact, language, provider, model, detect_emotion, detect_events,
+                                    use_itn, tracker.update if tracker else None, timeline)
         else:
-            raise RuntimeError('Error en la transcripción')
-    return transcription
-
-def _save_audio_file(audio_bytes, orig_filename, note_id, username):
-    with tempfile.NamedTemporaryFile(suffix=f".{orig_filename.split('.')[-1]}", delete=False) as tmp:
-        tmp.write(audio_bytes)
-        orig_path = tmp.name
-    wav_path = whisper_wrapper._convert_to_wav(orig_path, orig_filename)
-    os.unlink(orig_path)
+            result = _run_openai_asr(artifact, language, model)
+        if tracker:
+            tracker.update(100)
+        return result
+
+    pipeline.add_stage('asr', asr, depends_on=['vad'] if local else None)
+    diarize = enable_speaker_diarization and local
+    if diarize:
+        pipeline.add_stage('diarization', lambda _: _diarize_artifact(artifact, diarization_engine, owner),
+                           depends_on=['decode'])
+
+    def align(inputs):
+        result = inputs['asr'] or {}
+        transcription = result.get('transcription', '') if result.get('success') else ''
+        if diarize and inputs['diarization']:
+            transcription = _align_speakers(transcription, inputs['diarization']['segments'],
+                                            result.get('segments'))
+        return transcription
+
+    pipeline.add_stage('alignment', align, depends_on=['asr', 'diarization'] if diarize else ['asr'])
+    if save_for:
+        note_id, username = save_for
+        pipeline.add_stage('save', lambda _: _save_audio_file(artifact, note_id, username), depends_on=['decode'])
+
+    results = pipeline.run()
+    if diarize and results.get('save'):
+        _persist_diarization(artifact, save_for[1], results['diarization'])
+    result = results['asr'] or {}
+    if cache_key and result.get('success'):
+        cache.put(cache_key, {"transcription": results['alignment'], "result": result})
+    return {
+        "transcription": results['alignment'],
+        "result": results['asr'],
+        "filename": results.get('save'),
+        "timings": pipeline.timings,
+        "cached": False,
+    }
+
+def _transcribe_artifact(artifact, language, provider, model=None,
+                         detect_emotion=True, detect_events=True, use_itn=True,
+                         enable_speaker_diarization=False, progress_callback=None,
+                         diarization_engine=None):
+    """Transcribe an AudioArtifact and return only the text"""
+    return _run_transcription_pipeline(
+        artifact, language, provider, model,
+        detect_emotion, detect_events, use_itn, enable_speaker_diarization,
+        progress_callback=progress_callback, diarization_engine=diarization_engine
+    )['transcription']
+
+def _transcribe_bytes(audio_bytes, filename, language, provider, model=None,
+                      detect_emotion=True, detect_events=True, use_itn=True,
+                      enable_speaker_diarization=False, progress_callback=None,
+                      diarization_engine=None):
+    return _transcribe_artifact(AudioArtifact(audio_bytes, filename), language, provider, model,
+                                detect_emotion, detect_events, use_itn, enable_speaker_diarization,
+                                progress_callback, diarization_engine)
+
+def _allocate_audio_file(note_id, username):
+    """Pick the next free <note_id>-audioN.wav name under saved_audios"""
     audio_dir = os.path.join(os.getcwd(), 'saved_audios', username)
     os.makedirs(audio_dir, exist_ok=True)
     base = sanitize_filename(f"{note_id}-audio")
@@ -4719,9 +5005,212 @@ def _save_audio_file(audio_bytes, orig_filename, note_id, username):
     final_path = os.path.join(audio_dir, filename)
     if not is_path_within_directory(audio_dir, final_path):
         raise RuntimeError('Invalid file path')
-    shutil.move(wav_path, final_path)
+    return filename, final_path
+
+def _save_audio_file(artifact, note_id, username):
+    """Archive the artifact's decoded audio as WAV under saved_audios"""
+    filename, final_path = _allocate_audio_file(note_id, username)
+    artifact.write_wav(final_path)
     return filename
 
+def _run_transcription_job(job, input_path):
+    """Queue handler for jobs submitted through /api/jobs"""
+    if not input_path:
+        raise RuntimeError('Job audio not found')
+    params = job.params
+    with open(input_path, 'rb') as f:
+        artifact = AudioArtifact(f.read(), params.get('filename') or 'audio.wav')
+    note_id = params.get('note_id')
+    outcome = _run_transcription_pipeline(
+        artifact,
+        params.get('language'),
+        params.get('provider'),
+        params.get('model'),
+        params.get('detect_emotion', True),
+        params.get('detect_events', True),
+        params.get('use_itn', True),
+        params.get('enable_speaker_diarization', False),
+        save_for=(note_id, job.owner) if note_id else None,
+        progress_callback=lambda info: transcription_queue.update_progress(job.id, **info),
+        diarization_engine=params.get('diarization_engine'),
+        owner=job.owner
+    )
+    result = outcome['result'] or {}
+    if not result.get('success'):
+        raise RuntimeError(result.get('error', 'Error en la transcripción'))
+    return {
+        "transcription": outcome['transcription'],
+        "provider": params.get('provider'),
+        "model": result.get('model'),
+        "language_detected": result.get('language_detected'),
+        "emotion": result.get('emotion'),
+        "events": result.get('events'),
+        "filename": outcome['filename'],
+        "timings": outcome['timings'],
+        "cached": outcome['cached'],
+    }
+
+transcription_queue = get_job_queue()
+transcription_queue.register_handler('transcription', _run_transcription_job)
+
+def _get_owned_job(job_id, username):
+    job = transcription_queue.get(job_id)
+    if not job or (job.owner != username and username != 'admin'):
+        return None
+    return job
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_transcription_job():
+    """Queue a transcription and return its job id immediately"""
+    try:
+        username = get_current_username()
+        if not username:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if 'audio' not in request.files:
+            return jsonify({"error": "No se encontró archivo de audio"}), 400
+        audio_file = request.files['audio']
+        if audio_file.filename == '':
+            return jsonify({"error": "Archivo de audio vacío"}), 400
+
+        provider = request.form.get('provider', 'openai')
+        if provider not in ('openai',) + PCM_PROVIDERS:
+            return jsonify({"error": "Invalid provider"}), 400
+        tp, _ = get_user_providers(username)
+        if tp and provider not in tp:
+            return jsonify({"error": "Transcription provider not allowed"}), 403
+        model = request.form.get('model')
+        if provider not in ('sensevoice', 'remote') and not model:
+            return jsonify({"error": "Model not specified"}), 400
+
+        params = {
+            "filename": audio_file.filename,
+            "language": request.form.get('language') or None,
+            "provider": provider,
+            "model": model,
+            "detect_emotion": request.form.get('detect_emotion', 'true').lower() == 'true',
+            "detect_events": request.form.get('detect_events', 'true').lower() == 'true',
+            "use_itn": request.form.get('use_itn', 'true').lower() == 'true',
+            "enable_speaker_diarization": request.form.get('enable_speaker_diarization', 'false').lower() == 'true',
+            "diarization_engine": request.form.get('diarization_engine') or None,
+            # The audio is archived with the note when a note_id is given
+            "note_id": request.form.get('note_id') or None,
+        }
+        job = transcription_queue.submit('transcription', username, params, audio_file.read())
+        return jsonify({
+            "job_id": job.id,
+            "status": job.status,
+            "queue_position": transcription_queue.position(job.id)
+        }), 202
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 429, {'Retry-After': '30'}
+    except Exception as e:
+        return jsonify({"error": f"Error al encolar transcripción: {str(e)}"}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_transcription_job(job_id):
+    """Return the state (and result, once finished) of a transcription job"""
+    username = get_current_username()
+    if not username:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = _get_owned_job(job_id, username)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.public_dict(transcription_queue.position(job_id)))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def transcription_job_events(job_id):
+    """Stream job state changes as server-sent events until the job finishes"""
+    username = get_current_username()
+    if not username:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = _get_owned_job(job_id, username)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        current = job
+        version = -1
+        while current is not None:
+            if current.version != version:
+                version = current.version
+                yield f"data: {json.dumps(current.public_dict(transcription_queue.position(job_id)))}\n\n"
+                if current.status in FINISHED_STATES:
+                    return
+            else:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+            current = transcription_queue.wait_for_update(job_id, version, timeout=15)
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+# Live SenseVoice recognition: the client posts raw 16 kHz mono PCM while recording
+def _create_stream_recognizer(params):
+    return sensevoice_wrapper.create_stream(
+        params.get('language'),
+        params.get('use_itn', True),
+        partial_interval=float(os.getenv('SENSEVOICE_STREAM_PARTIAL_SECONDS', '1.0')),
+        endpoint_silence=float(os.getenv('SENSEVOICE_STREAM_ENDPOINT_SECONDS', '0.6')),
+    )
+
+# With several worker processes, consecutive chunks may reach different
+# workers, so session state is shared through a directory
+stream_sessions = StreamSessionManager(
+    max_sessions=int(os.getenv('SENSEVOICE_STREAM_MAX_SESSIONS', '8')),
+    idle_timeout=float(os.getenv('SENSEVOICE_STREAM_IDLE_TIMEOUT', '120')),
+    state_dir=(os.getenv('SENSEVOICE_STREAM_STATE_DIR')
+               or os.path.join(tempfile.gettempdir(), f'whispad-streams-{os.getuid()}')) if WEB_WORKERS > 1 else None,
+    factory=_create_stream_recognizer,
+)
+
+def _read_stream_pcm():
+    """Request body as float32 samples (s16le by default, f32le with ?format=f32)"""
+    return pcm_from_bytes(request.get_data(), request.args.get('format', 's16'))
+
+@app.route('/api/sensevoice/stream', methods=['POST'])
+def start_sensevoice_stream():
+    """Open a streaming SenseVoice session"""
+    try:
+        username = get_current_username()
+        if not username:
+            return jsonify({"error": "Unauthorized"}), 401
+        tp, _ = get_user_providers(username)
+        if tp and 'sensevoice' not in tp:
+            return jsonify({"error": "Transcription provider not allowed"}), 403
+        if not provider_registry.is_available('sensevoice'):
+            return jsonify({"error": "SenseVoice no está disponible. Asegúrate de haber descargado el modelo SenseVoiceSmall."}), 500
+        data = request.get_json(silent=True) or {}
+        params = {"language": data.get('language') or None, "use_itn": bool(data.get('use_itn', True))}
+        session = stream_sessions.create(username, _create_stream_recognizer(params), params)
+        if session is None:
+            return jsonify({"error": "Too many live transcriptions, try again later"}), 429, {'Retry-After': '10'}
+        return jsonify({"session_id": session.id, "sample_rate": SAMPLE_RATE, "formats": ["s16", "f32"]})
+    except Exception as e:
+        return jsonify({"error": f"Error starting stream: {str(e)}"}), 500
+
+@app.route('/api/sensevoice/stream/<session_id>', methods=['PUT', 'DELETE'])
+def sensevoice_stream_audio(session_id):
+    """PUT appends a PCM chunk and returns partial/final hypotheses; DELETE finishes the session"""
+    try:
+        username = get_current_username()
+        if not username:
+            return jsonify({"error": "Unauthorized"}), 401
+        with stream_sessions.open(session_id, username) as session:
+            if not session:
+                return jsonify({"error": "Stream not found"}), 404
+            if request.method == 'DELETE':
+                stream_sessions.close(session_id)
+                if request.content_length:
+                    session.recognizer.accept(_read_stream_pcm())
+                final = session.recognizer.finish()
+                return jsonify({"transcription": final["transcript"], "audio_seconds": final["audio_seconds"]})
+            events = session.recognizer.accept(_read_stream_pcm())
+            return jsonify({"events": events, "transcript": session.recognizer.transcript})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error in stream: {str(e)}"}), 500
+
 @app.route('/api/upload-audio', methods=['POST'])
 def upload_audio():
     """Transcribe and store an uploaded audio file linked to a note"""
@@ -4751,47 +5240,38 @@ def upload_audio():
         detect_events = request.form.get('detect_events', 'true').lower() == 'true'
         use_itn = request.form.get('use_itn', 'true').lower() == 'true'
         enable_speaker_diarization = request.form.get('enable_speaker_diarization', 'false').lower() == 'true'
+        diarization_engine = request.form.get('diarization_engine') or None
 
-        audio_bytes = audio_file.read()
+        # Decoded once and shared by transcription, diarization and archiving
+        artifact = AudioArtifact(audio_file.read(), audio_file.filename)
 
-        transcription = _transcribe_bytes(
-            audio_bytes,
-            audio_file.filename,
+        # Archiving runs in parallel with transcription unless skipped
+        outcome = transcription_queue.run_sync(lambda: _run_transcription_pipeline(
+            artifact,
             language,
             provider,
             model,
             detect_emotion,
             detect_events,
             use_itn,
-            enable_speaker_diarization
-        )
+            enable_speaker_diarization,
+            save_for=None if skip_save else (note_id, username),
+            diarization_engine=diarization_engine,
+            owner=username
+        ), username)
+        transcription = outcome['transcription']
 
         if skip_save:
-            return jsonify({"success": True, "transcription": transcription})
-
-        # Convert and save WAV file
-        with tempfile.NamedTemporaryFile(suffix=f".{audio_file.filename.split('.')[-1]}", delete=False) as tmp:
-            tmp.write(audio_bytes)
-            orig_path = tmp.name
+            return jsonify({"success": True, "transcription": transcription, "timings": outcome['timings']})
 
-        wav_path = whisper_wrapper._convert_to_wav(orig_path, audio_file.filename)
-        os.unlink(orig_path)
-
-        audio_dir = os.path.join(os.getcwd(), 'saved_audios', username)
-        os.makedirs(audio_dir, exist_ok=True)
-        base = sanitize_filename(f"{note_id}-audio")
-        counter = 1
-        filename = f"{base}{counter}.wav"
-        while os.path.exists(os.path.join(audio_dir, filename)):
-            counter += 1
-            filename = f"{base}{counter}.wav"
-
-        final_path = os.path.join(audio_dir, filename)
-        if not is_path_within_directory(audio_dir, final_path):
-            return jsonify({"error": "Invalid file path"}), 400
-        shutil.move(wav_path, final_path)
-
-        return jsonify({"success": True, "transcription": transcription, "filename": filename})
+        return jsonify({
+            "success": True,
+            "transcription": transcription,
+            "filename": outcome['filename'],
+            "timings": outcome['timings']
+        })
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 429, {'Retry-After': '30'}
     except Exception as e:
         return jsonify({"error": f"Error al procesar audio: {str(e)}"}), 500
 
@@ -4825,26 +5305,115 @@ def upload_audio_stream():
         detect_events = request.form.get('detect_events', 'true').lower() == 'true'
         use_itn = request.form.get('use_itn', 'true').lower() == 'true'
         enable_speaker_diarization = request.form.get('enable_speaker_diarization', 'false').lower() == 'true'
+        diarization_engine = request.form.get('diarization_engine') or None
 
-        audio_bytes = audio_file.read()
+        workers = max(1, int(os.getenv('STREAM_CHUNK_WORKERS', '2')))
 
-        audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
+        # ffmpeg reads the upload from disk (seekable, so every container works)
+        # and only the chunks in flight are ever held in memory
+        suffix = os.path.splitext(audio_file.filename)[1] or '.audio'
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+            audio_file.save(temp_file)
+            source_path = temp_file.name
+        total_seconds = probe_duration(source_path)
 
         def generate():
-            for start_ms in range(0, len(audio), chunk_duration * 1000):
-                chunk = audio[start_ms:start_ms + chunk_duration * 1000]
-                buf = io.BytesIO()
-                chunk.export(buf, format='wav')
-                text = _transcribe_bytes(buf.getvalue(), audio_file.filename, language, provider, model,
-                                         detect_emotion, detect_events, use_itn, enable_speaker_diarization)
-                yield f"data: {json.dumps({'transcription': text})}\n\n"
-
+            updates = queue.Queue()
+            tracker = TranscriptionProgress(total_seconds or 0, lambda info: None)
+            samples_done = {}
+            progress_lock = threading.Lock()
+            pending = deque()
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stream-chunk')
+            wav_file = None
+            wav_path = None
             filename = None
-            if not skip_save:
-                filename = _save_audio_file(audio_bytes, audio_file.filename, note_id, username)
-                yield f"data: {json.dumps({'done': True, 'filename': filename})}\n\n"
-            else:
-                yield "data: {\"done\": true}\n\n"
+
+            def report(index, length, percent):
+                # Overall progress across chunks that are transcribed in parallel
+                if not total_seconds:
+                    return
+                with progress_lock:
+                    samples_done[index] = length * percent / 100
+                    done = sum(samples_done.values())
+                info = tracker.update(100 * done / (total_seconds * SAMPLE_RATE))
+                if info:
+                    updates.put(info)
+
+            def run_chunk(index, pcm):
+                try:
+                    artifact = AudioArtifact.from_pcm(pcm, audio_file.filename)
+                    text = transcription_queue.run_sync(lambda: _transcribe_artifact(
+                        artifact, language, provider, model,
+                        detect_emotion, detect_events, use_itn, enable_speaker_diarization,
+                        progress_callback=lambda info: report(index, len(pcm), info['percent']),
+                        diarization_engine=diarization_engine
+                    ), username)
+                    report(index, len(pcm), 100)
+                    return text
+                finally:
+                    updates.put(None)  # wake the response loop
+
+            def drain(limit):
+                """Yield progress and finished chunks in recording order until fewer than `limit` are in flight"""
+                while True:
+                    while True:
+                        try:
+                            info = updates.get_nowait()
+                        except queue.Empty:
+                            break
+                        if info:
+                            yield f"data: {json.dumps({'progress': info})}\n\n"
+                    while pending and pending[0].done():
+                        text = pending.popleft().result()
+                        yield f"data: {json.dumps({'transcription': text})}\n\n"
+                    if len(pending) < limit:
+                        return
+                    info = updates.get()
+                    if info:
+                        yield f"data: {json.dumps({'progress': info})}\n\n"
+
+            try:
+                if not skip_save:
+                    filename, wav_path = _allocate_audio_file(note_id, username)
+                    wav_file = wave.open(wav_path, 'wb')
+                    wav_file.setnchannels(1)
+                    wav_file.setsampwidth(2)
+                    wav_file.setframerate(SAMPLE_RATE)
+
+                for index, (_, pcm) in enumerate(stream_pcm_chunks(source_path, chunk_duration)):
+                    if wav_file:
+                        wav_file.writeframes(pcm_to_int16(pcm).tobytes())
+                    pending.append(executor.submit(run_chunk, index, pcm))
+                    # At most `workers` chunks in flight keeps memory bounded
+                    yield from drain(workers + 1)
+                yield from drain(1)
+
+                if wav_file:
+                    wav_file.close()
+                    wav_file = None
+                    yield f"data: {json.dumps({'done': True, 'filename': filename})}\n\n"
+                else:
+                    yield "data: {\"done\": true}\n\n"
+            except Exception as e:
+                # A half-written recording is not kept
+                if wav_file:
+                    wav_file.close()
+                    wav_file = None
+                    try:
+                        os.remove(wav_path)
+                    except OSError:
+                        pass
+                yield f"data: {json.dumps({'error': f'Error al procesar audio: {str(e)}'})}\n\n"
+            finally:
+                if wav_file:
+                    wav_file.close()
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=False)
+                try:
+                    os.unlink(source_path)
+                except OSError:
+                    pass
 
         return Response(generate(), mimetype='text/event-stream')
     except Exception as e:
@@ -4869,28 +5438,8 @@ def save_audio():
         if audio_file.filename == '':
             return jsonify({"error": "Archivo de audio vacío"}), 400
 
-        audio_bytes = audio_file.read()
-
-        with tempfile.NamedTemporaryFile(suffix=f".{audio_file.filename.split('.')[-1]}", delete=False) as tmp:
-            tmp.write(audio_bytes)
-            orig_path = tmp.name
-
-        wav_path = whisper_wrapper._convert_to_wav(orig_path, audio_file.filename)
-        os.unlink(orig_path)
-
-        audio_dir = os.path.join(os.getcwd(), 'saved_audios', username)
-        os.makedirs(audio_dir, exist_ok=True)
-        base = sanitize_filename(f"{note_id}-audio")
-        counter = 1
-        filename = f"{base}{counter}.wav"
-        while os.path.exists(os.path.join(audio_dir, filename)):
-            counter += 1
-            filename = f"{base}{counter}.wav"
-
-        final_path = os.path.join(audio_dir, filename)
-        if not is_path_within_directory(audio_dir, final_path):
-            return jsonify({"error": "Invalid file path"}), 400
-        shutil.move(wav_path, final_path)
+        artifact = AudioArtifact(audio_file.read(), audio_file.filename)
+        filename = _save_audio_file(artifact, note_id, username)
 
         return jsonify({"success": True, "filename": filename})
     except Exception as e:
@@ -4981,6 +5530,11 @@ def delete_audio():
         filepath = os.path.join(audio_dir, sanitize_filename(filename))
         if not is_path_within_directory(audio_dir, filepath) or not os.path.exists(filepath):
             return jsonify({"error": "File not found"}), 404
+        store = get_diarization_store()
+        if store:
+            # Hashed in chunks; saved recordings can be hundreds of MB
+            with open(filepath, 'rb') as f:
+                store.delete(username, hashlib.file_digest(f, 'sha256').hexdigest())
         os.remove(filepath)
         return jsonify({"success": True})
     except Exception as e:
@@ -5011,11 +5565,15 @@ def upload_model():
         if not is_path_within_directory(models_dir, filepath):
             return jsonify({"error": "Invalid file path"}), 400
         overwritten = os.path.exists(filepath)
+        if overwritten:
+            # Workers still hold the old weights in memory
+            _stop_whisper_model(filepath)
 
         # Save incrementally to handle very large files without exhausting memory
         with open(filepath, 'wb') as f:
             for chunk in iter(lambda: model_file.stream.read(8192), b''):
                 f.write(chunk)
+        _invalidate_model_providers()
 
         return jsonify({"success": True, "filename": filename, "overwritten": overwritten})
     except Exception as e:
@@ -5068,6 +5626,8 @@ def download_model():
             yield f"data: {json.dumps({'done': True, 'filename': os.path.basename(filename)})}\n\n"
         except Exception as e:
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            _invalidate_model_providers()
 
     return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
@@ -5247,6 +5807,8 @@ def download_sensevoice():
                 
             except Exception as e:
                 yield f"data: {json.dumps({'error': f'SenseVoice download failed: {str(e)}'})}\n\n"
+            finally:
+                _invalidate_model_providers()
 
         return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
         
@@ -5257,13 +5819,10 @@ def download_sensevoice():
 def refresh_providers():
     """Force refresh of transcription providers availability"""
     try:
-        # This endpoint forces a fresh check of all providers
-        # The actual refresh happens automatically when /api/transcription-providers is called
-        # since we now check availability dynamically
-        
-        # Log current status for debugging
-        whisper_available = WHISPER_CPP_AVAILABLE and whisper_wrapper
-        sensevoice_available = sensevoice_wrapper and sensevoice_wrapper.is_available()
+        # Drop every cached availability check and run them again
+        refreshed = provider_registry.refresh()
+        whisper_available = bool(refreshed.get('local'))
+        sensevoice_available = bool(refreshed.get('sensevoice'))
         
         print(f"Provider refresh requested:")
         print(f"  - Whisper.cpp available: {whisper_available}")
@@ -5281,6 +5840,134 @@ def refresh_providers():
     except Exception as e:
         return jsonify({"error": f"Error refreshing providers: {str(e)}"}), 500
 
+@app.route('/api/whisper-workers', methods=['GET'])
+def whisper_workers_status():
+    """Report the whisper.cpp worker pool state and queue depth"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        if not whisper_wrapper:
+            return jsonify({"enabled": False})
+        return jsonify(whisper_wrapper.get_pool_status())
+    except Exception as e:
+        return jsonify({"error": f"Error reading worker status: {str(e)}"}), 500
+
+@app.route('/api/sensevoice-batcher', methods=['GET'])
+def sensevoice_batcher_status():
+    """Report SenseVoice micro-batching throughput"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        if not sensevoice_wrapper:
+            return jsonify({"enabled": False})
+        return jsonify(sensevoice_wrapper.get_batch_stats())
+    except Exception as e:
+        return jsonify({"error": f"Error reading batcher status: {str(e)}"}), 500
+
+@app.route('/api/compute-scheduler', methods=['GET'])
+def compute_scheduler_status():
+    """Report how the CPU thread budget is shared by running inference jobs"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        return jsonify(get_compute_scheduler().get_stats())
+    except Exception as e:
+        return jsonify({"error": f"Error reading compute scheduler: {str(e)}"}), 500
+
+@app.route('/api/http-clients', methods=['GET'])
+def http_clients_status():
+    """Report connection reuse of the pooled AI provider clients"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        stats = http_clients.get_http_clients().get_stats()
+        stats["async_runtime"] = get_async_runtime().get_stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": f"Error reading HTTP clients: {str(e)}"}), 500
+
+@app.route('/api/remote-workers', methods=['GET', 'POST'])
+def remote_workers_status():
+    """Report worker node health and load; POST re-runs the health checks now"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        if not remote_workers:
+            return jsonify({"enabled": False, "nodes": []})
+        if request.method == 'POST':
+            remote_workers.check_health()
+        stats = remote_workers.get_stats()
+        stats["enabled"] = True
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": f"Error reading remote workers: {str(e)}"}), 500
+
+@app.route('/api/inference-server', methods=['GET'])
+def inference_server_status():
+    """Report the out-of-process inference server, when enabled"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        if not inference_client:
+            return jsonify({"enabled": False})
+        return jsonify({
+            "enabled": True,
+            "client": inference_client.get_stats(),
+            "server": inference_client.call('stats', timeout=10),
+        })
+    except Exception as e:
+        return jsonify({"error": f"Error reading inference server: {str(e)}"}), 500
+
+@app.route('/api/resident-models', methods=['GET', 'POST'])
+def resident_models():
+    """List resident speech models, or unload/pin/unpin one of them"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        registry = get_model_registry()
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            name = data.get('name')
+            action = data.get('action')
+            if not name or action not in ('unload', 'pin', 'unpin'):
+                return jsonify({"error": "name and a valid action (unload, pin, unpin) are required"}), 400
+            if action == 'unload':
+                if not registry.evict(name):
+                    return jsonify({"error": "Model is not resident, pinned or in use"}), 409
+            else:
+                registry.set_pinned(name, action == 'pin')
+        return jsonify(registry.get_status())
+    except Exception as e:
+        return jsonify({"error": f"Error reading resident models: {str(e)}"}), 500
+
+@app.route('/api/transcription-cache', methods=['GET', 'DELETE'])
+def transcription_cache_status():
+    """Report transcription cache hit/miss counters, or clear the cache"""
+    try:
+        username = get_current_username()
+        if username != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+        cache = get_transcription_cache()
+        if not cache:
+            return jsonify({"enabled": False})
+        if request.method == 'DELETE':
+            cache.clear()
+        stats = cache.get_stats()
+        stats['enabled'] = True
+        store = get_diarization_store()
+        if store:
+            stats['diarization_store'] = store.get_stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": f"Error reading transcription cache: {str(e)}"}), 500
+
 # New endpoints to manage downloaded whisper.cpp models
 
 @app.route('/api/list-models', methods=['GET'])
@@ -5323,7 +6010,7 @@ def get_lmstudio_models():
 
     try:
         url = f"http://{host}:{port}/v1/models"
-        response = requests.get(url, timeout=5)
+        response = http_clients.get(url, timeout=5)
         if response.status_code != 200:
             return jsonify({"error": f"LM Studio error {response.status_code}"}), response.status_code
         return jsonify(response.json())
@@ -5349,11 +6036,13 @@ def delete_model():
             return jsonify({"error": "Invalid file path"}), 400
 
         if os.path.isfile(target):
+            _stop_whisper_model(target)
             os.remove(target)
         elif os.path.isdir(target):
             shutil.rmtree(target)
         else:
             return jsonify({"error": "Modelo no encontrado"}), 404
+        _invalidate_model_providers()
 
         return jsonify({"success": True, "deleted": os.path.basename(target)})
     except Exception as e:
@@ -5422,19 +6111,18 @@ def get_transcription_providers():
             })
         
         # Verificar whisper.cpp local
-        if WHISPER_CPP_AVAILABLE and whisper_wrapper:
-            models = whisper_wrapper.get_available_models()
+        if provider_registry.is_available('local'):
             providers.append({
                 "id": "local",
                 "name": "Local Whisper",
                 "description": "Local transcription using whisper.cpp",
                 "available": True,
-                "models": [model["name"] for model in models],
+                "models": provider_registry.get('local_models') or [],
                 "privacy": "Full privacy - no data leaves your device"
             })
         
-        # Verificar SenseVoice (check availability dynamically)
-        sensevoice_available = sensevoice_wrapper and sensevoice_wrapper.is_available()
+        # Verificar SenseVoice (cached until models change or providers are refreshed)
+        sensevoice_available = provider_registry.is_available('sensevoice')
         if sensevoice_available:
             model_info = sensevoice_wrapper.get_model_info()
             providers.append({
@@ -5450,9 +6138,23 @@ def get_transcription_providers():
                 "privacy": "Full privacy - no data leaves your device"
             })
         
+        # Remote worker nodes (availability follows their health checks)
+        if remote_workers and remote_workers.is_available():
+            models = remote_workers.models()
+            if remote_workers.is_available('sensevoice'):
+                models = ["SenseVoiceSmall"] + models
+            providers.append({
+                "id": "remote",
+                "name": "Remote workers",
+                "description": "Transcription on WhisPad worker nodes",
+                "available": True,
+                "models": models,
+                "nodes": sum(1 for node in remote_workers.get_stats()["nodes"] if node["healthy"]),
+            })
+
         return jsonify({
             "providers": providers,
-            "default": "openai" if OPENAI_API_KEY else ("sensevoice" if sensevoice_available else ("local" if WHISPER_CPP_AVAILABLE else None))
+            "default": "openai" if OPENAI_API_KEY else ("sensevoice" if sensevoice_available else ("local" if provider_registry.is_available('local') else None))
         })
         
     except Exception as e:
@@ -6344,19 +7046,14 @@ def generate_quiz():
         return jsonify({"error": f"API key not configured for {ai_provider}"}), 400
     
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Import the generic AI function
+        from ai_reprocess import call_ai_generic
         
-        try:
-            # Import the generic AI function
-            from ai_reprocess import call_ai_generic
-            
-            # Create the prompt for quiz generation with randomization
-            import random
-            random_seed = random.randint(1000, 9999)
-            
-            prompt = f"""Generate a quiz with {num_questions} multiple choice questions based on the following content. 
+        # Create the prompt for quiz generation with randomization
+        import random
+        random_seed = random.randint(1000, 9999)
+        
+        prompt = f"""Generate a quiz with {num_questions} multiple choice questions based on the following content. 
             Difficulty level: {difficulty}
             Random seed: {random_seed} (use this to ensure different questions each time)
             
@@ -6382,118 +7079,115 @@ def generate_quiz():
             - Generate DIFFERENT questions each time, avoid repetition
             - Focus on different aspects and angles of the content
             - Only respond with valid JSON, no additional text"""
-            
-            # Prepare arguments based on provider type
-            if ai_provider in ['lmstudio', 'ollama']:
-                response = loop.run_until_complete(
-                    call_ai_generic(prompt, ai_provider, 
-                                    api_key=None, ai_model=ai_model, host=host, port=port)
-                )
-            else:
-                response = loop.run_until_complete(
-                    call_ai_generic(prompt, ai_provider, 
-                                    api_key=api_key, ai_model=ai_model)
-                )
-            
-            if not response:
-                return jsonify({"error": "No response from AI"}), 500
-            
-            # Parse the JSON response with robust extraction
+        
+        # Prepare arguments based on provider type
+        if ai_provider in ['lmstudio', 'ollama']:
+            response = run_async(
+                call_ai_generic(prompt, ai_provider, 
+                                api_key=None, ai_model=ai_model, host=host, port=port)
+            )
+        else:
+            response = run_async(
+                call_ai_generic(prompt, ai_provider, 
+                                api_key=api_key, ai_model=ai_model)
+            )
+        
+        if not response:
+            return jsonify({"error": "No response from AI"}), 500
+        
+        # Parse the JSON response with robust extraction
+        try:
+            # First try direct JSON parsing
             try:
-                # First try direct JSON parsing
-                try:
-                    quiz_data = json.loads(response.strip())
-                except json.JSONDecodeError:
-                    # If that fails, use pattern-based extraction
-                    import re
-                    patterns = [
-                        r'```json\s*(\{.*?\})\s*```',
-                        r'```\s*(\{.*?\})\s*```',
-                        r'\{[^{}]*"questions"[^{}]*\[[^\]]*\][^{}]*\}',
-                        r'(\{.*?"questions".*?\[.*?\].*?\})',
-                    ]
-                    
-                    quiz_data = None
-                    for pattern in patterns:
-                        matches = re.findall(pattern, response, re.DOTALL | re.IGNORECASE)
-                        for match in matches:
-                            try:
-                                quiz_data = json.loads(match)
-                                if isinstance(quiz_data, dict) and 'questions' in quiz_data:
-                                    break
-                            except json.JSONDecodeError:
-                                continue
-                        if quiz_data:
-                            break
-                    
-                    if not quiz_data:
-                        raise json.JSONDecodeError("No valid JSON found", response, 0)
+                quiz_data = json.loads(response.strip())
+            except json.JSONDecodeError:
+                # If that fails, use pattern-based extraction
+                import re
+                patterns = [
+                    r'```json\s*(\{.*?\})\s*```',
+                    r'```\s*(\{.*?\})\s*```',
+                    r'\{[^{}]*"questions"[^{}]*\[[^\]]*\][^{}]*\}',
+                    r'(\{.*?"questions".*?\[.*?\].*?\})',
+                ]
                 
-                # Validate structure
-                if 'questions' not in quiz_data or not isinstance(quiz_data['questions'], list):
-                    raise ValueError("Invalid quiz format")
+                quiz_data = None
+                for pattern in patterns:
+                    matches = re.findall(pattern, response, re.DOTALL | re.IGNORECASE)
+                    for match in matches:
+                        try:
+                            quiz_data = json.loads(match)
+                            if isinstance(quiz_data, dict) and 'questions' in quiz_data:
+                                break
+                        except json.JSONDecodeError:
+                            continue
+                    if quiz_data:
+                        break
                 
-                # Ensure all questions have proper format
-                for i, question in enumerate(quiz_data['questions']):
-                    if not isinstance(question, dict):
-                        raise ValueError(f"Question {i+1} is not a dict")
-                    
-                    if 'question' not in question or 'answers' not in question:
-                        raise ValueError(f"Question {i+1} missing required fields")
-                    
-                    # Support both 'correct' and 'correct_answer'
-                    if 'correct' not in question and 'correct_answer' not in question:
-                        raise ValueError(f"Question {i+1} missing correct answer field")
-                    
-                    # Normalize to 'correct_answer'
-                    if 'correct' in question and 'correct_answer' not in question:
-                        question['correct_answer'] = question.pop('correct')
+                if not quiz_data:
+                    raise json.JSONDecodeError("No valid JSON found", response, 0)
+            
+            # Validate structure
+            if 'questions' not in quiz_data or not isinstance(quiz_data['questions'], list):
+                raise ValueError("Invalid quiz format")
+            
+            # Ensure all questions have proper format
+            for i, question in enumerate(quiz_data['questions']):
+                if not isinstance(question, dict):
+                    raise ValueError(f"Question {i+1} is not a dict")
                 
-                print(f"Successfully parsed quiz with {len(quiz_data['questions'])} questions")
+                if 'question' not in question or 'answers' not in question:
+                    raise ValueError(f"Question {i+1} missing required fields")
                 
-                # Save individual questions to database instead of saving as a batch
-                try:
-                    from db import save_individual_study_items
-                    import datetime
-                    # Generate base title from first words of content with timestamp
-                    title_words = note_content.strip().split()[:6]
-                    base_title = " ".join(title_words) + ("..." if len(title_words) >= 6 else "")
-                    timestamp = datetime.datetime.now().strftime("%H:%M")
-                    base_title = f"Quiz: {base_title} ({timestamp})"
-                    
-                    # Save each question individually
-                    saved_ids = save_individual_study_items(
-                        username=username,
-                        item_type='quiz',
-                        items=quiz_data['questions'],
-                        source_content=note_content,
-                        base_title=base_title,
-                        note_id=note_id
-                    )
-                    
-                    # Return the first ID as study_id for compatibility
-                    if saved_ids:
-                        quiz_data['study_id'] = saved_ids[0]
-                        quiz_data['individual_ids'] = saved_ids
-                        print(f"NEW {len(saved_ids)} individual questions saved to database with IDs: {saved_ids}")
-                    else:
-                        print("Warning: No questions were saved to database")
-                except Exception as e:
-                    print(f"Warning: Could not save questions to database: {e}")
-                    # Continue without failing the request
+                # Support both 'correct' and 'correct_answer'
+                if 'correct' not in question and 'correct_answer' not in question:
+                    raise ValueError(f"Question {i+1} missing correct answer field")
                 
-                return jsonify(quiz_data)
+                # Normalize to 'correct_answer'
+                if 'correct' in question and 'correct_answer' not in question:
+                    question['correct_answer'] = question.pop('correct')
+            
+            print(f"Successfully parsed quiz with {len(quiz_data['questions'])} questions")
+            
+            # Save individual questions to database instead of saving as a batch
+            try:
+                from db import save_individual_study_items
+                import datetime
+                # Generate base title from first words of content with timestamp
+                title_words = note_content.strip().split()[:6]
+                base_title = " ".join(title_words) + ("..." if len(title_words) >= 6 else "")
+                timestamp = datetime.datetime.now().strftime("%H:%M")
+                base_title = f"Quiz: {base_title} ({timestamp})"
                 
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error: {e}")
-                print(f"Raw response: {response}")
-                return jsonify({"error": "Invalid JSON response from AI"}), 500
-            except ValueError as e:
-                print(f"Quiz format error: {e}")
-                return jsonify({"error": "Invalid quiz format from AI"}), 500
+                # Save each question individually
+                saved_ids = save_individual_study_items(
+                    username=username,
+                    item_type='quiz',
+                    items=quiz_data['questions'],
+                    source_content=note_content,
+                    base_title=base_title,
+                    note_id=note_id
+                )
                 
-        finally:
-            loop.close()
+                # Return the first ID as study_id for compatibility
+                if saved_ids:
+                    quiz_data['study_id'] = saved_ids[0]
+                    quiz_data['individual_ids'] = saved_ids
+                    print(f"NEW {len(saved_ids)} individual questions saved to database with IDs: {saved_ids}")
+                else:
+                    print("Warning: No questions were saved to database")
+            except Exception as e:
+                print(f"Warning: Could not save questions to database: {e}")
+                # Continue without failing the request
+            
+            return jsonify(quiz_data)
+            
+        except json.JSONDecodeError as e:
+            print(f"JSON parsing error: {e}")
+            print(f"Raw response: {response}")
+            return jsonify({"error": "Invalid JSON response from AI"}), 500
+        except ValueError as e:
+            print(f"Quiz format error: {e}")
+            return jsonify({"error": "Invalid quiz format from AI"}), 500
             
     except Exception as e:
         print(f"Quiz generation error: {str(e)}")
@@ -6562,19 +7256,14 @@ def generate_flashcards():
         return jsonify({"error": f"API key not configured for {ai_provider}"}), 400
     
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Import the generic AI function
+        from ai_reprocess import call_ai_generic
         
-        try:
-            # Import the generic AI function
-            from ai_reprocess import call_ai_generic
-            
-            # Create the prompt for flashcard generation with randomization
-            import random
-            random_seed = random.randint(1000, 9999)
-            
-            prompt = f"""Generate {num_cards} flashcards based on the following content. Each flashcard should have a front (question/term) and back (answer/definition).
+        # Create the prompt for flashcard generation with randomization
+        import random
+        random_seed = random.randint(1000, 9999)
+        
+        prompt = f"""Generate {num_cards} flashcards based on the following content. Each flashcard should have a front (question/term) and back (answer/definition).
             Random seed: {random_seed} (use this to ensure different flashcards each time)
             
             Content:
@@ -6597,115 +7286,126 @@ def generate_flashcards():
             - Generate DIFFERENT flashcards each time, avoid repetition
             - Explore different concepts and angles from the content
             - Only respond with valid JSON, no additional text"""
-            
-            # Prepare arguments based on provider type
-            if ai_provider in ['lmstudio', 'ollama']:
-                response = loop.run_until_complete(
-                    call_ai_generic(prompt, ai_provider, 
-                                    api_key=None, ai_model=ai_model, host=host, port=port)
-                )
-            else:
-                response = loop.run_until_complete(
-                    call_ai_generic(prompt, ai_provider, 
-                                    api_key=api_key, ai_model=ai_model)
-                )
-            
-            if not response:
-                return jsonify({"error": "No response from AI"}), 500
-            
-            # Parse the JSON response with robust extraction
+        
+        # Prepare arguments based on provider type
+        if ai_provider in ['lmstudio', 'ollama']:
+            response = run_async(
+                call_ai_generic(prompt, ai_provider, 
+                                api_key=None, ai_model=ai_model, host=host, port=port)
+            )
+        else:
+            response = run_async(
+                call_ai_generic(prompt, ai_provider, 
+                                api_key=api_key, ai_model=ai_model)
+            )
+        
+        if not response:
+            return jsonify({"error": "No response from AI"}), 500
+        
+        # Parse the JSON response with robust extraction
+        try:
+            # First try direct JSON parsing
             try:
-                # First try direct JSON parsing
-                try:
-                    flashcards_data = json.loads(response.strip())
-                except json.JSONDecodeError:
-                    # If that fails, use pattern-based extraction
-                    import re
-                    patterns = [
-                        r'```json\s*(\{.*?\})\s*```',
-                        r'```\s*(\{.*?\})\s*```',
-                        r'\{[^{}]*"flashcards"[^{}]*\[[^\]]*\][^{}]*\}',
-                        r'(\{.*?"flashcards".*?\[.*?\].*?\})',
-                    ]
-                    
-                    flashcards_data = None
-                    for pattern in patterns:
-                        matches = re.findall(pattern, response, re.DOTALL | re.IGNORECASE)
-                        for match in matches:
-                            try:
-                                flashcards_data = json.loads(match)
-                                if isinstance(flashcards_data, dict) and 'flashcards' in flashcards_data:
-                                    break
-                            except json.JSONDecodeError:
-                                continue
-                        if flashcards_data:
-                            break
-                    
-                    if not flashcards_data:
-                        raise json.JSONDecodeError("No valid JSON found", response, 0)
-                
-                # Validate structure
-                if 'flashcards' not in flashcards_data or not isinstance(flashcards_data['flashcards'], list):
-                    raise ValueError("Invalid flashcards format")
-                
-                # Ensure all flashcards have proper format
-                for i, card in enumerate(flashcards_data['flashcards']):
-                    if not isinstance(card, dict):
-                        raise ValueError(f"Flashcard {i+1} is not a dict")
-                    
-                    if 'front' not in card or 'back' not in card:
-                        raise ValueError(f"Flashcard {i+1} missing required fields")
+                flashcards_data = json.loads(response.strip())
+            except json.JSONDecodeError:
+                # If that fails, use pattern-based extraction
+                import re
+                patterns = [
+                    r'```json\s*(\{.*?\})\s*```',
+                    r'```\s*(\{.*?\})\s*```',
+                    r'\{[^{}]*"flashcards"[^{}]*\[[^\]]*\][^{}]*\}',
+                    r'(\{.*?"flashcards".*?\[.*?\].*?\})',
+                ]
                 
-                print(f"Successfully parsed flashcards with {len(flashcards_data['flashcards'])} cards")
+                flashcards_data = None
+                for pattern in patterns:
+                    matches = re.findall(pattern, response, re.DOTALL | re.IGNORECASE)
+                    for match in matches:
+                        try:
+                            flashcards_data = json.loads(match)
+                            if isinstance(flashcards_data, dict) and 'flashcards' in flashcards_data:
+                                break
+                        except json.JSONDecodeError:
+                            continue
+                    if flashcards_data:
+                        break
                 
-                # Save individual flashcards to database instead of saving as a batch
-                try:
-                    from db import save_individual_study_items
-                    import datetime
-                    # Generate base title from first words of content with timestamp
-                    title_words = note_content.strip().split()[:6]
-                    base_title = " ".join(title_words) + ("..." if len(title_words) >= 6 else "")
-                    timestamp = datetime.datetime.now().strftime("%H:%M")
-                    base_title = f"Flashcards: {base_title} ({timestamp})"
-                    
-                    # Save each flashcard individually
-                    saved_ids = save_individual_study_items(
-                        username=username,
-                        item_type='flashcards',
-                        items=flashcards_data['flashcards'],
-                        source_content=note_content,
-                        base_title=base_title,
-                        note_id=note_id
-                    )
-                    
-                    # Return the first ID as study_id for compatibility
-                    if saved_ids:
-                        flashcards_data['study_id'] = saved_ids[0]
-                        flashcards_data['individual_ids'] = saved_ids
-                        print(f"NEW {len(saved_ids)} individual flashcards saved to database with IDs: {saved_ids}")
-                    else:
-                        print("Warning: No flashcards were saved to database")
-                except Exception as e:
-                    print(f"Warning: Could not save flashcards to database: {e}")
-                    # Continue without failing the request
+                if not flashcards_data:
+                    raise json.JSONDecodeError("No valid JSON found", response, 0)
+            
+            # Validate structure
+            if 'flashcards' not in flashcards_data or not isinstance(flashcards_data['flashcards'], list):
+                raise ValueError("Invalid flashcards format")
+            
+            # Ensure all flashcards have proper format
+            for i, card in enumerate(flashcards_data['flashcards']):
+                if not isinstance(card, dict):
+                    raise ValueError(f"Flashcard {i+1} is not a dict")
                 
-                return jsonify(flashcards_data)
+                if 'front' not in card or 'back' not in card:
+                    raise ValueError(f"Flashcard {i+1} missing required fields")
+            
+            print(f"Successfully parsed flashcards with {len(flashcards_data['flashcards'])} cards")
+            
+            # Save individual flashcards to database instead of saving as a batch
+            try:
+                from db import save_individual_study_items
+                import datetime
+                # Generate base title from first words of content with timestamp
+                title_words = note_content.strip().split()[:6]
+                base_title = " ".join(title_words) + ("..." if len(title_words) >= 6 else "")
+                timestamp = datetime.datetime.now().strftime("%H:%M")
+                base_title = f"Flashcards: {base_title} ({timestamp})"
                 
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error: {e}")
-                print(f"Raw response: {response}")
-                return jsonify({"error": "Invalid JSON response from AI"}), 500
-            except ValueError as e:
-                print(f"Flashcards format error: {e}")
-                return jsonify({"error": "Invalid flashcards format from AI"}), 500
+                # Save each flashcard individually
+                saved_ids = save_individual_study_items(
+                    username=username,
+                    item_type='flashcards',
+                    items=flashcards_data['flashcards'],
+                    source_content=note_content,
+                    base_title=base_title,
+                    note_id=note_id
+                )
                 
-        finally:
-            loop.close()
+                # Return the first ID as study_id for compatibility
+                if saved_ids:
+                    flashcards_data['study_id'] = saved_ids[0]
+                    flashcards_data['individual_ids'] = saved_ids
+                    print(f"NEW {len(saved_ids)} individual flashcards saved to database with IDs: {saved_ids}")
+                else:
+                    print("Warning: No flashcards were saved to database")
+            except Exception as e:
+                print(f"Warning: Could not save flashcards to database: {e}")
+                # Continue without failing the request
+            
+            return jsonify(flashcards_data)
+            
+        except json.JSONDecodeError as e:
+            print(f"JSON parsing error: {e}")
+            print(f"Raw response: {response}")
+            return jsonify({"error": "Invalid JSON response from AI"}), 500
+        except ValueError as e:
+            print(f"Flashcards format error: {e}")
+            return jsonify({"error": "Invalid flashcards format from AI"}), 500
             
     except Exception as e:
         print(f"Flashcards generation error: {str(e)}")
         return jsonify({"error": f"Flashcards generation failed: {str(e)}"}), 500
 
+def start_background_services():
+    """
+    Start queue workers, model warm-up and remote node health checks.
+    Threads do not survive fork(), so when gunicorn preloads the app it calls
+    this in every worker after forking instead.
+    """
+    transcription_queue.start()
+    model_warmup.start(configured_models())
+    if remote_workers:
+        remote_workers.start()
+
+if os.getenv('WHISPAD_PRELOAD', 'false').lower() != 'true':
+    start_background_services()
+
 if __name__ == '__main__':
     port = int(os.getenv('BACKEND_PORT', 8000))
     debug = os.getenv('DEBUG', 'False').lower() == 'true'
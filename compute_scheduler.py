@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+WhisPad compute scheduler
+One process-wide budget of CPU threads shared by whisper.cpp, SenseVoice and
+pyannote. Each inference job reserves threads before it runs and gets a fair
+share of the cores given how many jobs are running or waiting; when the
+budget is used up, jobs wait in arrival order instead of oversubscribing
+the machine.
+
+PyTorch's thread count (torch.set_num_threads) is process-wide rather than
+per job, so PyTorch jobs (SenseVoice on the torch engine, pyannote) run one
+at a time behind a lock. Each one sets its own grant and runs with it; they
+still overlap with whisper.cpp and ONNX Runtime jobs.
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ComputeScheduler:
+    """
+    Thread budget with FIFO admission.
+
+    A job asks for up to `want` threads and needs at least `minimum`; it is
+    granted min(want, fair share, free threads) once that reaches minimum
+    and every earlier job has been admitted. Engines whose thread count is
+    fixed when they start (whisper.cpp servers, ONNX Runtime sessions) ask
+    for want == minimum. Reservations are reentrant: a thread that already
+    holds threads reuses its grant instead of waiting for more.
+    """
+
+    def __init__(self, total_threads: int, max_threads_per_job: Optional[int] = None):
+        self.total_threads = max(1, total_threads)
+        self.max_threads_per_job = min(self.total_threads, max_threads_per_job or self.total_threads)
+        self.in_use = 0
+        self.granted = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self._active: Dict[int, Dict[str, Any]] = {}  # ticket -> job
+        self._waiting: "deque[int]" = deque()
+        self._next_ticket = 0
+        self._local = threading.local()
+        self._torch_lock = threading.RLock()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _share(self) -> int:
+        """Fair share of the budget for the jobs running or waiting"""
+        jobs = len(self._active) + len(self._waiting)
+        return max(1, self.total_threads // max(1, jobs))
+
+    def acquire(self, name: str, want: Optional[int] = None, minimum: int = 1,
+                timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Reserve threads for a job, waiting while the budget is exhausted
+
+        Returns:
+            Ticket to pass to release(), or None on timeout
+        """
+        want = min(want or self.max_threads_per_job, self.total_threads)
+        minimum = max(1, min(minimum, want))
+        deadline = None if timeout is None else time.time() + timeout
+        started = time.time()
+        with self._changed:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket:
+                        grant = min(want, max(minimum, self._share()), self.total_threads - self.in_use)
+                        if grant >= minimum:
+                            break
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        return None
+                    self._changed.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                # The next job in line may fit in what is left
+                self._changed.notify_all()
+            waited = time.time() - started
+            self.in_use += grant
+            self.granted += 1
+            if waited > 0.001:
+                self.waited += 1
+            self.total_wait += waited
+            self._active[ticket] = {"name": name, "threads": grant, "started_at": time.time()}
+        return ticket
+
+    def threads_for(self, ticket: int) -> int:
+        with self._lock:
+            return self._active[ticket]["threads"]
+
+    def release(self, ticket: int):
+        with self._changed:
+            job = self._active.pop(ticket, None)
+            if job:
+                self.in_use -= job["threads"]
+            self._changed.notify_all()
+
+    @contextmanager
+    def threads(self, name: str, want: Optional[int] = None, minimum: int = 1) -> Iterator[int]:
+        """Reserve threads for the duration of a block and yield how many were granted"""
+        held = getattr(self._local, 'threads', None)
+        if held:
+            yield held
+            return
+        ticket = self.acquire(name, want, minimum)
+        self._local.threads = self.threads_for(ticket)
+        try:
+            yield self._local.threads
+        finally:
+            self._local.threads = None
+            self.release(ticket)
+
+    @contextmanager
+    def torch_threads(self, name: str, want: Optional[int] = None) -> Iterator[int]:
+        """
+        Like threads(), for a PyTorch job: holds the torch lock, so the
+        process-wide torch.set_num_threads() stays at this job's grant until
+        it finishes
+        """
+        # The lock comes first so a job waiting for it does not hold threads
+        with self._torch_lock, self.threads(name, want) as threads:
+            try:
+                import torch
+                torch.set_num_threads(threads)
+            except ImportError:
+                pass
+            yield threads
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "total_threads": self.total_threads,
+                "max_threads_per_job": self.max_threads_per_job,
+                "in_use": self.in_use,
+                "running": [
+                    {"name": job["name"], "threads": job["threads"],
+                     "seconds": round(time.time() - job["started_at"], 2)}
+                    for job in self._active.values()
+                ],
+                "waiting": len(self._waiting),
+                "granted": self.granted,
+                "waited": self.waited,
+                "avg_wait_ms": round(1000 * self.total_wait / self.granted, 2) if self.granted else 0.0,
+            }
+
+
+_compute_scheduler = None
+
+
+def get_compute_scheduler() -> ComputeScheduler:
+    """
+    Get the global scheduler, sized by COMPUTE_THREADS (default: the cores
+    divided among the WEB_WORKERS processes)
+    """
+    global _compute_scheduler
+    if _compute_scheduler is None:
+        workers = max(1, int(os.getenv('WEB_WORKERS', '1')))
+        total = int(os.getenv('COMPUTE_THREADS') or (os.cpu_count() or 4) // workers)
+        per_job = int(os.getenv('COMPUTE_MAX_THREADS_PER_JOB') or 0) or None
+        _compute_scheduler = ComputeScheduler(total, per_job)
+        logger.info(f"Compute scheduler: {_compute_scheduler.total_threads} threads, "
+                    f"at most {_compute_scheduler.max_threads_per_job} per job")
+    return _compute_scheduler
@@ -1709,8 +1709,8 @@ async def _call_openai_filtering_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1740,8 +1740,8 @@ async def _call_openrouter_filtering_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1771,8 +1771,8 @@ async def _call_google_filtering_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1800,8 +1800,8 @@ async def _call_groq_filtering_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1829,8 +1829,8 @@ async def _call_groq_ai_nodes_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1861,8 +1861,8 @@ async def _call_openai_ai_nodes_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1895,8 +1895,8 @@ async def _call_openrouter_ai_nodes_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1929,8 +1929,8 @@ async def _call_google_ai_nodes_api(prompt, api_key, model=None):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1957,8 +1957,8 @@ async def _call_lmstudio_ai_nodes_api(prompt, model, host, port):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -1984,8 +1984,8 @@ async def _call_ollama_ai_nodes_api(prompt, model, host, port):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -2012,8 +2012,8 @@ async def _call_lmstudio_filtering_api(prompt, model, host, port):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -2036,8 +2036,8 @@ async def _call_ollama_filtering_api(prompt, model, host, port):
     }
     
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
+        from http_clients import pooled_aiohttp_session
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -2089,7 +2089,7 @@ async def enhance_terms_with_ai(terms, text, ai_provider=None, api_key=None, ai_
         return terms, {}
     
     try:
-        import aiohttp
+        from http_clients import pooled_aiohttp_session
         import json
         
         # Prepare prompt for AI enhancement
@@ -2166,7 +2166,7 @@ async def enhance_terms_with_ai(terms, text, ai_provider=None, api_key=None, ai_
         else:
             return terms, {}  # Unsupported provider
         
-        async with aiohttp.ClientSession() as session:
+        async with pooled_aiohttp_session() as session:
             async with session.post(url, headers=headers, json=data, timeout=30) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -2745,6 +2745,16 @@ def graph_to_data(G, analysis_type='bridges'):
     return {'nodes': nodes, 'links': links}
 
 
+def _in_running_loop():
+    """True when called from a coroutine, where blocking on the loop would deadlock"""
+    import asyncio
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
 def build_concept_graph(text, analysis_type='bridges', language='auto', exclusions=None, inclusions=None, ai_provider=None, api_key=None, ai_model=None, host=None, port=None):
     """
     Main function to build concept graph with centrality-based algorithms and optional AI filtering.
@@ -2806,46 +2816,32 @@ def build_concept_graph(text, analysis_type='bridges', language='auto', exclusio
             language = 'english'
     
     # Use the new AI-enabled function
-    import asyncio
-    
+    from async_runtime import run_async
+
     async def async_build():
         return await build_concept_graph_with_ai_filtering(
             text, analysis_type, max_text_length=100000, exclusions=exclusions, inclusions=inclusions,
-            ai_provider=ai_provider, api_key=api_key, ai_model=ai_model, 
+            ai_provider=ai_provider, api_key=api_key, ai_model=ai_model,
             host=host, port=port, language=language
         )
-    
-    # Handle different event loop scenarios
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If we're already in an async context, use fallback
-            result = build_graph(text, analysis_type=analysis_type, language=language, exclusions=exclusions)
-            return {
-                'graph': graph_to_data(result, analysis_type=analysis_type),
-                'insights': graph_insights(result, analysis_type=analysis_type)
-            }
-        else:
-            result = loop.run_until_complete(async_build())
-            return {
-                'graph': {'nodes': result['nodes'], 'links': result['links']},
-                'insights': result['insights']
-            }
-    except RuntimeError:
-        # No event loop, create a new one
+
+    # Runs on the shared event loop, which keeps provider connections open;
+    # from inside a running loop (where blocking is not allowed) or on
+    # failure, fall back to the non-AI version
+    if not _in_running_loop():
         try:
-            result = asyncio.run(async_build())
+            result = run_async(async_build())
             return {
                 'graph': {'nodes': result['nodes'], 'links': result['links']},
                 'insights': result['insights']
             }
         except Exception:
-            # Fallback to non-AI version
-            result = build_graph(text, analysis_type=analysis_type, language=language, exclusions=exclusions)
-            return {
-                'graph': graph_to_data(result, analysis_type=analysis_type),
-                'insights': graph_insights(result, analysis_type=analysis_type)
-            }
+            pass
+    result = build_graph(text, analysis_type=analysis_type, language=language, exclusions=exclusions)
+    return {
+        'graph': graph_to_data(result, analysis_type=analysis_type),
+        'insights': graph_insights(result, analysis_type=analysis_type)
+    }
 
 async def build_enhanced_graph_with_ai(note_text, analysis_type='bridges', ai_provider=None, api_key=None, ai_model=None, language='english', enable_lemmatization=True, max_text_length=100000, exclusions=None, inclusions=None, max_terms=None):
     """Build concept graph with AI enhancement and improved term selection with performance optimizations."""
@@ -2954,8 +2950,6 @@ def build_concept_graph(note_text, analysis_type='bridges', max_text_length=1000
         port: Port for local providers
         language: Language for processing ('auto', 'english', 'spanish')
     """
-    import asyncio
-    
     # Auto-detect language if needed
     if language == 'auto':
         spanish_indicators = [
@@ -2966,27 +2960,32 @@ def build_concept_graph(note_text, analysis_type='bridges', max_text_length=1000
         spanish_count = sum(1 for indicator in spanish_indicators if indicator in text_lower)
         language = 'spanish' if spanish_count > 3 else 'english'
     
-    # Run the async version
+    # Run the async version on the shared event loop
+    from async_runtime import run_async
+
     async def async_build():
         return await build_concept_graph_with_ai_filtering(
             note_text, analysis_type, max_text_length, exclusions,
             ai_provider, api_key, ai_model, host, port, language
         )
-    
-    # Handle different event loop scenarios
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If we're already in an async context, we can't use run()
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, async_build())
-                return future.result()
-        else:
-            return loop.run_until_complete(async_build())
-    except RuntimeError:
-        # No event loop, create a new one
-        return asyncio.run(async_build())
+
+    if _in_running_loop():
+        # If we're already in an async context (possibly the shared loop
+        # itself) we can't wait on that loop; run on a private one instead
+        import asyncio
+        import concurrent.futures
+        from http_clients import close_async_session
+
+        async def isolated_build():
+            try:
+                return await async_build()
+            finally:
+                # The private loop's pooled session must not outlive it
+                await close_async_session()
+
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            return executor.submit(asyncio.run, isolated_build()).result()
+    return run_async(async_build())
 
 async def build_concept_graph_with_ai_filtering(note_text, analysis_type='bridges', max_text_length=100000, exclusions=None, inclusions=None, ai_provider=None, api_key=None, ai_model=None, host=None, port=None, language='english'):
     """
@@ -6,7 +6,13 @@ DB_DSN = os.getenv("DATABASE_URL")
 if not DB_DSN:
     raise RuntimeError("DATABASE_URL environment variable not set")
 
-pool = ConnectionPool(conninfo=DB_DSN, min_size=1, max_size=5)
+pool = ConnectionPool(conninfo=DB_DSN, min_size=1, max_size=int(os.getenv("DB_POOL_MAX_SIZE", "5")))
+
+
+def reset_pool():
+    """Open a fresh pool in a forked worker; sockets inherited from the parent are not reused."""
+    global pool
+    pool = ConnectionPool(conninfo=DB_DSN, min_size=1, max_size=int(os.getenv("DB_POOL_MAX_SIZE", "5")))
 
 
 def init_db():
@@ -78,6 +84,16 @@ def init_db():
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_study_items_note_id ON study_items(note_id)"
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
+            )
+            """
+        )
         conn.commit()
 
 
@@ -149,6 +165,41 @@ def delete_user(username: str):
         conn.commit()
 
 
+def create_session(token: str, username: str):
+    """Store a login token so every worker process can resolve it."""
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO sessions (token, username) VALUES (%s, %s)", [token, username])
+        conn.commit()
+
+
+def get_session_username(token: str, max_age_hours: float = 168):
+    """Username for a login token, or None if unknown or older than max_age_hours."""
+    with pool.connection() as conn:
+        cur = conn.execute(
+            "SELECT username FROM sessions WHERE token=%s AND created_at > CURRENT_TIMESTAMP - make_interval(secs => %s)",
+            [token, max_age_hours * 3600],
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def delete_session(token: str):
+    with pool.connection() as conn:
+        conn.execute("DELETE FROM sessions WHERE token=%s", [token])
+        conn.commit()
+
+
+def purge_expired_sessions(max_age_hours: float = 168) -> int:
+    """Delete login tokens older than max_age_hours; returns how many were removed."""
+    with pool.connection() as conn:
+        cur = conn.execute(
+            "DELETE FROM sessions WHERE created_at <= CURRENT_TIMESTAMP - make_interval(secs => %s)",
+            [max_age_hours * 3600],
+        )
+        conn.commit()
+        return cur.rowcount
+
+
 def migrate_json(json_path="data/users.json", hasher=None):
     """Migrate users from a JSON file if table empty, or clean up leftover JSON file."""
     if not os.path.exists(json_path):
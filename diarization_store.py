@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+WhisPad persisted diarization results
+Speaker turns and per-speaker embeddings are stored next to each user's
+saved WAVs, keyed by the SHA-256 of the audio and the engine that produced
+them. Speaker turns do not depend on the ASR model, so re-transcribing a
+saved recording with another model reuses them instead of diarizing again.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-user directory inside saved_audios/<username>
+STORE_DIRNAME = '.diarization'
+
+_SAFE_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class DiarizationStore:
+    """One JSON file per (user, audio hash, engine) under the user's audio directory"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _dir(self, username: str) -> str:
+        return os.path.join(self.base_dir, username, STORE_DIRNAME)
+
+    def _path(self, username: str, audio_hash: str, engine: str) -> str:
+        if not (_SAFE_NAME.match(audio_hash) and _SAFE_NAME.match(engine)):
+            raise ValueError('Invalid diarization key')
+        return os.path.join(self._dir(username), f"{audio_hash}.{engine}.json")
+
+    def get(self, username: str, audio_hash: str, engine: str) -> Optional[Dict[str, Any]]:
+        """Stored {'engine', 'segments', 'embeddings'} for the audio, or None"""
+        try:
+            with open(self._path(username, audio_hash, engine), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, username: str, audio_hash: str, engine: str,
+            segments: List[Dict], embeddings: Optional[Dict[str, List[float]]] = None):
+        """Persist speaker turns and per-speaker embeddings for the audio"""
+        path = self._path(username, audio_hash, engine)
+        entry = {
+            "engine": engine,
+            "segments": segments,
+            "embeddings": embeddings or {},
+            "created_at": time.time(),
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Could not persist diarization for {audio_hash[:12]}: {e}")
+
+    def delete(self, username: str, audio_hash: str):
+        """Remove every engine's results for the audio"""
+        directory = self._dir(username)
+        if not _SAFE_NAME.match(audio_hash) or not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name.startswith(f"{audio_hash}."):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_diarization_store = None
+
+
+def get_diarization_store() -> Optional[DiarizationStore]:
+    """Get the global store instance, or None when disabled"""
+    global _diarization_store
+    if os.getenv('DIARIZATION_STORE_ENABLED', 'true').lower() == 'false':
+        return None
+    if _diarization_store is None:
+        _diarization_store = DiarizationStore(os.path.join(os.getcwd(), 'saved_audios'))
+    return _diarization_store
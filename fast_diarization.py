@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+WhisPad fast speaker diarization
+A lightweight CPU engine that needs only NumPy: energy VAD finds speech,
+sliding windows over it are embedded as MFCC mean/std statistics, and the
+embeddings are grouped by average-linkage agglomerative clustering on
+their RMS distance. It is much faster than pyannote and works offline, at the
+cost of accuracy on overlapping or acoustically similar speakers.
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_decode import decode_audio_bytes, AudioDecodeError, SAMPLE_RATE
+from voice_activity import detect_speech
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+N_FFT = 512
+WIN_SECONDS = 0.025
+HOP_SECONDS = 0.01
+N_MELS = 40
+N_MFCC = 20
+# Frames more than this far (natural log of power, ~20 dB) below the loudest
+# frame of a window are left out of its embedding
+VOICED_RANGE = np.log(100.0)
+# Clusters with fewer windows are treated as speaker-change artifacts
+MIN_CLUSTER_WINDOWS = 3
+# Upper bound on clustered windows; longer recordings use a wider hop
+MAX_WINDOWS = 3000
+
+
+def mel_filterbank(sample_rate: int = SAMPLE_RATE, n_fft: int = N_FFT, n_mels: int = N_MELS) -> np.ndarray:
+    """Triangular mel filters, shape (n_mels, n_fft // 2 + 1)"""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mels = np.linspace(hz_to_mel(20.0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mels) / sample_rate).astype(int)
+    filters = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            filters[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            filters[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return filters
+
+
+def _dct_matrix(n_in: int, n_out: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, shape (n_in, n_out)"""
+    k = np.arange(n_out)[None, :]
+    n = np.arange(n_in)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2.0 / n_in)
+    basis[:, 0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+
+def mfcc(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    MFCC frames without c0, so loudness does not separate speakers, plus the
+    log energy of each frame
+    """
+    win = int(WIN_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    # The frame strides below must describe this exact buffer
+    pcm = np.ascontiguousarray(pcm, dtype=np.float32)
+    if len(pcm) < win:
+        pcm = np.pad(pcm, (0, win - len(pcm)))
+    n_frames = 1 + (len(pcm) - win) // hop
+    frames = np.lib.stride_tricks.as_strided(
+        pcm,
+        shape=(n_frames, win), strides=(pcm.strides[0] * hop, pcm.strides[0]), writeable=False,
+    )
+    spectrum = np.abs(np.fft.rfft(frames * np.hamming(win).astype(np.float32), n=N_FFT)) ** 2
+    log_mel = np.log(spectrum @ mel_filterbank(sample_rate).T + 1e-8)
+    return (log_mel @ _dct_matrix(N_MELS, N_MFCC + 1))[:, 1:], np.log(spectrum.sum(axis=1) + 1e-8)
+
+
+def agglomerative_cluster(embeddings: np.ndarray, threshold: float,
+                          num_speakers: Optional[int] = None, max_speakers: int = 8) -> np.ndarray:
+    """
+    Average-linkage clustering on the RMS difference between embeddings.
+
+    Clusters merge while their distance is below threshold (or until
+    num_speakers remain when given), and always until at most max_speakers
+    remain. Nearest neighbours are cached per row, so a merge costs O(n).
+
+    Returns:
+        Labels numbered by first appearance
+    """
+    n = len(embeddings)
+    if n <= 1:
+        return np.zeros(n, dtype=int)
+    squared = np.square(embeddings).sum(axis=1)
+    dist = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * embeddings @ embeddings.T, 0)
+                   / embeddings.shape[1]).astype(np.float32)
+    np.fill_diagonal(dist, np.inf)
+    sizes = np.ones(n)
+    labels = np.arange(n)
+    nearest = dist.argmin(axis=1)
+    nearest_dist = dist[np.arange(n), nearest]
+    clusters = n
+    target = num_speakers or 1
+    while clusters > target:
+        i = int(nearest_dist.argmin())
+        j = int(nearest[i])
+        if num_speakers is None and clusters <= max_speakers and nearest_dist[i] > threshold:
+            break
+        # Lance-Williams update for average linkage; j is folded into i
+        merged = (sizes[i] * dist[i] + sizes[j] * dist[j]) / (sizes[i] + sizes[j])
+        dist[i, :] = merged
+        dist[:, i] = merged
+        dist[i, i] = np.inf
+        dist[j, :] = np.inf
+        dist[:, j] = np.inf
+        sizes[i] += sizes[j]
+        labels[labels == j] = i
+        nearest_dist[j] = np.inf
+        clusters -= 1
+
+        nearest[i] = dist[i].argmin()
+        nearest_dist[i] = dist[i, nearest[i]]
+        # Rows whose nearest cluster changed are recomputed; others may now prefer i
+        stale = np.flatnonzero((nearest == i) | (nearest == j))
+        for k in stale:
+            if k != i and np.isfinite(nearest_dist[k]):
+                nearest[k] = dist[k].argmin()
+                nearest_dist[k] = dist[k, nearest[k]]
+        closer = np.isfinite(nearest_dist) & (merged < nearest_dist)
+        closer[i] = False
+        nearest[closer] = i
+        nearest_dist[closer] = merged[closer]
+
+    _, first = np.unique(labels, return_index=True)
+    order = {label: rank for rank, label in enumerate(labels[np.sort(first)])}
+    return np.array([order[label] for label in labels])
+
+
+class FastDiarizer:
+    """NumPy speaker diarization returning the same segment format as pyannote"""
+
+    def __init__(self, window: float = 1.5, hop: float = 0.75,
+                 threshold: Optional[float] = None, max_speakers: Optional[int] = None):
+        self.window = window
+        self.hop = hop
+        self.threshold = threshold if threshold is not None else \
+            float(os.getenv('FAST_DIARIZATION_THRESHOLD', '1.2'))
+        self.max_speakers = max_speakers or int(os.getenv('FAST_DIARIZATION_MAX_SPEAKERS', '8'))
+
+    def is_available(self) -> bool:
+        return True
+
+    def _windows(self, regions, total_speech: float):
+        """(start, end) analysis windows inside speech regions, in seconds"""
+        hop = max(self.hop, total_speech / MAX_WINDOWS)
+        windows = []
+        for start, end in regions:
+            if end - start <= self.window:
+                windows.append((start, end))
+                continue
+            t = start
+            while t + self.window < end:
+                windows.append((t, t + self.window))
+                t += hop
+            windows.append((max(start, end - self.window), end))
+        return windows
+
+    def diarize_pcm(self, pcm: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                    num_speakers: Optional[int] = None, return_embeddings: bool = False):
+        """
+        Perform speaker diarization on decoded mono float32 PCM
+
+        Returns:
+            List of {'start', 'end', 'speaker', 'duration'} turns, like
+            SpeakerDiarizationWrapper.diarize_audio_file; with
+            return_embeddings, a (turns, {speaker: centroid}) tuple
+        """
+        regions = detect_speech(pcm, sample_rate)
+        if not regions:
+            return ([], {}) if return_embeddings else []
+        features, energy = mfcc(pcm, sample_rate)
+        windows = self._windows(regions, sum(e - s for s, e in regions))
+
+        embeddings = []
+        for start, end in windows:
+            first = min(int(start / HOP_SECONDS), len(features) - 1)
+            last = max(first + 1, int(end / HOP_SECONDS))
+            frames = features[first:last]
+            # Only voiced frames describe the speaker; pauses and padding would dominate the std
+            voiced = energy[first:last] >= energy[first:last].max() - VOICED_RANGE
+            frames = frames[voiced]
+            embeddings.append(np.concatenate((frames.mean(axis=0), frames.std(axis=0))))
+        embeddings = np.array(embeddings, dtype=np.float32)
+
+        labels = agglomerative_cluster(embeddings, self.threshold, num_speakers, self.max_speakers)
+        if num_speakers is None:
+            labels = self._absorb_small_clusters(embeddings, labels)
+        segments = self._turns(regions, windows, labels)
+        logger.info(f"Fast diarization completed: found {len(set(labels))} speakers")
+        if return_embeddings:
+            centroids = {
+                f"SPEAKER_{label:02d}": embeddings[labels == label].mean(axis=0).tolist()
+                for label in np.unique(labels)
+            }
+            return segments, centroids
+        return segments
+
+    @staticmethod
+    def _absorb_small_clusters(embeddings: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """
+        Windows straddling a speaker change sit between both speakers and can
+        form clusters of their own; fold clusters smaller than
+        MIN_CLUSTER_WINDOWS into the nearest larger one
+        """
+        counts = np.bincount(labels)
+        large = np.flatnonzero(counts >= MIN_CLUSTER_WINDOWS)
+        if not len(large) or len(large) == len(counts):
+            return labels
+        centroids = np.array([embeddings[labels == c].mean(axis=0) for c in large])
+        labels = labels.copy()
+        for index in np.flatnonzero(counts[labels] < MIN_CLUSTER_WINDOWS):
+            labels[index] = large[np.argmin(np.square(centroids - embeddings[index]).sum(axis=1))]
+        _, first = np.unique(labels, return_index=True)
+        order = {label: rank for rank, label in enumerate(labels[np.sort(first)])}
+        return np.array([order[label] for label in labels])
+
+    @staticmethod
+    def _turns(regions, windows, labels) -> List[Dict]:
+        """Merge labelled windows into speaker turns, switching at window midpoints"""
+        segments: List[Dict] = []
+        w = 0
+        for start, end in regions:
+            current, turn_start = None, start
+            previous_center = None
+            while w < len(windows) and windows[w][0] < end:
+                center = (windows[w][0] + windows[w][1]) / 2
+                label = f"SPEAKER_{labels[w]:02d}"
+                if current is not None and label != current:
+                    boundary = (previous_center + center) / 2
+                    segments.append({'start': turn_start, 'end': boundary, 'speaker': current})
+                    turn_start = boundary
+                current, previous_center = label, center
+                w += 1
+            if current is not None:
+                segments.append({'start': turn_start, 'end': end, 'speaker': current})
+        for segment in segments:
+            segment['duration'] = segment['end'] - segment['start']
+        return segments
+
+    def diarize_audio_bytes(self, audio_bytes: bytes, filename: str = "audio.wav") -> Optional[List[Dict]]:
+        try:
+            pcm = decode_audio_bytes(audio_bytes)
+        except AudioDecodeError as e:
+            logger.error(f"Could not decode {filename} for fast diarization: {e}")
+            return None
+        return self.diarize_pcm(pcm)
+
+    def diarize_audio_file(self, audio_path: str) -> Optional[List[Dict]]:
+        with open(audio_path, 'rb') as f:
+            return self.diarize_audio_bytes(f.read(), os.path.basename(audio_path))
+
+
+_fast_diarizer = None
+
+
+def get_fast_diarizer() -> FastDiarizer:
+    """Get the global fast diarizer instance"""
+    global _fast_diarizer
+    if _fast_diarizer is None:
+        _fast_diarizer = FastDiarizer()
+    return _fast_diarizer
@@ -0,0 +1,65 @@
+"""
+Gunicorn configuration for WhisPad production serving (SERVER_MODE=production).
+
+The app is imported once in the master so workers fork with the Python
+modules already loaded; models, the database pool and background threads are
+created in each worker after fork, since none of them survive fork().
+"""
+
+import os
+import sys
+import subprocess
+
+workers = int(os.getenv('WEB_WORKERS') or max(2, (os.cpu_count() or 2) // 2))
+threads = int(os.getenv('WEB_THREADS', '8'))
+worker_class = 'gthread'
+bind = f"0.0.0.0:{os.getenv('BACKEND_PORT', '8000')}"
+# Long transcriptions and model uploads run inside a request
+timeout = int(os.getenv('WEB_TIMEOUT', '600'))
+graceful_timeout = 30
+keepalive = 75
+preload_app = True
+accesslog = '-'
+errorlog = '-'
+
+# Read by backend and the compute scheduler while the app is preloaded
+os.environ['WEB_WORKERS'] = str(workers)
+os.environ['WHISPAD_PRELOAD'] = 'true'
+
+
+_inference_process = None
+
+
+def on_starting(server):
+    """Start the shared inference process before any web worker forks"""
+    global _inference_process
+    if os.getenv('INFERENCE_SERVER_ENABLED', 'false').lower() != 'true':
+        return
+    env = dict(os.environ)
+    # The inference process gets the whole CPU budget, not a worker's share
+    env.pop('WEB_WORKERS', None)
+    env.pop('WHISPAD_PRELOAD', None)
+    _inference_process = subprocess.Popen([sys.executable, 'inference_server.py'], env=env)
+    server.log.info(f"Started inference server (pid {_inference_process.pid})")
+
+
+def on_exit(server):
+    if _inference_process and _inference_process.poll() is None:
+        _inference_process.terminate()
+        try:
+            _inference_process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            _inference_process.kill()
+
+
+def when_ready(server):
+    # The master only imported the app; drop its connections before forking
+    import db
+    db.pool.close()
+
+
+def post_fork(server, worker):
+    import db
+    db.reset_pool()
+    import backend
+    backend.start_background_services()
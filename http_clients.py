@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+WhisPad pooled HTTP clients
+Process-wide keep-alive connection pools for calls to AI providers. Sync
+code gets one requests.Session per base URL (scheme://host:port) and async
+code one aiohttp.ClientSession per event loop (in practice the long-lived
+loop of async_runtime), so repeated calls to the same provider reuse TCP+TLS
+connections instead of handshaking every time.
+"""
+
+import os
+import threading
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class PooledSession(requests.Session):
+    """Session with a bounded keep-alive pool and a default timeout"""
+
+    def __init__(self, pool_size: int, timeout: Tuple[float, float]):
+        super().__init__()
+        self.default_timeout = timeout
+        self.requests_sent = 0
+        self._count_lock = threading.Lock()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self._adapter = adapter
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('stream'):
+            # Streamed responses may legitimately pause between chunks for a
+            # long time, so only the connect timeout applies by default
+            kwargs.setdefault('timeout', (self.default_timeout[0], None))
+        else:
+            kwargs.setdefault('timeout', self.default_timeout)
+        with self._count_lock:
+            self.requests_sent += 1
+        return super().request(method, url, **kwargs)
+
+    def connections_opened(self) -> int:
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+
+
+class HttpClients:
+    """Registry of pooled sessions, rebuilt after fork so workers never share sockets"""
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10, read_timeout: float = 600,
+                 async_limit: int = 100, async_limit_per_host: int = 10, keepalive_timeout: float = 60):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.async_limit = async_limit
+        self.async_limit_per_host = async_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._sessions: Dict[str, PooledSession] = {}
+        self._async_sessions: Dict[Any, Any] = {}  # event loop -> aiohttp.ClientSession
+        self.async_stats = {"requests": 0, "connections_opened": 0, "connections_reused": 0}
+
+    def _check_fork(self):
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def session(self, url: str) -> PooledSession:
+        """The pooled session for the URL's scheme://host:port"""
+        origin = _origin(url)
+        with self._lock:
+            self._check_fork()
+            session = self._sessions.get(origin)
+            if session is None:
+                session = PooledSession(self.pool_size, self.timeout)
+                self._sessions[origin] = session
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session(url).request(method, url, **kwargs)
+
+    def _trace_config(self):
+        import aiohttp
+
+        async def on_request_start(session, ctx, params):
+            self.async_stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.async_stats["connections_opened"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.async_stats["connections_reused"] += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    def async_session(self):
+        """
+        The aiohttp session of the running event loop. aiohttp sessions are
+        bound to one loop, so each loop gets its own; close_async_session()
+        releases it before the loop is closed.
+        """
+        import asyncio
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._check_fork()
+            # Loops closed without close_async_session() only leave their session behind
+            for stale in [l for l in self._async_sessions if l.is_closed()]:
+                self._async_sessions.pop(stale)
+            session = self._async_sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=self.async_limit,
+                                                 limit_per_host=self.async_limit_per_host,
+                                                 keepalive_timeout=self.keepalive_timeout)
+                session = aiohttp.ClientSession(
+                    connector=connector,
+                    # A per-read limit, not a total one, so long streamed answers are not cut off
+                    timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout[0], sock_read=self.timeout[1]),
+                    trace_configs=[self._trace_config()],
+                )
+                self._async_sessions[loop] = session
+            return session
+
+    async def close_async_session(self):
+        """Close the running loop's aiohttp session, if it has one"""
+        import asyncio
+
+        with self._lock:
+            session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._check_fork()
+            hosts = {}
+            for origin, session in self._sessions.items():
+                opened = session.connections_opened()
+                hosts[origin] = {
+                    "requests": session.requests_sent,
+                    "connections_opened": opened,
+                    "connections_reused": max(0, session.requests_sent - opened),
+                }
+            return {
+                "pool_size": self.pool_size,
+                "timeout": list(self.timeout),
+                "hosts": hosts,
+                "async": dict(self.async_stats, sessions=len(self._async_sessions)),
+            }
+
+
+_http_clients = None
+
+
+def get_http_clients() -> HttpClients:
+    """Get the global clients, configured from HTTP_POOL_SIZE and HTTP_*_TIMEOUT"""
+    global _http_clients
+    if _http_clients is None:
+        _http_clients = HttpClients(
+            pool_size=int(os.getenv('HTTP_POOL_SIZE', '10')),
+            connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', '10')),
+            read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', '600')),
+            async_limit=int(os.getenv('HTTP_ASYNC_LIMIT', '100')),
+            async_limit_per_host=int(os.getenv('HTTP_ASYNC_LIMIT_PER_HOST', '10')),
+            keepalive_timeout=float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '60')),
+        )
+    return _http_clients
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """requests.post through the shared pool for the URL's host"""
+    return get_http_clients().request('POST', url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """requests.get through the shared pool for the URL's host"""
+    return get_http_clients().request('GET', url, **kwargs)
+
+
+@asynccontextmanager
+async def pooled_aiohttp_session():
+    """
+    Drop-in for `async with aiohttp.ClientSession() as session` that yields
+    the loop's shared session and leaves it open for the next call
+    """
+    yield get_http_clients().async_session()
+
+
+async def close_async_session():
+    await get_http_clients().close_async_session()
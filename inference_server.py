@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+WhisPad inference server
+Runs whisper.cpp, SenseVoice and diarization in one dedicated process that
+every web worker talks to over a Unix socket, so each model is resident once
+no matter how many web workers there are and slow inference never holds a
+request thread in the web tier.
+
+Protocol (pickled dicts over multiprocessing.connection):
+    request   {"op": str, "args": dict, "progress": bool}
+    progress  {"progress": float}                      zero or more times
+    reply     {"ok": True, "result": ...} or {"ok": False, "error": str}
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import tempfile
+import threading
+import logging
+from collections import deque
+from multiprocessing.connection import Listener, Client, Connection
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'whispad-inference.sock')
+
+
+class InferenceError(RuntimeError):
+    """Raised when the inference server cannot be reached or a job fails there"""
+
+
+def diarize_pcm(pcm, sample_rate: int, engine: str) -> Optional[Dict[str, Any]]:
+    """
+    Diarize with the requested engine, falling back to the fast engine when
+    pyannote is not available.
+
+    Returns:
+        {'engine', 'segments', 'embeddings'} or None
+    """
+    if engine == 'pyannote':
+        try:
+            from speaker_diarization import get_speaker_diarization_wrapper
+            wrapper = get_speaker_diarization_wrapper()
+        except ImportError:
+            wrapper = None
+        if wrapper and (wrapper.is_available() or wrapper.initialize()):
+            result = wrapper.diarize_pcm(pcm, sample_rate, return_embeddings=True)
+            if result is None:
+                return None
+            return {"engine": engine, "segments": result[0], "embeddings": result[1]}
+        logger.info("pyannote diarization not available, using the fast engine")
+    from fast_diarization import get_fast_diarizer
+    segments, embeddings = get_fast_diarizer().diarize_pcm(pcm, sample_rate, return_embeddings=True)
+    return {"engine": 'fast', "segments": segments, "embeddings": embeddings}
+
+
+class LocalEngines:
+    """whisper.cpp and SenseVoice as loaded in this process"""
+
+    def __init__(self):
+        from whisper_cpp_wrapper import WhisperCppWrapper
+        from sensevoice_wrapper import get_sensevoice_wrapper
+        self.whisper = WhisperCppWrapper()
+        self.sensevoice = get_sensevoice_wrapper()
+
+    def transcribe(self, pcm, provider, language=None, model_path=None, detect_emotion=True,
+                   detect_events=True, use_itn=True, progress_callback=None) -> Dict[str, Any]:
+        if provider == 'local':
+            return self.whisper.transcribe_pcm(pcm, language, model_path, progress_callback)
+        return self.sensevoice.transcribe_pcm(pcm, language, detect_emotion, detect_events,
+                                              use_itn, progress_callback)
+
+    def stop_model(self, model_path: str):
+        """Stop the warm whisper-server workers of a replaced or deleted model"""
+        if self.whisper.pool:
+            self.whisper.pool.stop_model(model_path)
+
+    def whisper_models(self) -> List[str]:
+        return [m["name"] for m in self.whisper.get_available_models()]
+
+    def available(self) -> Dict[str, bool]:
+        return {
+            "local": self.whisper.is_ready(),
+            "sensevoice": bool(self.sensevoice) and self.sensevoice.is_available(),
+        }
+
+
+class InferenceServer:
+    """
+    Accepts connections on a Unix socket and serves each one on its own
+    thread. Requests from different web workers run concurrently, so the
+    SenseVoice micro-batcher and the compute scheduler see all of them.
+    """
+
+    def __init__(self, address: str = DEFAULT_SOCKET, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = authkey
+        self.handlers: Dict[str, Callable[..., Any]] = {}
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.started_at = time.time()
+        self._listener: Optional[Listener] = None
+        self._connections = set()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self.register('ping', lambda: {"pid": os.getpid()})
+        self.register('stats', self.get_stats)
+
+    def register(self, op: str, handler: Callable[..., Any]):
+        """
+        Register a handler. It is called with the request args as keyword
+        arguments, plus progress_callback when the client asked for progress.
+        """
+        self.handlers[op] = handler
+
+    def bind(self):
+        """Create the listening socket, replacing a stale one left by a crash"""
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        logger.info(f"Inference server listening on {self.address}")
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.bind()
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed.is_set():
+                    break
+                continue
+            except Exception as e:
+                # Failed authentication or a client that went away mid-handshake
+                logger.warning(f"Rejected inference connection: {e}")
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn: Connection):
+        send_lock = threading.Lock()
+        with self._lock:
+            self._connections.add(conn)
+
+        def send(message):
+            with send_lock:
+                conn.send(message)
+
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                send(self._handle(request, send))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def _handle(self, request: Dict[str, Any], send: Callable[[Any], None]) -> Dict[str, Any]:
+        op = request.get('op')
+        handler = self.handlers.get(op)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown inference operation: {op}"}
+        args = dict(request.get('args') or {})
+        if request.get('progress'):
+            args['progress_callback'] = lambda value: send({"progress": value})
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+        try:
+            return {"ok": True, "result": handler(**args)}
+        except Exception as e:
+            logger.error(f"Inference operation {op} failed: {e}")
+            with self._lock:
+                self.errors += 1
+            return {"ok": False, "error": str(e)}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            # shutdown() wakes the thread blocked in recv() and tells the client
+            try:
+                with socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "address": self.address,
+                "uptime": round(time.time() - self.started_at, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "active": self.active,
+            }
+
+
+class InferenceClient:
+    """
+    Thread-safe client for the inference server. Connections are pooled and
+    reused; each call holds one connection exclusively until its reply.
+    """
+
+    def __init__(self, address: str = DEFAULT_SOCKET, authkey: Optional[bytes] = None,
+                 timeout: Optional[float] = None, connect_timeout: float = 30):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.calls = 0
+        self.errors = 0
+        self.reconnects = 0
+        self._idle: "deque[Connection]" = deque()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Connection:
+        """Open a connection, waiting for a server that is still starting"""
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, family='AF_UNIX', authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.time() >= deadline:
+                    raise InferenceError(f"Inference server not reachable at {self.address}: {e}")
+                time.sleep(0.2)
+
+    def _checkout(self) -> Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _checkin(self, conn: Connection):
+        with self._lock:
+            self._idle.append(conn)
+
+    def call(self, op: str, progress_callback: Optional[Callable[[float], None]] = None,
+             timeout: Optional[float] = None, **args) -> Any:
+        """
+        Run an operation on the server and return its result.
+
+        A pooled connection the server has since closed (e.g. it restarted)
+        is replaced once before giving up; operations are idempotent, so
+        resending is safe.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        request = {"op": op, "args": args, "progress": progress_callback is not None}
+        with self._lock:
+            self.calls += 1
+        for attempt in range(2):
+            conn = self._checkout()
+            try:
+                conn.send(request)
+                reply = self._receive(conn, timeout, progress_callback)
+            except (EOFError, OSError) as e:
+                conn.close()
+                if attempt == 0:
+                    with self._lock:
+                        self.reconnects += 1
+                    continue
+                with self._lock:
+                    self.errors += 1
+                raise InferenceError(f"Inference server connection lost: {e}")
+            except InferenceError:
+                conn.close()
+                with self._lock:
+                    self.errors += 1
+                raise
+            self._checkin(conn)
+            if not reply.get('ok'):
+                with self._lock:
+                    self.errors += 1
+                raise InferenceError(reply.get('error') or f"Inference operation {op} failed")
+            return reply.get('result')
+
+    def _receive(self, conn: Connection, timeout: Optional[float],
+                 progress_callback: Optional[Callable[[float], None]]) -> Dict[str, Any]:
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and (remaining <= 0 or not conn.poll(remaining)):
+                raise InferenceError(f"Inference server did not answer within {timeout:.0f}s")
+            message = conn.recv()
+            if 'progress' in message:
+                if progress_callback:
+                    try:
+                        progress_callback(message['progress'])
+                    except Exception:
+                        pass
+                continue
+            return message
+
+    def ping(self) -> bool:
+        try:
+            self.call('ping', timeout=5)
+            return True
+        except InferenceError:
+            return False
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "address": self.address,
+                "calls": self.calls,
+                "errors": self.errors,
+                "reconnects": self.reconnects,
+                "idle_connections": len(self._idle),
+            }
+
+
+def _authkey() -> Optional[bytes]:
+    key = os.getenv('INFERENCE_AUTHKEY')
+    return key.encode('utf-8') if key else None
+
+
+_inference_client = None
+
+
+def get_inference_client() -> Optional[InferenceClient]:
+    """Get the global client, or None when inference runs in the web process"""
+    global _inference_client
+    if os.getenv('INFERENCE_SERVER_ENABLED', 'false').lower() != 'true':
+        return None
+    if _inference_client is None:
+        _inference_client = InferenceClient(
+            os.getenv('INFERENCE_SOCKET') or DEFAULT_SOCKET,
+            authkey=_authkey(),
+            timeout=float(os.getenv('INFERENCE_TIMEOUT', '1800')),
+        )
+    return _inference_client
+
+
+def create_inference_server(address: Optional[str] = None) -> InferenceServer:
+    """Server with the local speech engines registered"""
+    from model_registry import get_model_registry
+    from compute_scheduler import get_compute_scheduler
+
+    server = InferenceServer(address or os.getenv('INFERENCE_SOCKET') or DEFAULT_SOCKET, _authkey())
+    engines = LocalEngines()
+
+    def diarize(pcm, sample_rate, engine, progress_callback=None):
+        return diarize_pcm(pcm, sample_rate, engine)
+
+    def stats():
+        return {
+            "server": server.get_stats(),
+            "compute": get_compute_scheduler().get_stats(),
+            "models": get_model_registry().get_status(),
+            "whisper_pool": engines.whisper.get_pool_status(),
+        }
+
+    server.register('transcribe', engines.transcribe)
+    server.register('diarize', diarize)
+    server.register('stats', stats)
+    server.register('stop_model', engines.stop_model)
+    return server
+
+
+def main():
+    server = create_inference_server()
+
+    def shutdown(signum, frame):
+        logger.info("Stopping inference server")
+        server.close()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    server.bind()
+    server.serve_forever()
+    if os.path.exists(server.address):
+        os.remove(server.address)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+WhisPad transcription job queue
+A fixed pool of worker threads runs transcription jobs so that concurrent
+uploads queue up instead of oversubscribing the CPU. Job state and input
+audio are persisted under a state directory, so queued jobs survive a restart
+and any web process can report their status. Each job records the process
+that owns it; on start, a process only takes over jobs whose owner is gone.
+"""
+
+import os
+import fcntl
+import json
+import time
+import uuid
+import queue
+import threading
+import logging
+from typing import Callable, Dict, Optional, Any
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+FINISHED_STATES = (JOB_DONE, JOB_FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when the queue cannot accept more jobs"""
+
+
+class Job:
+    """State of one queued unit of work"""
+
+    def __init__(self, kind: str, owner: str, params: Optional[Dict[str, Any]] = None,
+                 job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.params = params or {}
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress: Dict[str, Any] = {}
+        self.result = None
+        self.error = None
+        self.exception: Optional[Exception] = None
+        self.version = 0
+        self.pid = os.getpid()  # process whose workers run the job
+        # In-process callable for synchronous jobs; these are never persisted
+        self.func: Optional[Callable[[], Any]] = None
+        self.done_event = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "owner": self.owner,
+            "params": self.params,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "version": self.version,
+            "pid": self.pid,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Job':
+        job = cls(data['kind'], data['owner'], data.get('params'), job_id=data['id'])
+        for field in ('status', 'created_at', 'started_at', 'finished_at', 'result', 'error'):
+            setattr(job, field, data.get(field))
+        job.progress = data.get('progress') or {}
+        job.version = data.get('version', 0)
+        job.pid = data.get('pid')
+        return job
+
+    def public_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        """Job state as returned to API clients"""
+        data = self.to_dict()
+        del data['params']
+        del data['pid']
+        if position is not None:
+            data['queue_position'] = position
+        return data
+
+
+class JobQueue:
+    """
+    Bounded queue served by a fixed number of worker threads.
+
+    Handlers are registered per job kind and receive the job and the path of
+    its persisted input file.
+    """
+
+    def __init__(self, state_dir: str, workers: int = 2, max_queued: int = 32,
+                 retention_seconds: float = 24 * 3600):
+        self.state_dir = state_dir
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self._handlers: Dict[str, Callable[[Job, Optional[str]], Any]] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._threads = []
+
+    def register_handler(self, kind: str, handler: Callable[[Job, Optional[str]], Any]):
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Start the workers and requeue jobs left unfinished by a previous run"""
+        if self._threads:
+            return
+        self._ensure_state_dir()
+        self._recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # Persistence ---------------------------------------------------------
+
+    def _ensure_state_dir(self):
+        # Created on first use, not when the queue object is built
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def input_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.input")
+
+    def _persist(self, job: Job):
+        if job.func is not None:
+            return
+        path = self._state_path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Could not persist job {job.id}: {e}")
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        try:
+            with open(self._state_path(job_id), 'r', encoding='utf-8') as f:
+                return Job.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _process_alive(pid: Optional[int]) -> bool:
+        if not pid or pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _recover(self):
+        # Worker processes sharing the state directory recover one at a time,
+        # so a job left by a dead process is taken over exactly once
+        with open(os.path.join(self.state_dir, '.recover.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._recover_locked()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _recover_locked(self):
+        for name in sorted(os.listdir(self.state_dir)):
+            if not name.endswith('.json'):
+                continue
+            job = self._load(name[:-5])
+            if not job or job.status in FINISHED_STATES:
+                continue
+            if self._process_alive(job.pid):
+                # Still queued or running in another live worker process
+                continue
+            if not os.path.exists(self.input_path(job.id)):
+                job.status = JOB_FAILED
+                job.error = 'Input lost during restart'
+                job.finished_at = time.time()
+                self._persist(job)
+                continue
+            logger.info(f"Requeueing job {job.id} left {job.status} by a previous run")
+            job.status = JOB_QUEUED
+            job.started_at = None
+            job.pid = os.getpid()
+            with self._lock:
+                self._jobs[job.id] = job
+                self._pending += 1
+            self._persist(job)
+            self._queue.put(job.id)
+
+    def _cleanup(self):
+        """Drop finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [j.id for j in self._jobs.values()
+                       if j.status in FINISHED_STATES and (j.finished_at or 0) < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        for name in os.listdir(self.state_dir):
+            path = os.path.join(self.state_dir, name)
+            try:
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    job = self._load(name[:-5])
+                    if job is None or job.status in FINISHED_STATES:
+                        os.remove(path)
+            except OSError:
+                pass
+
+    # Submission ----------------------------------------------------------
+
+    def _enqueue(self, job: Job):
+        with self._lock:
+            if self._pending >= self.max_queued:
+                raise QueueFullError("Transcription queue is full, try again later")
+            self._pending += 1
+            self._jobs[job.id] = job
+        self._persist(job)
+        self._queue.put(job.id)
+
+    def submit(self, kind: str, owner: str, params: Dict[str, Any],
+               input_bytes: Optional[bytes] = None) -> Job:
+        """Queue a persisted job and return immediately"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler for job kind '{kind}'")
+        self._ensure_state_dir()
+        self._cleanup()
+        job = Job(kind, owner, params)
+        if input_bytes is not None:
+            with open(self.input_path(job.id), 'wb') as f:
+                f.write(input_bytes)
+        try:
+            self._enqueue(job)
+        except QueueFullError:
+            self._remove_input(job.id)
+            raise
+        return job
+
+    def run_sync(self, func: Callable[[], Any], owner: str = '', kind: str = 'sync') -> Any:
+        """
+        Run a callable on a queue worker and wait for it, so synchronous
+        endpoints share the same concurrency limit as queued jobs
+        """
+        job = Job(kind, owner)
+        job.func = func
+        self._enqueue(job)
+        job.done_event.wait()
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        if job.status == JOB_FAILED:
+            raise job.exception
+        return job.result
+
+    # Execution -----------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            self._set_state(job, status=JOB_RUNNING, started_at=time.time())
+            with self._lock:
+                self._pending -= 1
+                self._running += 1
+            try:
+                if job.func is not None:
+                    result = job.func()
+                else:
+                    input_path = self.input_path(job.id)
+                    result = self._handlers[job.kind](
+                        job, input_path if os.path.exists(input_path) else None
+                    )
+                self._set_state(job, status=JOB_DONE, result=result, finished_at=time.time())
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.exception = e
+                self._set_state(job, status=JOB_FAILED, error=str(e), finished_at=time.time())
+            finally:
+                with self._lock:
+                    self._running -= 1
+                self._remove_input(job.id)
+                job.done_event.set()
+
+    def _remove_input(self, job_id: str):
+        try:
+            os.remove(self.input_path(job_id))
+        except OSError:
+            pass
+
+    def _set_state(self, job: Job, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+        self._persist(job)
+
+    def update_progress(self, job_id: str, **progress):
+        """Merge progress fields (percent, elapsed, ...) into a running job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return
+        self._set_state(job, progress={**job.progress, **progress})
+
+    # Inspection ----------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look a job up in memory, falling back to the state another process wrote"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        if not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        return self._load(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position among queued jobs, or None if the job is not waiting"""
+        with self._lock:
+            waiting = sorted((j for j in self._jobs.values() if j.status == JOB_QUEUED),
+                             key=lambda j: j.created_at)
+        for index, job in enumerate(waiting):
+            if job.id == job_id:
+                return index + 1
+        return None
+
+    def wait_for_update(self, job_id: str, version: int, timeout: float = 1.0) -> Optional[Job]:
+        """Block until the job changes past `version` or the timeout expires"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._changed.wait_for(lambda: job.version > version, timeout=timeout)
+                return job
+        time.sleep(timeout)
+        return self.get(job_id)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "queued": self._pending,
+                "running": self._running,
+            }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Get the global job queue, starting its workers on first use"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                os.getenv('JOB_STATE_DIR') or os.path.join(os.getcwd(), 'job_state'),
+                workers=int(os.getenv('JOB_WORKERS', '2')),
+                max_queued=int(os.getenv('JOB_QUEUE_MAX', '32')),
+                retention_seconds=float(os.getenv('JOB_RETENTION_HOURS', '24')) * 3600,
+            )
+        return _job_queue
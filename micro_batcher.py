@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+WhisPad inference micro-batcher
+Concurrent callers submit single inputs; one inference thread collects them
+for a short window, runs them as one batch and hands each caller its result.
+This keeps a shared model on a single thread and lets batch-capable engines
+amortize a forward pass across users.
+"""
+
+import time
+import queue
+import threading
+import logging
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _BatchRequest:
+    """One submitted input waiting for its slot in a batch"""
+
+    def __init__(self, item: Any, group: Hashable):
+        self.item = item
+        self.group = group
+        self.submitted_at = time.time()
+        self.result = None
+        self.exception: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collects requests for up to `window_seconds` (or until `max_batch` are
+    waiting) and calls `batch_fn(group, items)`, which must return one result
+    per item. Requests only share a batch when their group keys are equal,
+    e.g. the same language and decoding options.
+    """
+
+    def __init__(self, name: str, batch_fn: Callable[[Hashable, List[Any]], List[Any]],
+                 window_seconds: float = 0.01, max_batch: int = 8):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window_seconds = max(0.0, window_seconds)
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[_BatchRequest]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._batches = 0
+        self._requests = 0
+        self._failed = 0
+        self._largest_batch = 0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'{self.name}-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, item: Any, group: Hashable = None) -> Any:
+        """Queue one input and block until its batch has run"""
+        self._start()
+        request = _BatchRequest(item, group)
+        self._queue.put(request)
+        request.done.wait()
+        if request.exception is not None:
+            raise request.exception
+        return request.result
+
+    def _collect(self) -> List[_BatchRequest]:
+        batch = [self._queue.get()]
+        deadline = time.time() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups: Dict[Hashable, List[_BatchRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.group, []).append(request)
+            for group, requests in groups.items():
+                self._run_group(group, requests)
+
+    def _run_group(self, group: Hashable, requests: List[_BatchRequest]):
+        started = time.time()
+        try:
+            results = self.batch_fn(group, [r.item for r in requests])
+            if len(results) != len(requests):
+                raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(requests)} inputs")
+            for request, result in zip(requests, results):
+                request.result = result
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(requests)} failed: {e}")
+            for request in requests:
+                request.exception = e
+        finished = time.time()
+        with self._lock:
+            self._batches += 1
+            self._requests += len(requests)
+            self._failed += len(requests) if requests[0].exception else 0
+            self._largest_batch = max(self._largest_batch, len(requests))
+            self._busy_seconds += finished - started
+            self._wait_seconds += sum(started - r.submitted_at for r in requests)
+        for request in requests:
+            request.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            uptime = max(1e-9, time.time() - self._started_at)
+            return {
+                "window_ms": round(self.window_seconds * 1000, 1),
+                "max_batch": self.max_batch,
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "requests": self._requests,
+                "failed": self._failed,
+                "avg_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "avg_wait_ms": round(1000 * self._wait_seconds / self._requests, 1) if self._requests else 0.0,
+                "avg_batch_ms": round(1000 * self._busy_seconds / self._batches, 1) if self._batches else 0.0,
+                "requests_per_second": round(self._requests / uptime, 3),
+                "utilization": round(self._busy_seconds / uptime, 3),
+            }
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+WhisPad model residency manager
+Tracks every resident speech model (SenseVoice, pyannote, whisper.cpp
+workers) against a shared RAM budget. Least recently used models that are
+not pinned and not running a job are unloaded when a new model needs room
+or when they have been idle for too long.
+"""
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Any, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def process_rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of a process in bytes (0 when /proc is not available)"""
+    path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class ResidentModel:
+    """A loaded model and how to unload it"""
+
+    def __init__(self, name: str, kind: str, unload: Callable[[], None],
+                 size_bytes: int = 0, size_func: Optional[Callable[[], int]] = None,
+                 pinned: bool = False):
+        self.name = name
+        self.kind = kind
+        self.unload = unload
+        self.size_bytes = size_bytes
+        self.size_func = size_func
+        self.pinned = pinned
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+    @property
+    def size(self) -> int:
+        if self.size_func is not None:
+            try:
+                return self.size_func()
+            except Exception:
+                return self.size_bytes
+        return self.size_bytes
+
+
+class ModelRegistry:
+    """
+    Registry of resident models with a memory budget, LRU and idle eviction.
+
+    Wrappers register a model after loading it, wrap inference in use() so it
+    is never unloaded mid-job, and call reserve() before loading so older
+    models can make room first.
+    """
+
+    def __init__(self, budget_bytes: int = 0, idle_timeout: float = 0,
+                 pinned: Optional[List[str]] = None):
+        self.budget_bytes = budget_bytes      # 0 disables the budget
+        self.idle_timeout = idle_timeout      # 0 disables idle eviction
+        self.pinned_names = set(pinned or [])
+        self.evictions = 0
+        self._models: Dict[str, ResidentModel] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def register(self, name: str, kind: str, unload: Callable[[], None],
+                 size_bytes: int = 0, size_func: Optional[Callable[[], int]] = None):
+        with self._lock:
+            self._models[name] = ResidentModel(
+                name, kind, unload, size_bytes, size_func,
+                pinned=name in self.pinned_names,
+            )
+        logger.info(f"Model {name} resident ({size_bytes / 1024 / 1024:.0f} MB)")
+        self._start_reaper()
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._models.pop(name, None)
+
+    def is_resident(self, name: str) -> bool:
+        with self._lock:
+            return name in self._models
+
+    @contextmanager
+    def use(self, name: str):
+        """Mark a model busy for the duration of a job"""
+        with self._lock:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+                if not self._in_use[name]:
+                    del self._in_use[name]
+                model = self._models.get(name)
+                if model:
+                    model.last_used = time.time()
+
+    def set_pinned(self, name: str, pinned: bool):
+        with self._lock:
+            if pinned:
+                self.pinned_names.add(name)
+            else:
+                self.pinned_names.discard(name)
+            if name in self._models:
+                self._models[name].pinned = pinned
+
+    def _evictable(self, exclude: Optional[str] = None) -> List[ResidentModel]:
+        """Unpinned, idle models, least recently used first (caller holds the lock)"""
+        return sorted(
+            (m for m in self._models.values()
+             if not m.pinned and m.name != exclude and not self._in_use.get(m.name)),
+            key=lambda m: m.last_used,
+        )
+
+    def _unload(self, victims: List[ResidentModel], reason: str):
+        # Unload callbacks run outside the lock; they may call unregister()
+        for model in victims:
+            logger.info(f"Unloading model {model.name} ({reason})")
+            try:
+                model.unload()
+            except Exception as e:
+                logger.error(f"Error unloading model {model.name}: {e}")
+
+    def reserve(self, name: str, needed_bytes: int):
+        """Evict LRU models until the budget has room for a model about to load"""
+        if not self.budget_bytes:
+            return
+        victims = []
+        with self._lock:
+            used = sum(m.size for m in self._models.values() if m.name != name)
+            for model in self._evictable(exclude=name):
+                if used + needed_bytes <= self.budget_bytes:
+                    break
+                used -= model.size
+                victims.append(self._models.pop(model.name))
+            self.evictions += len(victims)
+        if used + needed_bytes > self.budget_bytes:
+            logger.warning(f"Model memory budget exceeded loading {name}: "
+                           f"{(used + needed_bytes) / 1024 / 1024:.0f} MB of {self.budget_bytes / 1024 / 1024:.0f} MB")
+        self._unload(victims, "memory budget")
+
+    def evict(self, name: str) -> bool:
+        """Unload one model on request; pinned and busy models are kept"""
+        with self._lock:
+            model = self._models.get(name)
+            if not model or model.pinned or self._in_use.get(name):
+                return False
+            self._models.pop(name)
+            self.evictions += 1
+        self._unload([model], "requested")
+        return True
+
+    def evict_idle(self):
+        if not self.idle_timeout:
+            return
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            victims = [self._models.pop(m.name) for m in self._evictable() if m.last_used < cutoff]
+            self.evictions += len(victims)
+        self._unload(victims, "idle")
+
+    def _start_reaper(self):
+        if not self.idle_timeout or self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(min(60, self.idle_timeout))
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name='model-reaper', daemon=True)
+        self._reaper.start()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            models = [
+                {
+                    "name": m.name,
+                    "kind": m.kind,
+                    "rss_bytes": m.size,
+                    "pinned": m.pinned,
+                    "in_use": self._in_use.get(m.name, 0),
+                    "loaded_at": m.loaded_at,
+                    "last_used": m.last_used,
+                }
+                for m in sorted(self._models.values(), key=lambda m: m.last_used, reverse=True)
+            ]
+        return {
+            "budget_bytes": self.budget_bytes,
+            "idle_timeout": self.idle_timeout,
+            "resident_bytes": sum(m["rss_bytes"] for m in models),
+            "process_rss_bytes": process_rss_bytes(),
+            "evictions": self.evictions,
+            "models": models,
+        }
+
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the global model registry instance"""
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            pinned = [n.strip() for n in os.getenv('MODEL_PINNED', '').split(',') if n.strip()]
+            _model_registry = ModelRegistry(
+                budget_bytes=int(os.getenv('MODEL_MEMORY_BUDGET_MB', '0')) * 1024 * 1024,
+                idle_timeout=float(os.getenv('MODEL_IDLE_TIMEOUT', '0')),
+                pinned=pinned,
+            )
+        return _model_registry
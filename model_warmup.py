@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+WhisPad model warm-up
+Loads the configured speech models on a background thread at startup and
+runs one dummy inference through each, so the first real request does not
+pay for model loading, dependency installation or kernel/allocator set-up.
+The per-model state backs the /health/ready endpoint.
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WARMUP_PENDING = 'pending'
+WARMUP_LOADING = 'loading'
+WARMUP_READY = 'ready'
+WARMUP_FAILED = 'failed'
+
+
+def warmup_pcm(seconds: float = 1.0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """A short quiet tone with noise, so VAD front-ends still pass it to the model"""
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    rng = np.random.default_rng(0)
+    tone = 0.05 * np.sin(2 * np.pi * 220 * t)
+    return (tone + 0.005 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+class ModelWarmup:
+    """
+    Runs registered warm-up functions in order on one daemon thread.
+
+    A warm-up function loads its model and runs a dummy inference; it returns
+    nothing and raises on failure. Names follow the model registry
+    ('sensevoice', 'pyannote', 'whisper:<file>'); a warmer registered for a
+    prefix such as 'whisper:' receives the part after the colon.
+    """
+
+    def __init__(self):
+        self._warmers: Dict[str, Callable[[str], None]] = {}
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name: str, warmer: Callable[[str], None]):
+        self._warmers[name] = warmer
+
+    def _warmer_for(self, name: str):
+        if name in self._warmers:
+            return self._warmers[name], ''
+        prefix, _, arg = name.partition(':')
+        warmer = self._warmers.get(f'{prefix}:')
+        return warmer, arg
+
+    def start(self, names: List[str]):
+        """Warm the given models in the background; unknown names fail immediately"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            for name in names:
+                self._states[name] = {"status": WARMUP_PENDING, "error": None, "seconds": None}
+            self._thread = threading.Thread(target=self._run, args=(list(names),),
+                                            name='model-warmup', daemon=True)
+            self._thread.start()
+
+    def _set(self, name: str, **fields):
+        with self._lock:
+            self._states[name].update(fields)
+
+    def _run(self, names: List[str]):
+        for name in names:
+            warmer, arg = self._warmer_for(name)
+            if warmer is None:
+                self._set(name, status=WARMUP_FAILED, error='Unknown model')
+                continue
+            self._set(name, status=WARMUP_LOADING)
+            started = time.time()
+            try:
+                warmer(arg)
+                self._set(name, status=WARMUP_READY, seconds=round(time.time() - started, 2))
+                logger.info(f"Model {name} warmed up in {time.time() - started:.1f}s")
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed: {e}")
+                self._set(name, status=WARMUP_FAILED, error=str(e),
+                          seconds=round(time.time() - started, 2))
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {name: dict(state) for name, state in self._states.items()}
+        return {
+            "ready": all(m["status"] == WARMUP_READY for m in models.values()),
+            "finished": all(m["status"] in (WARMUP_READY, WARMUP_FAILED) for m in models.values()),
+            "models": models,
+        }
+
+
+_model_warmup: Optional[ModelWarmup] = None
+
+
+def get_model_warmup() -> ModelWarmup:
+    """Get the global warm-up manager instance"""
+    global _model_warmup
+    if _model_warmup is None:
+        _model_warmup = ModelWarmup()
+    return _model_warmup
+
+
+def configured_models() -> List[str]:
+    """Models named in WARMUP_MODELS (comma-separated, empty disables warm-up)"""
+    return [n.strip() for n in os.getenv('WARMUP_MODELS', '').split(',') if n.strip()]
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+WhisPad provider registry
+Caches the result of transcription provider capability checks (model files
+on disk, whisper.cpp binaries, importable engines) so request handlers read
+a value from memory. Checks run again only after an explicit invalidation,
+e.g. when a model is uploaded, downloaded or deleted, or on
+/api/refresh-providers. Invalidations touch a stamp file so that every
+worker process sharing it re-runs its checks too.
+"""
+
+import os
+import time
+import tempfile
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ProviderRegistry:
+    """
+    Named capability checks with cached results.
+
+    A check is any callable; its return value (a bool, a model list, ...) is
+    cached until invalidate() is called for it or, when ttl is set, until it
+    is older than ttl seconds. A check that raises is cached as None. With a
+    stamp_path, results older than the stamp file are stale as well.
+    """
+
+    def __init__(self, ttl: float = 0, stamp_path: Optional[str] = None):
+        self.ttl = ttl  # 0 keeps results until invalidated
+        self.stamp_path = stamp_path
+        self._checks: Dict[str, Callable[[], Any]] = {}
+        self._values: Dict[str, Any] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.checks_run = 0
+
+    def register(self, name: str, check: Callable[[], Any]):
+        with self._lock:
+            self._checks[name] = check
+            self._values.pop(name, None)
+            self._checked_at.pop(name, None)
+
+    def _stamp(self) -> float:
+        """When any process last invalidated the registry"""
+        if not self.stamp_path:
+            return 0.0
+        try:
+            return os.stat(self.stamp_path).st_mtime
+        except OSError:
+            return 0.0
+
+    def _touch_stamp(self):
+        if not self.stamp_path:
+            return
+        try:
+            with open(self.stamp_path, 'a'):
+                pass
+            os.utime(self.stamp_path)
+        except OSError as e:
+            logger.warning(f"Could not update provider stamp {self.stamp_path}: {e}")
+
+    def _fresh(self, name: str, stamp: float = 0.0) -> bool:
+        if name not in self._checked_at or self._checked_at[name] <= stamp:
+            return False
+        return not self.ttl or time.time() - self._checked_at[name] < self.ttl
+
+    def get(self, name: str) -> Any:
+        """Cached result of a check, running it only when missing or stale"""
+        stamp = self._stamp()
+        with self._lock:
+            if self._fresh(name, stamp):
+                return self._values[name]
+            check = self._checks.get(name)
+        if check is None:
+            return None
+        try:
+            value = check()
+        except Exception as e:
+            logger.error(f"Provider check {name} failed: {e}")
+            value = None
+        with self._lock:
+            self._values[name] = value
+            self._checked_at[name] = time.time()
+            self.checks_run += 1
+        return value
+
+    def is_available(self, name: str) -> bool:
+        return bool(self.get(name))
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one cached result, or all of them (other processes drop all of theirs)"""
+        with self._lock:
+            if name is None:
+                self._checked_at.clear()
+            else:
+                self._checked_at.pop(name, None)
+        self._touch_stamp()
+
+    def refresh(self) -> Dict[str, Any]:
+        """Run every check now and return the new results"""
+        self.invalidate()
+        return {name: self.get(name) for name in list(self._checks)}
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "checks_run": self.checks_run,
+                "providers": {
+                    name: {"value": self._values.get(name), "checked_at": self._checked_at.get(name)}
+                    for name in self._checks
+                },
+            }
+
+
+_provider_registry = None
+
+
+def get_provider_registry() -> ProviderRegistry:
+    """Get the global provider registry instance"""
+    global _provider_registry
+    if _provider_registry is None:
+        _provider_registry = ProviderRegistry(
+            ttl=float(os.getenv('PROVIDER_CHECK_TTL', '0')),
+            stamp_path=os.getenv('PROVIDER_STAMP_FILE') or os.path.join(tempfile.gettempdir(), 'whispad-providers.stamp'),
+        )
+    return _provider_registry
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+WhisPad remote transcription provider
+Dispatches decoded PCM to a registry of worker nodes (worker_node.py) over
+HTTP. Each job goes to the least-loaded healthy node that serves the
+requested engine and model; a node that is down or at capacity is skipped
+and the job is retried on another one. Progress is streamed back while the
+node transcribes.
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import requests
+
+from audio_decode import pcm_to_int16
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class RemoteWorkerError(Exception):
+    """Raised when no worker node could run a transcription"""
+
+
+class NodeBusyError(RemoteWorkerError):
+    """The node is at capacity; another node may take the job"""
+
+
+class WorkerNode:
+    """A worker node as last seen by health checks and by our own dispatches"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.name = self.url
+        # Nodes are tried until a health check says otherwise
+        self.healthy = True
+        self.checked = False
+        self.active = 0
+        self.reported_active = 0
+        self.capacity = 1
+        self.engines: Dict[str, bool] = {}
+        self.models: List[str] = []
+        self.dispatched = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_check = 0.0
+
+    def load(self) -> float:
+        # Our in-flight jobs are also in the node's count once it reports again
+        return max(self.active, self.reported_active) / self.capacity
+
+    def serves(self, engine: str, model: Optional[str]) -> bool:
+        if not self.checked:
+            return True
+        if engine == 'local':
+            return bool(self.engines.get('local')) and model in self.models
+        return bool(self.engines.get(engine))
+
+    def public_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "name": self.name,
+            "healthy": self.healthy,
+            "active": self.active,
+            "reported_active": self.reported_active,
+            "capacity": self.capacity,
+            "engines": self.engines,
+            "models": self.models,
+            "dispatched": self.dispatched,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class RemoteWorkerPool:
+    """Least-loaded dispatch with health checks and retries on other nodes"""
+
+    def __init__(self, urls: List[str], token: Optional[str] = None, timeout: float = 1800,
+                 health_interval: float = 15, max_attempts: int = 3):
+        self.nodes = [WorkerNode(url) for url in urls]
+        self.token = token
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.max_attempts = max(1, max_attempts)
+        self.retries = 0
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _headers(self) -> Dict[str, str]:
+        return {'Authorization': f'Bearer {self.token}'} if self.token else {}
+
+    def start(self):
+        """Start the background health checker"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        def loop():
+            while True:
+                self.check_health()
+                time.sleep(self.health_interval)
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def check_health(self):
+        """Refresh every node's health, load and served models"""
+        for node in self.nodes:
+            try:
+                response = self._session.get(f"{node.url}/health", headers=self._headers(), timeout=5)
+                response.raise_for_status()
+                info = response.json()
+                with self._lock:
+                    node.healthy = True
+                    node.checked = True
+                    node.name = info.get('node') or node.url
+                    node.reported_active = int(info.get('active', 0))
+                    node.capacity = max(1, int(info.get('capacity', 1)))
+                    node.engines = info.get('engines') or {}
+                    node.models = info.get('models') or []
+                    node.last_check = time.time()
+            except (requests.RequestException, ValueError) as e:
+                with self._lock:
+                    if node.healthy:
+                        logger.warning(f"Worker node {node.url} is unhealthy: {e}")
+                    node.healthy = False
+                    node.last_error = str(e)
+                    node.last_check = time.time()
+
+    def _pick(self, engine: str, model: Optional[str], exclude: Set[str]) -> Optional[WorkerNode]:
+        with self._lock:
+            candidates = [n for n in self.nodes
+                          if n.healthy and n.url not in exclude and n.serves(engine, model)]
+            if not candidates:
+                return None
+            node = min(candidates, key=lambda n: (n.load(), n.dispatched))
+            node.active += 1
+            node.dispatched += 1
+            return node
+
+    def is_available(self, engine: Optional[str] = None, model: Optional[str] = None) -> bool:
+        with self._lock:
+            return any(n.healthy and (engine is None or n.serves(engine, model)) for n in self.nodes)
+
+    def models(self) -> List[str]:
+        """whisper.cpp models served by at least one healthy node"""
+        with self._lock:
+            return sorted({m for n in self.nodes if n.healthy for m in n.models})
+
+    def transcribe(self, pcm, engine: str, model: Optional[str] = None, language: Optional[str] = None,
+                   detect_emotion: bool = True, detect_events: bool = True, use_itn: bool = True,
+                   progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """
+        Transcribe on the least-loaded node, retrying on other nodes when one
+        is unreachable, busy or fails mid-stream.
+
+        Returns:
+            The node engine's result dict
+        """
+        params = {
+            "engine": engine,
+            "model": model or '',
+            "language": language or '',
+            "detect_emotion": str(detect_emotion).lower(),
+            "detect_events": str(detect_events).lower(),
+            "use_itn": str(use_itn).lower(),
+        }
+        body = pcm_to_int16(pcm).tobytes()
+        tried: Set[str] = set()
+        last_error = 'no worker node serves this engine and model'
+        for attempt in range(self.max_attempts):
+            node = self._pick(engine, model, tried)
+            if node is None:
+                break
+            tried.add(node.url)
+            if attempt:
+                with self._lock:
+                    self.retries += 1
+            try:
+                return self._post(node, params, body, progress_callback)
+            except NodeBusyError as e:
+                last_error = str(e)
+            except (RemoteWorkerError, requests.RequestException, ValueError) as e:
+                last_error = str(e)
+                with self._lock:
+                    node.failures += 1
+                    node.last_error = last_error
+                    if isinstance(e, requests.ConnectionError):
+                        # Skipped until the next health check finds it back
+                        node.healthy = False
+                logger.warning(f"Worker node {node.url} failed: {e}")
+            finally:
+                with self._lock:
+                    node.active -= 1
+        raise RemoteWorkerError(f"Remote transcription failed: {last_error}")
+
+    def _post(self, node: WorkerNode, params: Dict[str, str], body: bytes,
+              progress_callback: Optional[Callable[[float], None]]) -> Dict[str, Any]:
+        with self._session.post(f"{node.url}/transcribe", params=params, data=body,
+                                headers=self._headers(), stream=True,
+                                timeout=(5, self.timeout)) as response:
+            if response.status_code == 503:
+                raise NodeBusyError(f"{node.name} is at capacity")
+            if response.status_code != 200:
+                raise RemoteWorkerError(f"{node.name} answered {response.status_code}: {response.text[:200]}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if 'result' in event:
+                    return event['result']
+                if progress_callback and 'progress' in event:
+                    try:
+                        progress_callback(event['progress'])
+                    except Exception:
+                        pass
+        raise RemoteWorkerError(f"{node.name} closed the stream before the result")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "nodes": [n.public_dict() for n in self.nodes],
+                "retries": self.retries,
+            }
+
+
+_remote_worker_pool = None
+
+
+def get_remote_worker_pool() -> Optional[RemoteWorkerPool]:
+    """Get the global pool built from REMOTE_WORKER_NODES, or None when unset"""
+    global _remote_worker_pool
+    urls = [u.strip() for u in os.getenv('REMOTE_WORKER_NODES', '').split(',') if u.strip()]
+    if not urls:
+        return None
+    if _remote_worker_pool is None:
+        _remote_worker_pool = RemoteWorkerPool(
+            urls,
+            token=os.getenv('REMOTE_WORKER_TOKEN') or None,
+            timeout=float(os.getenv('REMOTE_WORKER_TIMEOUT', '1800')),
+            health_interval=float(os.getenv('REMOTE_WORKER_HEALTH_INTERVAL', '15')),
+            max_attempts=int(os.getenv('REMOTE_WORKER_MAX_ATTEMPTS', '3')),
+        )
+    return _remote_worker_pool
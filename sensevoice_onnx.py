@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime engine for SenseVoice
+Runs an exported SenseVoiceSmall graph (model.onnx or the int8 model_quant.onnx)
+with the vendored SenseVoice-main frontend and OrtInferSession, so inference
+needs neither torch nor FunASR. Exporting the graph once still does.
+
+Export:  python sensevoice_onnx.py --export [--quantize] [model_dir]
+"""
+
+import os
+import re
+import sys
+import importlib.util
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE, silence_aligned_windows
+
+SENSEVOICE_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SenseVoice-main')
+DEFAULT_MODEL_DIR = os.path.join(os.getcwd(), 'whisper-cpp-models', 'SenseVoiceSmall')
+BPE_MODEL = 'chn_jpn_yue_eng_ko_spectok.bpe.model'
+
+# Prompt ids from SenseVoiceSmall (model.py lid_dict / textnorm_dict)
+LANGUAGE_IDS = {"auto": 0, "zh": 3, "en": 4, "yue": 7, "ja": 11, "ko": 12, "nospeech": 13}
+TEXTNORM_IDS = {"withitn": 14, "woitn": 15}
+
+# Without the FunASR VAD, long inputs are cut into windows of this length
+MAX_WINDOW_SECONDS = 30
+
+LANGUAGE_TAG = re.compile(r'<\|(zh|en|yue|ja|ko|nospeech)\|>')
+
+
+def _load_vendored(name: str):
+    """Import a module from SenseVoice-main/utils without putting it on sys.path"""
+    path = os.path.join(SENSEVOICE_SRC, 'utils', f'{name}.py')
+    spec = importlib.util.spec_from_file_location(f'sensevoice_utils_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def onnx_model_file(model_dir: str, quantize: bool = False) -> str:
+    return os.path.join(model_dir, 'model_quant.onnx' if quantize else 'model.onnx')
+
+
+def is_exported(model_dir: str, quantize: bool = False) -> bool:
+    return all(
+        os.path.exists(os.path.join(model_dir, f))
+        for f in (os.path.basename(onnx_model_file(model_dir, quantize)), 'config.yaml', 'am.mvn', BPE_MODEL)
+    )
+
+
+def _strip_tags(text: str) -> str:
+    return re.sub(r'<\|[^|]*\|>', '', text).strip()
+
+
+class SenseVoiceOnnxModel:
+    """
+    SenseVoiceSmall on ONNX Runtime. generate() mirrors the subset of
+    FunASR AutoModel.generate used by SenseVoiceWrapper and returns the same
+    rich text with language/emotion/event tags.
+    """
+
+    def __init__(self, model_dir: str = DEFAULT_MODEL_DIR, quantize: bool = False,
+                 intra_op_threads: int = 4):
+        import sentencepiece
+
+        infer_utils = _load_vendored('infer_utils')
+        frontend = _load_vendored('frontend')
+
+        config = infer_utils.read_yaml(os.path.join(model_dir, 'config.yaml'))
+        config['frontend_conf']['cmvn_file'] = os.path.join(model_dir, 'am.mvn')
+        self._frontend_module = frontend
+        self._frontend_conf = config['frontend_conf']
+        self.frontend = frontend.WavFrontend(**config['frontend_conf'])
+        self.session = infer_utils.OrtInferSession(
+            onnx_model_file(model_dir, quantize), device_id=-1,
+            intra_op_num_threads=intra_op_threads,
+        )
+        self.tokenizer = sentencepiece.SentencePieceProcessor(
+            model_file=os.path.join(model_dir, BPE_MODEL)
+        )
+        self.quantize = quantize
+        self.blank_id = 0
+
+    def new_frontend(self):
+        """A frontend with its own fbank state, for one incremental stream"""
+        return self._frontend_module.WavFrontend(**self._frontend_conf)
+
+    def _features(self, item):
+        # Streams pass (features, length) computed incrementally by OnlineFeatures
+        if isinstance(item, tuple):
+            return item
+        speech, _ = self.frontend.fbank(item)
+        return self.frontend.lfr_cmvn(speech)
+
+    def infer_batch(self, waveforms: list, language: str = 'auto',
+                    use_itn: bool = True) -> List[str]:
+        """
+        Recognize several 16 kHz waveforms (or precomputed (features, length)
+        tuples) in one padded session run
+        """
+        feats = [self._features(w) for w in waveforms]
+        max_len = max(int(length) for _, length in feats)
+        batch = np.zeros((len(feats), max_len, feats[0][0].shape[1]), dtype=np.float32)
+        for i, (feat, length) in enumerate(feats):
+            batch[i, :int(length)] = feat
+        lengths = np.array([int(length) for _, length in feats], dtype=np.int32)
+        lid = LANGUAGE_IDS.get(language, 0)
+        tn = TEXTNORM_IDS['withitn' if use_itn else 'woitn']
+        ctc_logits, out_lens = self.session([
+            batch, lengths,
+            np.full(len(feats), lid, dtype=np.int32),
+            np.full(len(feats), tn, dtype=np.int32),
+        ])
+        texts = []
+        for b in range(len(feats)):
+            # Greedy CTC: best token per frame, collapse repeats, drop blanks
+            ids = ctc_logits[b, :int(out_lens[b])].argmax(axis=-1)
+            if len(ids):
+                ids = ids[np.insert(np.diff(ids) != 0, 0, True)]
+            texts.append(self.tokenizer.decode([int(i) for i in ids if i != self.blank_id]))
+        return texts
+
+    def generate(self, input, fs: int = SAMPLE_RATE, language: str = 'auto',
+                 use_itn: bool = True, **kwargs) -> List[Dict]:
+        """
+        FunASR-compatible entry point: returns [{"text", "language"}], one per
+        input when given a list. The windows of all inputs share one session run.
+        """
+        inputs = input if isinstance(input, list) else [input]
+        spans, waveforms = [], []
+        for pcm in inputs:
+            if isinstance(pcm, tuple):
+                spans.append((len(waveforms), len(waveforms) + 1))
+                waveforms.append(pcm)
+                continue
+            windows = silence_aligned_windows(pcm, fs, MAX_WINDOW_SECONDS)
+            spans.append((len(waveforms), len(waveforms) + len(windows)))
+            waveforms.extend(pcm[s:e] for s, e in windows)
+        texts = self.infer_batch(waveforms, language, use_itn) if waveforms else []
+        results = [self._merge([t for t in texts[a:b] if t], language) for a, b in spans]
+        if not isinstance(input, list):
+            return [r for r in results if r["text"]]
+        return results
+
+    @staticmethod
+    def _merge(texts: List[str], language: str) -> Dict:
+        if not texts:
+            return {"text": "", "language": language}
+        # Keep the tags of the first window and the plain text of the rest
+        text = " ".join([texts[0]] + [_strip_tags(t) for t in texts[1:]])
+        match = LANGUAGE_TAG.search(texts[0])
+        return {"text": text, "language": match.group(1) if match else language}
+
+
+class OnlineFeatures:
+    """
+    Filterbank features of one live stream, extended chunk by chunk: only
+    the frames a chunk completes are read from the online fbank, so earlier
+    audio is never re-analysed or copied again. LFR and CMVN are applied to
+    the accumulated frames when a hypothesis is needed.
+    """
+
+    def __init__(self, model: SenseVoiceOnnxModel):
+        self.frontend = model.new_frontend()
+        self._blocks: List[np.ndarray] = []
+        self._seen = 0  # fbank frames already read
+
+    def accept(self, pcm: np.ndarray):
+        if not len(pcm):
+            return
+        # WavFrontend.fbank_online re-reads every frame from 0 on each call,
+        # so feed its OnlineFbank directly and read just the new frames
+        fbank_fn = self.frontend.fbank_fn
+        fbank_fn.accept_waveform(self.frontend.opts.frame_opts.samp_freq, (pcm * (1 << 15)).tolist())
+        ready = fbank_fn.num_frames_ready
+        if ready > self._seen:
+            block = np.array([fbank_fn.get_frame(i) for i in range(self._seen, ready)], dtype=np.float32)
+            self._blocks.append(block)
+            self._seen = ready
+
+    def reset(self):
+        """Start a new segment (drops the online fbank cache)"""
+        self.frontend.reset_status()
+        self._blocks = []
+        self._seen = 0
+
+    def features(self):
+        """(features, length) of the segment so far, or None before the first frame"""
+        if not self._blocks:
+            return None
+        if len(self._blocks) > 1:
+            self._blocks = [np.concatenate(self._blocks)]
+        return self.frontend.lfr_cmvn(self._blocks[0])
+
+
+def rich_transcription_postprocess(text: str) -> str:
+    """Postprocess rich text, using FunASR's formatter when it is installed"""
+    try:
+        from funasr.utils.postprocess_utils import rich_transcription_postprocess as funasr_postprocess
+        return funasr_postprocess(text)
+    except ImportError:
+        return text
+
+
+def quantize_onnx(model_dir: str) -> str:
+    """Write model_quant.onnx next to model.onnx with the settings of utils/export_utils._onnx"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    import onnx
+
+    model_path = onnx_model_file(model_dir)
+    quant_model_path = onnx_model_file(model_dir, quantize=True)
+    onnx_model = onnx.load(model_path)
+    nodes_to_exclude = [
+        n.name for n in onnx_model.graph.node
+        if "output" in n.name or "bias_encoder" in n.name or "bias_decoder" in n.name
+    ]
+    quantize_dynamic(
+        model_input=model_path,
+        model_output=quant_model_path,
+        op_types_to_quantize=["MatMul"],
+        per_channel=True,
+        reduce_range=False,
+        weight_type=QuantType.QUInt8,
+        nodes_to_exclude=nodes_to_exclude,
+    )
+    return quant_model_path
+
+
+def export_onnx(model_dir: str = DEFAULT_MODEL_DIR, quantize: bool = False) -> str:
+    """
+    Export the PyTorch checkpoint in model_dir to model.onnx (needs torch and
+    FunASR), then optionally quantize it to int8
+    """
+    if not os.path.exists(onnx_model_file(model_dir)):
+        from funasr import AutoModel
+        print(f"Exporting SenseVoice ONNX graph to {model_dir}")
+        AutoModel(model=model_dir, device="cpu").export(type="onnx", quantize=False, output_dir=model_dir)
+    if quantize and not os.path.exists(onnx_model_file(model_dir, quantize=True)):
+        print("Quantizing SenseVoice ONNX graph to int8")
+        quantize_onnx(model_dir)
+    return onnx_model_file(model_dir, quantize)
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if '--export' not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+    path = export_onnx(args[0] if args else DEFAULT_MODEL_DIR, quantize='--quantize' in sys.argv)
+    print(f"SenseVoice ONNX model ready: {path}")
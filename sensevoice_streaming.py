@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+WhisPad streaming SenseVoice recognition
+SenseVoice has no streaming encoder, so live audio is split into speech
+segments with an energy endpointer. The open segment is re-decoded every
+partial_interval seconds to give a partial hypothesis, and each closed
+segment is decoded once and committed. When recording stops, only the last
+open segment is left to decode. With several web worker processes, session
+state is kept in a shared directory so any worker can serve the next chunk.
+"""
+
+import os
+import json
+import stat
+import time
+import uuid
+import fcntl
+import zipfile
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE, find_silence_cut
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.1
+
+
+class StreamingRecognizer:
+    """
+    Incremental recognizer for one recording.
+
+    `recognize(pcm, features)` decodes a segment and returns its text;
+    `features` is an optional OnlineFeatures object fed alongside the PCM so
+    engines that support it skip re-extracting filterbanks.
+    """
+
+    def __init__(self, recognize: Callable[[np.ndarray, Any], str],
+                 features: Any = None, sample_rate: int = SAMPLE_RATE,
+                 partial_interval: float = 1.0, endpoint_silence: float = 0.6,
+                 max_segment: float = 15.0, min_rms: float = 0.01):
+        self.recognize = recognize
+        self.features = features
+        self.sample_rate = sample_rate
+        self.partial_interval = partial_interval
+        self.endpoint_silence = endpoint_silence
+        self.max_segment = max_segment
+        self.min_rms = min_rms
+        self.segments: List[str] = []
+        self.partial = ''
+        self.audio_seconds = 0.0
+        self._frame = int(FRAME_SECONDS * sample_rate)
+        self._segment = np.zeros(0, dtype=np.float32)
+        self._pending = np.zeros(0, dtype=np.float32)  # samples not yet framed
+        self._has_speech = False
+        self._silence_frames = 0
+        self._noise_rms = None
+        self._since_partial = 0
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(t for t in self.segments + [self.partial] if t)
+
+    def _is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(np.square(frame))))
+        if self._noise_rms is None:
+            self._noise_rms = min(rms, self.min_rms)
+        speech = rms > max(self.min_rms, 3 * self._noise_rms)
+        if not speech:
+            self._noise_rms = 0.95 * self._noise_rms + 0.05 * rms
+        return speech
+
+    def _restart(self, tail: np.ndarray):
+        """Begin a new open segment holding `tail`"""
+        self._segment = tail
+        self._has_speech = False
+        self._silence_frames = 0
+        self._since_partial = 0
+        self.partial = ''
+        if self.features is not None:
+            self.features.reset()
+            self.features.accept(tail)
+
+    def _commit(self, end: int) -> Dict[str, Any]:
+        """Decode the open segment up to sample `end` and commit its text"""
+        head, tail = self._segment[:end], self._segment[end:]
+        if self.features is not None and end < len(self._segment):
+            # Features of the head alone are needed; rebuild them from its samples
+            self.features.reset()
+            self.features.accept(head)
+        text = self.recognize(head, self.features) if self._has_speech else ''
+        if text:
+            self.segments.append(text)
+        self._restart(tail)
+        return {"type": "final", "text": text, "transcript": self.transcript}
+
+    def accept(self, pcm: np.ndarray) -> List[Dict[str, Any]]:
+        """Feed newly recorded samples; returns partial/final events"""
+        pcm = np.asarray(pcm, dtype=np.float32)
+        self.audio_seconds += len(pcm) / self.sample_rate
+        self._segment = np.concatenate((self._segment, pcm))
+        if self.features is not None:
+            self.features.accept(pcm)
+        self._pending = np.concatenate((self._pending, pcm))
+        self._since_partial += len(pcm)
+
+        events = []
+        n_frames = len(self._pending) // self._frame
+        for i in range(n_frames):
+            if self._is_speech(self._pending[i * self._frame:(i + 1) * self._frame]):
+                self._has_speech = True
+                self._silence_frames = 0
+            else:
+                self._silence_frames += 1
+        self._pending = self._pending[n_frames * self._frame:]
+
+        silence = self._silence_frames * FRAME_SECONDS
+        if self._has_speech and silence >= self.endpoint_silence:
+            # End of an utterance: keep the trailing silence out of the segment
+            events.append(self._commit(len(self._segment) - int(silence * self.sample_rate) // 2))
+        elif len(self._segment) >= self.max_segment * self.sample_rate:
+            if self._has_speech:
+                cut = find_silence_cut(self._segment, 0, len(self._segment), self.sample_rate, 3, FRAME_SECONDS)
+                events.append(self._commit(cut))
+            else:
+                self._restart(self._segment[-int(self.endpoint_silence * self.sample_rate):])
+        elif not self._has_speech and silence > self.endpoint_silence:
+            # Leading silence only: drop it so it is not decoded again and again
+            self._restart(self._segment[-int(self.endpoint_silence * self.sample_rate):])
+        elif self._has_speech and self._since_partial >= self.partial_interval * self.sample_rate:
+            self._since_partial = 0
+            self.partial = self.recognize(self._segment, self.features)
+            events.append({"type": "partial", "text": self.partial, "transcript": self.transcript})
+        return events
+
+    def finish(self) -> Dict[str, Any]:
+        """Decode what is left of the recording and return the final transcript"""
+        event = self._commit(len(self._segment))
+        event["audio_seconds"] = round(self.audio_seconds, 2)
+        return event
+
+    # Decoding progress, without the engine callables, so another process can resume it
+    _STATE = ('segments', 'partial', 'audio_seconds', '_segment', '_pending', '_has_speech',
+              '_silence_frames', '_noise_rms', '_since_partial')
+
+    def get_state(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._STATE}
+
+    def set_state(self, state: Dict[str, Any]):
+        for name in self._STATE:
+            setattr(self, name, state[name])
+        if self.features is not None:
+            self.features.reset()
+            self.features.accept(self._segment)
+
+
+class StreamSession:
+    """A recognizer plus the bookkeeping the HTTP layer needs"""
+
+    def __init__(self, owner: str, recognizer: StreamingRecognizer,
+                 params: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.recognizer = recognizer
+        self.params = params or {}  # what the factory needs to rebuild the recognizer
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+        self.lock = threading.Lock()
+
+
+class StreamSessionManager:
+    """
+    Live streaming sessions, capped in number and expired when idle.
+
+    Sessions live in memory unless state_dir is given; then each one is a
+    file there, locked while a chunk is processed, and `factory(params)`
+    rebuilds the recognizer in whichever process serves the request.
+    """
+
+    def __init__(self, max_sessions: int = 8, idle_timeout: float = 120,
+                 state_dir: Optional[str] = None,
+                 factory: Optional[Callable[[Dict[str, Any]], StreamingRecognizer]] = None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.state_dir = state_dir
+        self.factory = factory
+        self._sessions: Dict[str, StreamSession] = {}
+        self._lock = threading.Lock()
+        if state_dir:
+            self._check_state_dir(state_dir)
+
+    @staticmethod
+    def _check_state_dir(state_dir: str):
+        """Create the state directory, or make sure an existing one is private to this user"""
+        os.makedirs(state_dir, mode=0o700, exist_ok=True)
+        info = os.lstat(state_dir)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+            raise RuntimeError(f"Stream state directory {state_dir} is not a directory owned by this user")
+        if info.st_mode & 0o022:
+            raise RuntimeError(f"Stream state directory {state_dir} is writable by other users")
+        if info.st_mode & 0o077:
+            os.chmod(state_dir, 0o700)
+
+    def _path(self, session_id: str) -> str:
+        if len(session_id) != 32 or not all(c in '0123456789abcdef' for c in session_id):
+            raise ValueError('Invalid stream id')
+        return os.path.join(self.state_dir, f"{session_id}.session")
+
+    def _session_ids(self) -> List[str]:
+        return [name[:-8] for name in os.listdir(self.state_dir) if name.endswith('.session')]
+
+    def _expire(self):
+        cutoff = time.time() - self.idle_timeout
+        if self.state_dir:
+            for session_id in self._session_ids():
+                try:
+                    if os.path.getmtime(self._path(session_id)) < cutoff:
+                        logger.info(f"Streaming session {session_id} expired")
+                        self._remove(session_id)
+                except (OSError, ValueError):
+                    pass
+            return
+        for session_id in [s.id for s in self._sessions.values() if s.last_activity < cutoff]:
+            logger.info(f"Streaming session {session_id} expired")
+            del self._sessions[session_id]
+
+    def _save(self, session: StreamSession):
+        # Audio buffers go in as arrays and everything else as JSON, so
+        # loading a session never unpickles anything
+        state = session.recognizer.get_state()
+        arrays = {name: value for name, value in state.items() if isinstance(value, np.ndarray)}
+        meta = {
+            "owner": session.owner,
+            "params": session.params,
+            "created_at": session.created_at,
+            "state": {name: value for name, value in state.items() if name not in arrays},
+        }
+        path = self._path(session.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, __meta__=np.array(json.dumps(meta, default=lambda o: o.item())), **arrays)
+        os.replace(tmp_path, path)
+
+    def _load(self, session_id: str) -> Optional[StreamSession]:
+        try:
+            with np.load(self._path(session_id), allow_pickle=False) as data:
+                meta = json.loads(str(data["__meta__"]))
+                state = dict(meta["state"])
+                state.update({name: data[name] for name in data.files if name != "__meta__"})
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+        recognizer = self.factory(meta["params"])
+        recognizer.set_state(state)
+        session = StreamSession(meta["owner"], recognizer, meta["params"])
+        session.id = session_id
+        session.created_at = meta["created_at"]
+        return session
+
+    def _remove(self, session_id: str):
+        for suffix in ('.session', '.lock'):
+            try:
+                os.remove(self._path(session_id)[:-8] + suffix)
+            except OSError:
+                pass
+
+    def create(self, owner: str, recognizer: StreamingRecognizer,
+               params: Optional[Dict[str, Any]] = None) -> Optional[StreamSession]:
+        """Open a session, or None when the limit of live sessions is reached"""
+        with self._lock:
+            self._expire()
+            if self.count() >= self.max_sessions:
+                return None
+            session = StreamSession(owner, recognizer, params)
+            if self.state_dir:
+                self._save(session)
+            else:
+                self._sessions[session.id] = session
+            return session
+
+    @contextmanager
+    def open(self, session_id: str, owner: str) -> Iterator[Optional[StreamSession]]:
+        """
+        Hold a session for one request; yields None when it does not exist or
+        belongs to someone else. Shared sessions are saved again afterwards
+        unless they were closed meanwhile.
+        """
+        if not self.state_dir:
+            with self._lock:
+                session = self._sessions.get(session_id)
+            if session is None or session.owner != owner:
+                yield None
+                return
+            session.last_activity = time.time()
+            with session.lock:
+                yield session
+            return
+
+        lock_path = self._path(session_id)[:-8] + '.lock'
+        if not os.path.exists(self._path(session_id)):
+            yield None
+            return
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                session = self._load(session_id)
+                if session is None or session.owner != owner:
+                    yield None
+                    return
+                yield session
+                if os.path.exists(self._path(session_id)):  # not closed meanwhile
+                    self._save(session)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def close(self, session_id: str):
+        if self.state_dir:
+            self._remove(session_id)
+        else:
+            with self._lock:
+                self._sessions.pop(session_id, None)
+
+    def count(self) -> int:
+        if self.state_dir:
+            return len(self._session_ids())
+        return len(self._sessions)
@@ -5,10 +5,28 @@ Supports multilingual speech recognition with emotion and event detection
 
 import os
 import sys
-import tempfile
+import gc
 import json
+import threading
 import traceback
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from audio_decode import decode_audio_bytes, AudioDecodeError, SAMPLE_RATE, silence_aligned_windows
+from model_registry import get_model_registry, process_rss_bytes
+from micro_batcher import MicroBatcher
+from compute_scheduler import get_compute_scheduler
+from sensevoice_streaming import StreamingRecognizer
+
+# Name of the model in the residency registry
+REGISTRY_NAME = 'sensevoice'
+
+# Window length used to report progress on long recordings (matches batch_size_s)
+PROGRESS_WINDOW_SECONDS = 60
+
+# Inference engine: 'torch' (FunASR AutoModel) or 'onnx' (ONNX Runtime)
+SENSEVOICE_ENGINE = os.getenv('SENSEVOICE_ENGINE', 'torch').lower()
 
 
 class SenseVoiceWrapper:
@@ -17,6 +35,14 @@ class SenseVoiceWrapper:
     def __init__(self):
         self.model = None
         self.model_loaded = False
+        self.model_size_bytes = 0
+        self.intra_op_threads = 1  # set when the ONNX engine loads
+        self._load_lock = threading.Lock()
+        self.batcher = MicroBatcher(
+            'sensevoice', self._generate_batch,
+            window_seconds=float(os.getenv('SENSEVOICE_BATCH_WINDOW_MS', '10')) / 1000,
+            max_batch=int(os.getenv('SENSEVOICE_MAX_BATCH', '8')),
+        )
         self.supported_languages = {
             'auto': 'Auto-detect',
             'zh': 'Chinese (Mandarin)',
@@ -50,45 +76,65 @@ class SenseVoiceWrapper:
             'Cough': '😷 Cough'
         }
         
+    def _candidate_model_dirs(self) -> List[str]:
+        """Directories that may hold the SenseVoice model, in lookup order"""
+        possible_locations = [
+            # Original location in whisper-cpp-models
+            os.path.join(os.getcwd(), 'whisper-cpp-models', 'SenseVoiceSmall'),
+            # FunASR cache locations (common cache directories)
+            os.path.expanduser('~/.cache/funasr/iic/SenseVoiceSmall'),
+            os.path.expanduser('~/.cache/funasr/FunAudioLLM/SenseVoiceSmall'),
+            os.path.expanduser('~/.cache/huggingface/hub/models--FunAudioLLM--SenseVoiceSmall/snapshots'),
+            os.path.expanduser('~/.cache/modelscope/iic/SenseVoiceSmall'),
+            # Alternative local locations
+            os.path.join(os.getcwd(), 'models', 'SenseVoiceSmall'),
+            os.path.join(os.getcwd(), 'SenseVoiceSmall'),
+        ]
+        candidates = []
+        for model_dir in possible_locations:
+            if not os.path.exists(model_dir):
+                continue
+            # For huggingface cache, check subdirectories
+            if 'snapshots' in model_dir:
+                try:
+                    for snapshot_dir in sorted(os.listdir(model_dir)):
+                        snapshot_path = os.path.join(model_dir, snapshot_dir)
+                        if os.path.isdir(snapshot_path):
+                            candidates.append(snapshot_path)
+                except OSError:
+                    continue
+            else:
+                candidates.append(model_dir)
+        return candidates
+
+    def _find_model_dir(self) -> Optional[str]:
+        """First directory with the PyTorch checkpoint, or None"""
+        for model_dir in self._candidate_model_dirs():
+            if self._check_model_files(model_dir, ['config.yaml', 'model.pt']):
+                return model_dir
+        return None
+
+    def _find_onnx_model_dir(self, quantize: bool) -> Optional[str]:
+        """First directory with an exported graph, else the checkpoint to export it from"""
+        import sensevoice_onnx
+        for model_dir in self._candidate_model_dirs():
+            if sensevoice_onnx.is_exported(model_dir, quantize):
+                return model_dir
+        return self._find_model_dir()
+
     def is_available(self) -> bool:
         """Check if SenseVoice is available and model exists (always fresh check)"""
         try:
             # Always perform a fresh check - don't cache results
-            # List of possible model locations to check
-            possible_locations = [
-                # Original location in whisper-cpp-models
-                os.path.join(os.getcwd(), 'whisper-cpp-models', 'SenseVoiceSmall'),
-                # FunASR cache locations (common cache directories)
-                os.path.expanduser('~/.cache/funasr/iic/SenseVoiceSmall'),
-                os.path.expanduser('~/.cache/funasr/FunAudioLLM/SenseVoiceSmall'),
-                os.path.expanduser('~/.cache/huggingface/hub/models--FunAudioLLM--SenseVoiceSmall/snapshots'),
-                os.path.expanduser('~/.cache/modelscope/iic/SenseVoiceSmall'),
-                # Alternative local locations
-                os.path.join(os.getcwd(), 'models', 'SenseVoiceSmall'),
-                os.path.join(os.getcwd(), 'SenseVoiceSmall'),
-            ]
-            
-            required_files = ['config.yaml', 'model.pt']
-            
-            for model_dir in possible_locations:
-                if os.path.exists(model_dir):
-                    # For huggingface cache, check subdirectories
-                    if 'snapshots' in model_dir:
-                        # Check all snapshot subdirectories
-                        try:
-                            for snapshot_dir in os.listdir(model_dir):
-                                snapshot_path = os.path.join(model_dir, snapshot_dir)
-                                if os.path.isdir(snapshot_path):
-                                    if self._check_model_files(snapshot_path, required_files):
-                                        print(f"SenseVoice model found at: {snapshot_path}")
-                                        return True
-                        except:
-                            continue
-                    else:
-                        # Check the directory directly
-                        if self._check_model_files(model_dir, required_files):
-                            print(f"SenseVoice model found at: {model_dir}")
-                            return True
+            if SENSEVOICE_ENGINE == 'onnx':
+                # An exported graph is enough; model.pt is only needed to export it
+                quantize = os.getenv('SENSEVOICE_ONNX_QUANTIZE', 'false').lower() == 'true'
+                model_dir = self._find_onnx_model_dir(quantize)
+            else:
+                model_dir = self._find_model_dir()
+            if model_dir:
+                print(f"SenseVoice model found at: {model_dir}")
+                return True
             
             # If model not found locally, do not expose the provider
             # (behave like local Whisper models)
@@ -216,7 +262,31 @@ class SenseVoiceWrapper:
         """Load the SenseVoice model"""
         if self.model_loaded:
             return True
-            
+        with self._load_lock:
+            if self.model_loaded:
+                return True
+            registry = get_model_registry()
+            registry.reserve(REGISTRY_NAME, self.model_size_bytes)
+            rss_before = process_rss_bytes()
+            if not self._do_load_model():
+                return False
+            # The RSS growth while loading is the model's footprint
+            self.model_size_bytes = max(self.model_size_bytes, process_rss_bytes() - rss_before)
+            registry.register(REGISTRY_NAME, 'sensevoice', self.unload_model, self.model_size_bytes)
+            return True
+
+    def unload_model(self):
+        """Release the SenseVoice model so its memory can be reused"""
+        with self._load_lock:
+            self.model = None
+            self.model_loaded = False
+        get_model_registry().unregister(REGISTRY_NAME)
+        gc.collect()
+        print("SenseVoice model unloaded")
+
+    def _do_load_model(self):
+        if SENSEVOICE_ENGINE == 'onnx':
+            return self._load_onnx_model()
         try:
             print("Starting SenseVoice model loading process...")
             
@@ -295,6 +365,35 @@ class SenseVoiceWrapper:
             traceback.print_exc()
             return False
     
+    def _load_onnx_model(self):
+        """Load the exported SenseVoice graph on ONNX Runtime (no torch or FunASR needed)"""
+        try:
+            import sensevoice_onnx
+
+            quantize = os.getenv('SENSEVOICE_ONNX_QUANTIZE', 'false').lower() == 'true'
+            model_dir = self._find_onnx_model_dir(quantize)
+            if model_dir is None:
+                raise FileNotFoundError("SenseVoice model not found in any location")
+            if not sensevoice_onnx.is_exported(model_dir, quantize):
+                # Exporting needs the PyTorch stack once; later loads do not
+                print("SenseVoice ONNX model not found, exporting it from the PyTorch checkpoint...")
+                if not self._install_dependencies():
+                    return False
+                sensevoice_onnx.export_onnx(model_dir, quantize)
+
+            threads = int(os.getenv('SENSEVOICE_INTRA_OP_THREADS', '4'))
+            print(f"Loading SenseVoice ONNX model (quantized={quantize}, threads={threads})...")
+            self.model = sensevoice_onnx.SenseVoiceOnnxModel(model_dir, quantize, threads)
+            self.intra_op_threads = threads
+            self.rich_transcription_postprocess = sensevoice_onnx.rich_transcription_postprocess
+            self.model_loaded = True
+            print("SenseVoice ONNX model loaded successfully!")
+            return True
+        except Exception as e:
+            print(f"Error loading SenseVoice ONNX model: {e}")
+            traceback.print_exc()
+            return False
+
     def transcribe_audio_from_bytes(self, audio_bytes: bytes, filename: str, 
                                   language: Optional[str] = None, 
                                   detect_emotion: bool = True,
@@ -314,6 +413,90 @@ class SenseVoiceWrapper:
         Returns:
             Dictionary with transcription results
         """
+        try:
+            print(f"Decoding {filename} in memory for SenseVoice")
+            pcm = decode_audio_bytes(audio_bytes)
+        except AudioDecodeError as e:
+            return {
+                'success': False,
+                'error': f'Could not decode audio: {str(e)}'
+            }
+        return self.transcribe_pcm(pcm, language, detect_emotion, detect_events, use_itn)
+    
+    def transcribe_pcm(self, pcm: np.ndarray,
+                       language: Optional[str] = None,
+                       detect_emotion: bool = True,
+                       detect_events: bool = True,
+                       use_itn: bool = True,
+                       progress_callback: Optional[Callable[[float], None]] = None) -> Dict:
+        """
+        Transcribe decoded 16 kHz mono float32 PCM with SenseVoice
+        
+        The array is handed to FunASR directly, so no temporary file is written.
+        With a progress_callback, long recordings are recognized in
+        silence-aligned windows and the percent done is reported after each.
+        
+        Returns:
+            Dictionary with transcription results
+        """
+        # Keep the model resident while this job runs
+        with get_model_registry().use(REGISTRY_NAME):
+            return self._transcribe_pcm(pcm, language, detect_emotion, detect_events, use_itn,
+                                        progress_callback)
+
+    def _generate(self, pcm: np.ndarray, language: str, use_itn: bool,
+                  progress_callback: Optional[Callable[[float], None]]) -> list:
+        """Run the model on the whole buffer, or window by window when reporting progress"""
+        windows = [(0, len(pcm))]
+        if progress_callback:
+            windows = silence_aligned_windows(pcm, SAMPLE_RATE, PROGRESS_WINDOW_SECONDS)
+        results = []
+        for start, end in windows:
+            # Concurrent requests with the same options share one generate() call
+            res = self.batcher.submit(pcm[start:end], group=(language, use_itn))
+            if res:
+                results.append(res)
+            if progress_callback:
+                progress_callback(100.0 * end / max(1, len(pcm)))
+        if len(results) <= 1:
+            return results
+        return [{
+            "text": " ".join(r.get("text", "") for r in results if r.get("text")),
+            "language": results[0].get("language"),
+        }]
+
+    def _generate_batch(self, group, inputs: List[np.ndarray]) -> list:
+        """Run one generate() over every waveform the batcher collected"""
+        if SENSEVOICE_ENGINE == 'onnx':
+            # ONNX Runtime sessions use the intra-op thread count fixed at load
+            with get_compute_scheduler().threads('sensevoice', self.intra_op_threads, self.intra_op_threads):
+                return self._generate_batch_reserved(group, inputs)
+        with get_compute_scheduler().torch_threads('sensevoice'):
+            return self._generate_batch_reserved(group, inputs)
+
+    def _generate_batch_reserved(self, group, inputs: List[np.ndarray]) -> list:
+        language, use_itn = group
+        res = self.model.generate(
+            input=inputs if len(inputs) > 1 else inputs[0],
+            fs=SAMPLE_RATE,
+            cache={},
+            language=language,
+            use_itn=use_itn,
+            batch_size_s=60,
+            merge_vad=False,  # Don't merge VAD segments for better detection
+            merge_length_s=0,  # Don't merge short segments
+        )
+        res = res or []
+        if len(inputs) == 1:
+            return [res[0] if res else None]
+        if len(res) != len(inputs):
+            # Results cannot be matched to inputs; run them one by one instead
+            return [self._generate_batch_reserved(group, [pcm])[0] for pcm in inputs]
+        return res
+
+    def _transcribe_pcm(self, pcm: np.ndarray, language: Optional[str],
+                        detect_emotion: bool, detect_events: bool, use_itn: bool,
+                        progress_callback: Optional[Callable[[float], None]] = None) -> Dict:
         try:
             # Load model if not already loaded
             if not self._load_model():
@@ -322,72 +505,52 @@ class SenseVoiceWrapper:
                     'error': 'Failed to load SenseVoice model'
                 }
             
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_file.write(audio_bytes)
-                temp_audio_path = temp_file.name
+            # Set language
+            if not language or language == 'auto':
+                language = "auto"
+            elif language not in self.supported_languages:
+                language = "auto"
             
-            try:
-                # Set language
-                if not language or language == 'auto':
-                    language = "auto"
-                elif language not in self.supported_languages:
-                    language = "auto"
-                
-                # Perform transcription with less strict VAD settings
-                print(f"Transcribing with SenseVoice: language={language}")
-                res = self.model.generate(
-                    input=temp_audio_path,
-                    cache={},
-                    language=language,
-                    use_itn=use_itn,
-                    batch_size_s=60,
-                    merge_vad=False,  # Don't merge VAD segments for better detection
-                    merge_length_s=0,  # Don't merge short segments
-                )
-                
-                if not res or len(res) == 0:
-                    return {
-                        'success': False,
-                        'error': 'No transcription result returned'
-                    }
-                
-                # Process results
-                result = res[0]
-                
-                # Get raw and processed text
-                raw_text = result.get("text", "")
-                processed_text = self.rich_transcription_postprocess(raw_text)
-                
-                # Extract emotion and event information if available
-                emotion = None
-                events = []
-                
-                # Parse rich transcription for emotion and events
-                if detect_emotion or detect_events:
-                    emotion, events = self._parse_rich_transcription(raw_text)
-                
-                # Clean text for final output (remove special tokens)
-                clean_text = self._clean_transcription_text(processed_text)
-                
+            # Perform transcription with less strict VAD settings
+            print(f"Transcribing with SenseVoice: language={language}")
+            res = self._generate(pcm, language, use_itn, progress_callback)
+            
+            if not res or len(res) == 0:
                 return {
-                    'success': True,
-                    'transcription': clean_text,
-                    'raw_text': raw_text,
-                    'processed_text': processed_text,
-                    'language_detected': result.get("language", language),
-                    'emotion': emotion if detect_emotion else None,
-                    'events': events if detect_events else [],
-                    'model': 'SenseVoiceSmall',
-                    'provider': 'sensevoice'
+                    'success': False,
+                    'error': 'No transcription result returned'
                 }
-                
-            finally:
-                # Clean up temporary file
-                try:
-                    os.unlink(temp_audio_path)
-                except:
-                    pass
+            
+            # Process results
+            result = res[0]
+            
+            # Get raw and processed text
+            raw_text = result.get("text", "")
+            processed_text = self.rich_transcription_postprocess(raw_text)
+            
+            # Extract emotion and event information if available
+            emotion = None
+            events = []
+            
+            # Parse rich transcription for emotion and events
+            if detect_emotion or detect_events:
+                emotion, events = self._parse_rich_transcription(raw_text)
+            
+            # Clean text for final output (remove special tokens)
+            clean_text = self._clean_transcription_text(processed_text)
+            
+            return {
+                'success': True,
+                'transcription': clean_text,
+                'raw_text': raw_text,
+                'processed_text': processed_text,
+                'language_detected': result.get("language", language),
+                'emotion': emotion if detect_emotion else None,
+                'events': events if detect_events else [],
+                'model': 'SenseVoiceSmall',
+                'engine': SENSEVOICE_ENGINE,
+                'provider': 'sensevoice'
+            }
                     
         except Exception as e:
             print(f"Error in SenseVoice transcription: {e}")
@@ -397,6 +560,41 @@ class SenseVoiceWrapper:
                 'error': f'Transcription failed: {str(e)}'
             }
     
+    def create_stream(self, language: Optional[str] = None, use_itn: bool = True,
+                      **options) -> StreamingRecognizer:
+        """
+        Start incremental recognition of a live recording. The ONNX engine
+        extends filterbank features chunk by chunk; the torch engine decodes
+        segment samples.
+        """
+        if not self._load_model():
+            raise RuntimeError('Failed to load SenseVoice model')
+        if language not in self.supported_languages:
+            language = "auto"
+        features = None
+        if SENSEVOICE_ENGINE == 'onnx':
+            import sensevoice_onnx
+            features = sensevoice_onnx.OnlineFeatures(self.model)
+        return StreamingRecognizer(
+            lambda pcm, feats: self.recognize_segment(pcm, feats, language, use_itn),
+            features, **options
+        )
+
+    def recognize_segment(self, pcm: np.ndarray, features, language: str, use_itn: bool) -> str:
+        """Decode one streaming segment to clean text (shares the micro-batcher)"""
+        item = pcm
+        if features is not None:
+            item = features.features()
+            if item is None:
+                return ''
+        with get_model_registry().use(REGISTRY_NAME):
+            if not self._load_model():
+                raise RuntimeError('Failed to load SenseVoice model')
+            res = self.batcher.submit(item, group=(language, use_itn))
+        if not res:
+            return ''
+        return self._clean_transcription_text(self.rich_transcription_postprocess(res.get("text", "")))
+
     def _parse_rich_transcription(self, text: str) -> tuple:
         """Parse rich transcription to extract emotion and events"""
         emotion = None
@@ -437,6 +635,13 @@ class SenseVoiceWrapper:
         except:
             return text
     
+    def get_batch_stats(self) -> Dict:
+        """Throughput counters of the inference micro-batcher"""
+        stats = self.batcher.get_stats()
+        stats['engine'] = SENSEVOICE_ENGINE
+        stats['model_loaded'] = self.model_loaded
+        return stats
+
     def get_model_info(self) -> Dict:
         """Get information about the SenseVoice model"""
         return {
@@ -4,13 +4,22 @@ This module provides speaker diarization functionality to identify different spe
 """
 
 import os
-import tempfile
-import torch
+import gc
+import bisect
+import threading
 import numpy as np
 from typing import List, Tuple, Dict, Optional
 import logging
 
+from audio_decode import decode_audio_bytes, AudioDecodeError, SAMPLE_RATE
+from model_registry import get_model_registry, process_rss_bytes
+from compute_scheduler import get_compute_scheduler
+
+# Name of the pipeline in the residency registry
+REGISTRY_NAME = 'pyannote'
+
 try:
+    import torch
     from pyannote.audio import Pipeline
     from pyannote.audio.pipelines import SpeakerDiarization
     from pyannote.core import Annotation, Segment
@@ -30,13 +39,37 @@ class SpeakerDiarizationWrapper:
     def __init__(self):
         self.pipeline = None
         self.is_initialized = False
+        self.pipeline_size_bytes = 0
+        self._init_lock = threading.Lock()
         
     def initialize(self):
         """Initialize the diarization pipeline"""
         if not PYANNOTE_AVAILABLE:
             logger.error("pyannote.audio is not available")
             return False
-            
+        with self._init_lock:
+            if self.is_initialized:
+                return True
+            registry = get_model_registry()
+            registry.reserve(REGISTRY_NAME, self.pipeline_size_bytes)
+            rss_before = process_rss_bytes()
+            if not self._load_pipeline():
+                return False
+            self._configure_pipeline()
+            self.pipeline_size_bytes = max(self.pipeline_size_bytes, process_rss_bytes() - rss_before)
+            registry.register(REGISTRY_NAME, 'pyannote', self.unload, self.pipeline_size_bytes)
+            return True
+
+    def unload(self):
+        """Release the diarization pipeline so its memory can be reused"""
+        with self._init_lock:
+            self.pipeline = None
+            self.is_initialized = False
+        get_model_registry().unregister(REGISTRY_NAME)
+        gc.collect()
+        logger.info("Speaker diarization pipeline unloaded")
+
+    def _load_pipeline(self):
         try:
             # Try to load the pretrained pipeline
             # Note: This requires a HuggingFace token for some models
@@ -78,6 +111,26 @@ class SpeakerDiarizationWrapper:
                     logger.error(f"Basic initialization also failed: {e3}")
                     return False
     
+    def _configure_pipeline(self):
+        """
+        Apply CPU throughput knobs from the environment:
+        DIARIZATION_SEGMENTATION_BATCH_SIZE and DIARIZATION_EMBEDDING_BATCH_SIZE
+        set how many windows the segmentation and embedding models score per
+        forward pass. Older pipelines without these attributes are left alone.
+        """
+        for attribute, env_name in (
+            ('segmentation_batch_size', 'DIARIZATION_SEGMENTATION_BATCH_SIZE'),
+            ('embedding_batch_size', 'DIARIZATION_EMBEDDING_BATCH_SIZE'),
+        ):
+            value = os.getenv(env_name)
+            if not value or not hasattr(self.pipeline, attribute):
+                continue
+            try:
+                setattr(self.pipeline, attribute, int(value))
+                logger.info(f"Diarization {attribute} set to {value}")
+            except (ValueError, AttributeError) as e:
+                logger.warning(f"Could not set diarization {attribute}: {e}")
+
     def is_available(self) -> bool:
         """Check if speaker diarization is available"""
         return PYANNOTE_AVAILABLE and self.is_initialized
@@ -92,13 +145,58 @@ class SpeakerDiarizationWrapper:
         Returns:
             List of diarization segments with speaker labels and timestamps
         """
+        return self._run_pipeline(audio_path)
+    
+    def diarize_pcm(self, pcm: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                    return_embeddings: bool = False):
+        """
+        Perform speaker diarization on decoded mono float32 PCM
+        
+        pyannote accepts an in-memory waveform, so nothing is written to disk.
+        
+        Args:
+            pcm: 1-D float32 samples
+            sample_rate: Sample rate of the samples
+            return_embeddings: Also return one embedding per speaker
+            
+        Returns:
+            List of diarization segments with speaker labels and timestamps;
+            with return_embeddings, a (segments, {speaker: embedding}) tuple
+        """
+        # from_numpy shares the buffer; only read-only buffers (np.frombuffer) are copied
+        samples = np.ascontiguousarray(pcm, dtype=np.float32)
+        if not samples.flags.writeable:
+            samples = samples.copy()
+        waveform = torch.from_numpy(samples).unsqueeze(0)
+        return self._run_pipeline({"waveform": waveform, "sample_rate": sample_rate}, return_embeddings)
+    
+    def _run_pipeline(self, audio_input, return_embeddings: bool = False):
+        """Run the pyannote pipeline on a file path or waveform dict"""
+        # Keep the pipeline resident while this job runs, on threads from the shared budget
+        with get_model_registry().use(REGISTRY_NAME), get_compute_scheduler().torch_threads('pyannote'):
+            return self._run_pipeline_resident(audio_input, return_embeddings)
+
+    def _run_pipeline_resident(self, audio_input, return_embeddings: bool = False):
         if not self.is_available():
             if not self.initialize():
                 return None
                 
         try:
             # Perform diarization
-            diarization = self.pipeline(audio_path)
+            embeddings = {}
+            if return_embeddings:
+                try:
+                    diarization, centroids = self.pipeline(audio_input, return_embeddings=True)
+                    # Centroids are ordered like the sorted speaker labels
+                    embeddings = {
+                        label: [float(v) for v in centroids[i]]
+                        for i, label in enumerate(diarization.labels()) if i < len(centroids)
+                    }
+                except TypeError:
+                    # Pipelines older than pyannote 3.1 cannot return embeddings
+                    diarization = self.pipeline(audio_input)
+            else:
+                diarization = self.pipeline(audio_input)
             
             # Convert to list of segments
             segments = []
@@ -114,7 +212,7 @@ class SpeakerDiarizationWrapper:
             segments = self._improve_diarization_accuracy(segments)
             
             logger.info(f"Diarization completed: found {len(set([s['speaker'] for s in segments]))} speakers")
-            return segments
+            return (segments, embeddings) if return_embeddings else segments
             
         except Exception as e:
             logger.error(f"Error during diarization: {e}")
@@ -126,7 +224,7 @@ class SpeakerDiarizationWrapper:
         
         Args:
             audio_bytes: Audio data as bytes
-            filename: Original filename (for format detection)
+            filename: Original filename (kept for logging)
             
         Returns:
             List of diarization segments with speaker labels and timestamps
@@ -135,56 +233,68 @@ class SpeakerDiarizationWrapper:
             if not self.initialize():
                 return None
         
-        # Create temporary file with proper extension
-        file_ext = os.path.splitext(filename)[1].lower()
-        if not file_ext:
-            file_ext = '.wav'
-            
-        with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as temp_file:
-            temp_file.write(audio_bytes)
-            temp_path = temp_file.name
-        
         try:
-            # If the file is not WAV, convert it first
-            if file_ext not in ['.wav', '.wave']:
-                wav_path = temp_path.replace(file_ext, '.wav')
-                try:
-                    # Try to convert using pydub (fallback to external tools if needed)
-                    import subprocess
-                    result = subprocess.run([
-                        'ffmpeg', '-i', temp_path, '-ar', '16000', '-ac', '1', 
-                        '-c:a', 'pcm_s16le', '-f', 'wav', '-y', wav_path
-                    ], capture_output=True, text=True)
-                    
-                    if result.returncode == 0:
-                        # Use converted WAV file
-                        os.unlink(temp_path)
-                        temp_path = wav_path
-                    else:
-                        logger.warning(f"Failed to convert audio: {result.stderr}")
-                        # Try with original file anyway
-                except Exception as e:
-                    logger.warning(f"Audio conversion failed: {e}, trying with original format")
+            logger.info(f"Decoding {filename} in memory for speaker diarization")
+            pcm = decode_audio_bytes(audio_bytes)
+        except AudioDecodeError as e:
+            logger.error(f"Could not decode audio for diarization: {e}")
+            return None
+        return self.diarize_pcm(pcm)
+    
+    def apply_diarization_to_segments(self, asr_segments: List[Dict], segments: List[Dict]) -> str:
+        """
+        Apply speaker diarization to timestamped ASR output
+        
+        Each word (or whole ASR segment when no word timings exist) is given the
+        speaker whose turn overlaps it most, looked up through an interval index
+        in O(log segments), so long meetings align in
+        O((words + segments) log segments).
+        
+        Args:
+            asr_segments: Segments with 'start', 'end', 'text' and optional 'words'
+            segments: Diarization segments from diarize_audio_file/diarize_pcm
             
-            return self.diarize_audio_file(temp_path)
-        finally:
-            # Clean up temporary files
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-            # Also clean up any converted WAV file
-            try:
-                wav_path = temp_path.replace(file_ext, '.wav')
-                if os.path.exists(wav_path) and wav_path != temp_path:
-                    os.unlink(wav_path)
-            except:
-                pass
+        Returns:
+            Transcription with speaker labels, one speaker turn per paragraph
+        """
+        if not segments or not asr_segments:
+            return ''.join(seg.get('text', '') for seg in asr_segments).strip()
+        
+        index = SpeakerIntervalIndex(segments)
+        
+        units = []
+        for asr_segment in asr_segments:
+            words = asr_segment.get('words') or []
+            if words:
+                units.extend((w['word'], w['start'], w['end']) for w in words)
+            else:
+                units.append((asr_segment.get('text', '').strip(), asr_segment['start'], asr_segment['end']))
+        
+        result_parts = []
+        current_speaker = None
+        current_words = []
+        for text, start, end in units:
+            if not text:
+                continue
+            speaker = index.speaker_for(start, end)
+            if speaker != current_speaker and current_words:
+                result_parts.append(f"[SPEAKER {index.speaker_number(current_speaker)}] {' '.join(current_words)}")
+                current_words = []
+            current_speaker = speaker
+            current_words.append(text)
+        if current_words:
+            result_parts.append(f"[SPEAKER {index.speaker_number(current_speaker)}] {' '.join(current_words)}")
+        
+        # Join with double newlines to ensure each speaker starts on a new line
+        return '\n\n'.join(result_parts)
     
     def apply_diarization_to_transcription(self, transcription: str, segments: List[Dict]) -> str:
         """
         Apply speaker diarization to a transcription text using intelligent sentence-aware mapping
         
+        Used for engines that return plain text without timestamps; sentence
+        times are estimated from their character offsets.
+        
         Args:
             transcription: Original transcription text
             segments: Diarization segments with real timestamps from diarize_audio_file/diarize_audio_bytes
@@ -208,94 +318,41 @@ class SpeakerDiarizationWrapper:
         if total_duration <= 0:
             return transcription
         
-        # Sort segments by start time for proper processing
-        sorted_segments = sorted(segments, key=lambda x: x['start'])
+        index = SpeakerIntervalIndex(segments)
         
         # Calculate total characters for timing approximation
         total_chars = sum(len(sentence) for sentence in sentences)
         
-        # Map each sentence to a speaker based on timing
-        sentence_segments = []
+        # Map each sentence to an estimated time span and let the interval
+        # index pick the speaker
+        asr_segments = []
         char_offset = 0
-        
         for sentence in sentences:
-            if not sentence.strip():
-                continue
-                
-            # Calculate approximate timing for this sentence
-            sentence_start_ratio = char_offset / total_chars if total_chars > 0 else 0
-            sentence_end_ratio = (char_offset + len(sentence)) / total_chars if total_chars > 0 else 1
-            
-            sentence_start_time = sentence_start_ratio * total_duration
-            sentence_end_time = sentence_end_ratio * total_duration
-            sentence_mid_time = (sentence_start_time + sentence_end_time) / 2
-            
-            # Find the best matching speaker segment
-            assigned_speaker = None
-            best_overlap = 0
-            
-            for segment in sorted_segments:
-                # Check if sentence midpoint falls within speaker segment
-                if segment['start'] <= sentence_mid_time <= segment['end']:
-                    overlap = min(sentence_end_time, segment['end']) - max(sentence_start_time, segment['start'])
-                    if overlap > best_overlap:
-                        best_overlap = overlap
-                        assigned_speaker = segment['speaker']
-            
-            # If no overlap found, assign to closest segment by midpoint
-            if assigned_speaker is None:
-                closest_segment = min(sorted_segments, 
-                                    key=lambda s: min(abs(sentence_mid_time - s['start']), 
-                                                     abs(sentence_mid_time - s['end'])))
-                assigned_speaker = closest_segment['speaker']
-            
-            sentence_segments.append({
-                'sentence': sentence,
-                'speaker': assigned_speaker,
-                'start_time': sentence_start_time,
-                'end_time': sentence_end_time
-            })
-            
+            sentence_start = char_offset / total_chars * total_duration
+            sentence_end = (char_offset + len(sentence)) / total_chars * total_duration
+            asr_segments.append({'start': sentence_start, 'end': sentence_end, 'text': sentence})
             char_offset += len(sentence)
         
-        # Group consecutive sentences by speaker
         result_parts = []
         current_speaker = None
         current_sentences = []
-        
-        for sent_seg in sentence_segments:
-            if sent_seg['speaker'] != current_speaker:
-                # Finish previous speaker segment
-                if current_speaker is not None and current_sentences:
-                    speaker_num = self._get_speaker_number(current_speaker, sorted_segments)
-                    text = ' '.join(current_sentences).strip()
-                    if text:
-                        result_parts.append(f"[SPEAKER {speaker_num}] {text}")
-                
-                # Start new speaker segment
-                current_speaker = sent_seg['speaker']
-                current_sentences = [sent_seg['sentence']]
-            else:
-                current_sentences.append(sent_seg['sentence'])
-        
-        # Add the last segment
-        if current_speaker is not None and current_sentences:
-            speaker_num = self._get_speaker_number(current_speaker, sorted_segments)
+        for asr_segment in asr_segments:
+            speaker = index.speaker_for(asr_segment['start'], asr_segment['end'])
+            if speaker != current_speaker and current_sentences:
+                text = ' '.join(current_sentences).strip()
+                if text:
+                    result_parts.append(f"[SPEAKER {index.speaker_number(current_speaker)}] {text}")
+                current_sentences = []
+            current_speaker = speaker
+            current_sentences.append(asr_segment['text'])
+        if current_sentences:
             text = ' '.join(current_sentences).strip()
             if text:
-                result_parts.append(f"[SPEAKER {speaker_num}] {text}")
+                result_parts.append(f"[SPEAKER {index.speaker_number(current_speaker)}] {text}")
         
         # Join with double newlines to ensure each speaker starts on a new line
         return '\n\n'.join(result_parts) if result_parts else transcription
     
-    def _get_speaker_number(self, speaker_id: str, all_segments: List[Dict]) -> int:
-        """Get a consistent speaker number for a speaker ID"""
-        unique_speakers = sorted(list(set([seg['speaker'] for seg in all_segments])))
-        try:
-            return unique_speakers.index(speaker_id) + 1
-        except ValueError:
-            return 1
-    
     def _improve_diarization_accuracy(self, segments: List[Dict]) -> List[Dict]:
         """
         Post-process diarization segments to improve accuracy
@@ -336,6 +393,84 @@ class SpeakerDiarizationWrapper:
         
         return improved_segments if improved_segments else segments
 
+class SpeakerIntervalIndex:
+    """
+    Sorted index over diarization turns for fast speaker lookup by time.
+    
+    Turns sorted by start time form an implicit balanced tree (the middle of
+    each range is its root) in which every node knows the latest end in its
+    subtree. A lookup descends only into subtrees that can overlap the
+    query, so it costs O(log turns + overlapping turns) even when an early
+    long turn or overlapping speech spans many later ones.
+    """
+    
+    def __init__(self, segments: List[Dict]):
+        self.segments = sorted(segments, key=lambda x: x['start'])
+        self.starts = [seg['start'] for seg in self.segments]
+        # Index of the turn with the latest end among the first i + 1 turns
+        self.max_end_idx = []
+        for i, seg in enumerate(self.segments):
+            if not self.max_end_idx or seg['end'] > self.segments[self.max_end_idx[-1]]['end']:
+                self.max_end_idx.append(i)
+            else:
+                self.max_end_idx.append(self.max_end_idx[-1])
+        self._subtree_end = [0.0] * len(self.segments)
+        self._build(0, len(self.segments))
+        self.visits = 0  # turns examined by lookups, for diagnostics
+        self._numbers = {
+            speaker: i + 1
+            for i, speaker in enumerate(sorted(set(seg['speaker'] for seg in self.segments)))
+        }
+    
+    def _build(self, lo: int, hi: int) -> float:
+        if lo >= hi:
+            return float('-inf')
+        mid = (lo + hi) // 2
+        latest = max(self.segments[mid]['end'], self._build(lo, mid), self._build(mid + 1, hi))
+        self._subtree_end[mid] = latest
+        return latest
+    
+    def speaker_number(self, speaker_id: str) -> int:
+        """Consistent 1-based number for a speaker ID"""
+        return self._numbers.get(speaker_id, 1)
+    
+    def speaker_for(self, start: float, end: float) -> Optional[str]:
+        """Speaker with the largest overlap with [start, end], else the nearest turn"""
+        if not self.segments:
+            return None
+        best = None  # (overlap, index); ties go to the later turn
+        ranges = [(0, len(self.segments))]
+        while ranges:
+            lo, hi = ranges.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._subtree_end[mid] < start:
+                continue  # every turn in this subtree ends before the query
+            self.visits += 1
+            seg = self.segments[mid]
+            if seg['start'] <= end:
+                overlap = min(end, seg['end']) - max(start, seg['start'])
+                if overlap >= 0 and (best is None or (overlap, mid) > best):
+                    best = (overlap, mid)
+                # Turns to the right start later and may still overlap
+                ranges.append((mid + 1, hi))
+            ranges.append((lo, mid))
+        if best is not None:
+            return self.segments[best[1]]['speaker']
+        
+        # No overlap: choose between the last turn ending before the query
+        # and the first turn starting after it
+        hi = bisect.bisect_right(self.starts, end)
+        mid = (start + end) / 2
+        candidates = []
+        if hi > 0:
+            candidates.append(self.segments[self.max_end_idx[hi - 1]])
+        if hi < len(self.segments):
+            candidates.append(self.segments[hi])
+        closest = min(candidates, key=lambda s: min(abs(mid - s['start']), abs(mid - s['end'])))
+        return closest['speaker']
+
 # Global instance
 _speaker_diarization_wrapper = None
 
@@ -45,8 +45,12 @@ echo "Esperando a que nginx se inicie..."
 sleep 2
 
 echo "Iniciando backend Python..."
-# Iniciar el backend de Python
-python backend.py &
+# Iniciar el backend de Python (SERVER_MODE=production usa gunicorn con varios workers)
+if [ "${SERVER_MODE:-development}" = "production" ]; then
+    gunicorn -c gunicorn.conf.py backend:app &
+else
+    python backend.py &
+fi
 BACKEND_PID=$!
 
 echo "Servicios iniciados. Nginx PID: $NGINX_PID, Backend PID: $BACKEND_PID"
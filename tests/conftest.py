@@ -0,0 +1,19 @@
+import os
+import shutil
+import tempfile
+
+_state_root = None
+
+
+def pytest_configure(config):
+    # Importing backend creates the job queue and transcription cache; keep
+    # their state out of the working tree
+    global _state_root
+    _state_root = tempfile.mkdtemp(prefix='whispad-tests-')
+    os.environ.setdefault('JOB_STATE_DIR', os.path.join(_state_root, 'job_state'))
+    os.environ.setdefault('TRANSCRIPTION_CACHE_DIR', os.path.join(_state_root, 'transcription_cache'))
+
+
+def pytest_unconfigure(config):
+    if _state_root:
+        shutil.rmtree(_state_root, ignore_errors=True)
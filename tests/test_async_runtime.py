@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared background event loop
+"""
+
+import asyncio
+import threading
+import concurrent.futures
+
+import pytest
+
+from async_runtime import AsyncRuntime
+
+
+@pytest.fixture
+def runtime():
+    runtime = AsyncRuntime('test-async')
+    yield runtime
+    runtime.stop()
+
+
+def test_submit_runs_on_one_persistent_loop(runtime):
+    async def current_loop():
+        await asyncio.sleep(0)
+        return asyncio.get_running_loop()
+
+    first = runtime.submit(current_loop())
+    assert runtime.submit(current_loop()) is first
+    assert first is runtime.loop
+    assert runtime.get_stats()["submitted"] == 2
+
+
+def test_state_created_on_the_loop_survives_between_submits(runtime):
+    cache = {}
+
+    async def remember(key):
+        # An asyncio object bound to the loop on first use
+        cache.setdefault('lock', asyncio.Lock())
+        async with cache['lock']:
+            cache[key] = True
+        return sorted(k for k in cache if k != 'lock')
+
+    runtime.submit(remember('a'))
+    assert runtime.submit(remember('b')) == ['a', 'b']
+
+
+def test_concurrent_submits_share_a_semaphore(runtime):
+    running = []
+    peak = []
+
+    async def call():
+        async with runtime.semaphore('provider', 2):
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.05)
+            running.pop()
+        return True
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda _: runtime.submit(call()), range(6)))
+    assert results == [True] * 6
+    assert max(peak) == 2
+    assert runtime.get_stats()["semaphores"] == {"provider": {"limit": 2, "saturated": False}}
+
+
+def test_exceptions_and_timeouts_reach_the_caller(runtime):
+    async def fail():
+        raise ValueError("provider error")
+
+    async def slow():
+        await asyncio.sleep(5)
+
+    with pytest.raises(ValueError, match="provider error"):
+        runtime.submit(fail())
+    with pytest.raises(concurrent.futures.TimeoutError):
+        runtime.submit(slow(), timeout=0.05)
+    stats = runtime.get_stats()
+    assert stats["failed"] == 1
+    assert stats["timed_out"] == 1
+    assert stats["active"] == 0
+
+
+def test_submit_from_the_loop_thread_is_rejected(runtime):
+    async def nested():
+        async def inner():
+            return 1
+        with pytest.raises(RuntimeError, match="await the coroutine"):
+            runtime.submit(inner())
+        return threading.current_thread().name
+
+    assert runtime.submit(nested()) == 'test-async'
+
+
+def test_stop_and_restart(runtime):
+    async def value():
+        return 42
+
+    assert runtime.submit(value()) == 42
+    old_loop = runtime.loop
+    runtime.stop()
+    assert old_loop.is_closed()
+    assert not runtime.get_stats()["running"]
+    assert runtime.submit(value()) == 42
+    assert runtime.loop is not old_loop
+
+
+def test_concept_graph_called_from_the_shared_loop_does_not_deadlock(monkeypatch):
+    import concept_graph
+    from async_runtime import run_async
+
+    async def fake_build(note_text, *args, **kwargs):
+        await asyncio.sleep(0)
+        return {"nodes": [note_text], "links": [], "insights": {}}
+
+    monkeypatch.setattr(concept_graph, 'build_concept_graph_with_ai_filtering', fake_build)
+
+    async def caller():
+        return concept_graph.build_concept_graph('note', language='english')
+
+    result = run_async(caller(), timeout=10)
+    assert result["nodes"] == ['note']
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory audio decode helpers
+"""
+
+import io
+import os
+import sys
+import wave
+
+import numpy as np
+
+import audio_decode
+from audio_decode import AudioArtifact, pcm_to_wav_bytes, pcm_to_int16, silence_aligned_windows, SAMPLE_RATE
+
+
+def test_pcm_to_wav_bytes_roundtrip():
+    t = np.arange(SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+    pcm = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    data = pcm_to_wav_bytes(pcm)
+
+    with wave.open(io.BytesIO(data), 'rb') as wav_file:
+        assert wav_file.getnchannels() == 1
+        assert wav_file.getsampwidth() == 2
+        assert wav_file.getframerate() == SAMPLE_RATE
+        frames = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype='<i2')
+    assert np.array_equal(frames, pcm_to_int16(pcm))
+
+
+def test_pcm_to_int16_clips():
+    samples = pcm_to_int16(np.array([-2.0, -1.0, 0.0, 1.0, 2.0], dtype=np.float32))
+    assert samples.tolist() == [-32767, -32767, 0, 32767, 32767]
+
+
+def test_audio_artifact_decodes_once(monkeypatch):
+    calls = []
+
+    def fake_decode(audio_bytes, sample_rate=SAMPLE_RATE):
+        calls.append(audio_bytes)
+        return np.zeros(SAMPLE_RATE * 2, dtype=np.float32)
+
+    monkeypatch.setattr(audio_decode, 'decode_audio_bytes', fake_decode)
+    artifact = AudioArtifact(b'encoded audio', 'clip.webm')
+
+    assert not artifact.is_decoded
+    assert artifact.duration == 2.0
+    artifact.wav_bytes()
+    artifact.pcm
+    assert len(calls) == 1
+
+
+def test_audio_artifact_from_pcm_skips_decoding():
+    pcm = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    artifact = AudioArtifact.from_pcm(pcm, 'chunk.wav')
+    assert artifact.is_decoded
+    assert artifact.duration == 1.0
+    assert len(artifact.content_hash) == 64
+
+
+def test_silence_aligned_windows_cut_in_pauses():
+    rng = np.random.default_rng(0)
+    pcm = (0.3 * rng.standard_normal(SAMPLE_RATE * 25)).astype(np.float32)
+    pcm[SAMPLE_RATE * 8:SAMPLE_RATE * 8 + SAMPLE_RATE // 2] = 0  # pause at 8.0-8.5 s
+
+    windows = silence_aligned_windows(pcm, max_seconds=10, search_seconds=3)
+
+    assert windows[0][0] == 0 and windows[-1][1] == len(pcm)
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    assert SAMPLE_RATE * 8 <= windows[0][1] <= SAMPLE_RATE * 8.5
+    assert all(end - start <= SAMPLE_RATE * 10 for start, end in windows)
+    assert silence_aligned_windows(pcm[:SAMPLE_RATE]) == [(0, SAMPLE_RATE)]
+
+
+FAKE_FFMPEG = '''#!{python}
+import sys
+import numpy as np
+rng = np.random.default_rng(1)
+pcm = (0.3 * rng.standard_normal(16000 * 25)).astype(np.float32)
+pcm[16000 * 8:16000 * 8 + 8000] = 0
+out = sys.stdout.buffer
+for i in range(0, len(pcm), 1234):  # odd-sized writes split samples across reads
+    out.write(pcm[i:i + 1234].tobytes()[:-3])
+    out.write(pcm[i:i + 1234].tobytes()[-3:])
+'''
+
+
+def test_stream_pcm_chunks_from_one_ffmpeg_process(tmp_path, monkeypatch):
+    ffmpeg = tmp_path / 'ffmpeg'
+    ffmpeg.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}:{os.environ['PATH']}")
+
+    chunks = list(audio_decode.stream_pcm_chunks('input.webm', chunk_seconds=10, search_seconds=3))
+
+    offsets = [offset for offset, _ in chunks]
+    assert offsets[0] == 0
+    assert all(offsets[i] + len(chunks[i][1]) == offsets[i + 1] for i in range(len(chunks) - 1))
+    assert sum(len(pcm) for _, pcm in chunks) == SAMPLE_RATE * 25
+    assert SAMPLE_RATE * 8 <= offsets[1] <= SAMPLE_RATE * 8.5  # first cut lands in the pause
+    assert all(len(pcm) <= SAMPLE_RATE * 10 for _, pcm in chunks)
@@ -45,3 +45,20 @@ def test_auto_rehash(setup_db):
     new_hash = get_user('user1')['password']
     assert new_hash != old_hash
 
+
+
+def test_login_purges_expired_sessions(setup_db):
+    from db import create_session, get_session_username
+    create_session('stale-token', 'admin')
+    with pool.connection() as conn:
+        conn.execute("UPDATE sessions SET created_at = CURRENT_TIMESTAMP - INTERVAL '30 days' WHERE token=%s",
+                     ['stale-token'])
+        conn.commit()
+
+    client = app.test_client()
+    resp = client.post('/api/login', json={'username': 'admin', 'password': 'secret'})
+    assert resp.status_code == 200
+    assert get_session_username(resp.get_json()['token']) == 'admin'
+    with pool.connection() as conn:
+        cur = conn.execute("SELECT COUNT(*) FROM sessions WHERE token=%s", ['stale-token'])
+        assert cur.fetchone()[0] == 0
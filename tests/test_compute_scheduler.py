@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared CPU thread budget
+"""
+
+import threading
+import time
+
+import pytest
+
+from compute_scheduler import ComputeScheduler
+
+
+def test_single_job_gets_requested_threads():
+    scheduler = ComputeScheduler(8)
+    with scheduler.threads('whisper', want=4) as threads:
+        assert threads == 4
+        assert scheduler.get_stats()['in_use'] == 4
+    assert scheduler.get_stats()['in_use'] == 0
+    with scheduler.threads('torch') as threads:
+        assert threads == 8
+
+
+def test_concurrent_jobs_share_the_budget():
+    scheduler = ComputeScheduler(8)
+    first = scheduler.acquire('a', want=4)
+    second = scheduler.acquire('b')
+    # Two jobs running: the second gets the rest, never more than the budget
+    assert scheduler.threads_for(first) + scheduler.threads_for(second) <= 8
+    assert scheduler.threads_for(second) == 4
+    scheduler.release(first)
+    scheduler.release(second)
+
+
+def test_waits_when_budget_is_exhausted():
+    scheduler = ComputeScheduler(4)
+    holder = scheduler.acquire('whisper-server', want=4, minimum=4)
+    assert scheduler.acquire('pyannote', timeout=0.05) is None
+
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(scheduler.acquire('pyannote', want=2)))
+    waiter.start()
+    time.sleep(0.05)
+    assert not granted and scheduler.get_stats()['waiting'] == 1
+    scheduler.release(holder)
+    waiter.join(timeout=1)
+    assert granted and scheduler.threads_for(granted[0]) == 2
+    assert scheduler.get_stats()['waited'] == 1
+
+
+def test_fixed_size_requests_are_clamped_to_the_budget():
+    scheduler = ComputeScheduler(2)
+    with scheduler.threads('whisper-server', want=8, minimum=8) as threads:
+        assert threads == 2
+
+
+def test_nested_reservations_reuse_the_grant():
+    scheduler = ComputeScheduler(4)
+    with scheduler.threads('sensevoice', want=4) as outer:
+        with scheduler.threads('sensevoice', want=4) as inner:
+            assert inner == outer
+        assert scheduler.get_stats()['in_use'] == 4
+    assert scheduler.get_stats()['in_use'] == 0
+
+
+def test_torch_jobs_run_one_at_a_time_with_their_own_thread_count():
+    torch = pytest.importorskip('torch')
+    scheduler = ComputeScheduler(8)
+    running = []
+    seen = []
+
+    def job(name, want):
+        with scheduler.torch_threads(name, want) as threads:
+            running.append(name)
+            assert len(running) == 1
+            time.sleep(0.05)
+            seen.append((threads, torch.get_num_threads()))
+            running.remove(name)
+
+    jobs = [threading.Thread(target=job, args=('sensevoice', 6)),
+            threading.Thread(target=job, args=('pyannote', 2))]
+    for t in jobs:
+        t.start()
+    for t in jobs:
+        t.join()
+    assert sorted(seen) == [(2, 2), (6, 6)]
+    # Other engines still get threads while a torch job holds the lock
+    with scheduler.torch_threads('pyannote', 4):
+        with_other = []
+        other = threading.Thread(target=lambda: with_other.append(scheduler.acquire('whisper', want=4, timeout=1)))
+        other.start()
+        other.join()
+        assert with_other[0] is not None
+        scheduler.release(with_other[0])
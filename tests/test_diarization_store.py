@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for persisted diarization results
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from audio_decode import AudioArtifact
+from diarization_store import DiarizationStore
+from fast_diarization import FastDiarizer
+
+SEGMENTS = [
+    {'start': 0.0, 'end': 2.5, 'speaker': 'SPEAKER_00', 'duration': 2.5},
+    {'start': 2.5, 'end': 4.0, 'speaker': 'SPEAKER_01', 'duration': 1.5},
+]
+AUDIO_HASH = hashlib.sha256(b'audio').hexdigest()
+
+
+def test_put_get_roundtrip_per_user_and_engine(tmp_path):
+    store = DiarizationStore(str(tmp_path))
+    store.put('alice', AUDIO_HASH, 'pyannote', SEGMENTS, {'SPEAKER_00': [0.1, 0.2]})
+
+    entry = store.get('alice', AUDIO_HASH, 'pyannote')
+    assert entry['segments'] == SEGMENTS
+    assert entry['embeddings'] == {'SPEAKER_00': [0.1, 0.2]}
+    assert (tmp_path / 'alice' / '.diarization' / f'{AUDIO_HASH}.pyannote.json').exists()
+
+    assert store.get('alice', AUDIO_HASH, 'fast') is None
+    assert store.get('bob', AUDIO_HASH, 'pyannote') is None
+    assert store.get_stats()['hits'] == 1 and store.get_stats()['misses'] == 2
+
+
+def test_delete_removes_every_engine(tmp_path):
+    store = DiarizationStore(str(tmp_path))
+    store.put('alice', AUDIO_HASH, 'pyannote', SEGMENTS)
+    store.put('alice', AUDIO_HASH, 'fast', SEGMENTS)
+    store.delete('alice', AUDIO_HASH)
+    assert store.get('alice', AUDIO_HASH, 'pyannote') is None
+    assert store.get('alice', AUDIO_HASH, 'fast') is None
+
+
+def test_rejects_path_like_keys(tmp_path):
+    store = DiarizationStore(str(tmp_path))
+    assert store.get('alice', '../../etc/passwd', 'fast') is None
+    with pytest.raises(ValueError):
+        store.put('alice', '../../etc/passwd', 'fast', SEGMENTS)
+
+
+def test_saved_wav_hash_matches_reuploaded_file(tmp_path):
+    pcm = np.sin(np.linspace(0, 200, 16000)).astype(np.float32) * 0.3
+    artifact = AudioArtifact.from_pcm(pcm)
+    path = tmp_path / 'note-audio1.wav'
+    artifact.write_wav(str(path))
+    # Reprocessing uploads the saved WAV, whose hash is the stored key
+    assert AudioArtifact(path.read_bytes()).content_hash == artifact.wav_hash
+
+
+def test_fast_diarizer_returns_speaker_embeddings():
+    rng = np.random.default_rng(0)
+    t = np.arange(3 * 16000) / 16000
+    pcm = (0.2 * np.sin(2 * np.pi * 150 * t) + rng.normal(0, 0.01, len(t))).astype(np.float32)
+    segments, embeddings = FastDiarizer().diarize_pcm(pcm, return_embeddings=True)
+    assert set(embeddings) == {s['speaker'] for s in segments}
+    assert all(len(vector) == 40 for vector in embeddings.values())
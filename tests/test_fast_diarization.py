@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the NumPy diarization engine and energy VAD
+"""
+
+import numpy as np
+import pytest
+
+from fast_diarization import FastDiarizer, agglomerative_cluster, mfcc
+from voice_activity import detect_speech
+
+SR = 16000
+
+
+def voice(seconds, f0, formants, seed=0):
+    """Harmonic tone shaped by formant peaks, with a little noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    signal = np.zeros_like(t)
+    for k in range(1, int(4000 / f0)):
+        freq = k * f0
+        gain = sum(np.exp(-((freq - f) / 150.0) ** 2) for f in formants) + 0.05
+        signal += gain * np.sin(2 * np.pi * freq * t + rng.uniform(0, 2 * np.pi))
+    signal *= 0.2 / np.max(np.abs(signal))
+    return (signal + rng.normal(0, 0.002, len(t))).astype(np.float32)
+
+
+def silence(seconds, seed=1):
+    return np.random.default_rng(seed).normal(0, 0.0005, int(seconds * SR)).astype(np.float32)
+
+
+def speaker_at(segments, time):
+    for segment in segments:
+        if segment['start'] <= time < segment['end']:
+            return segment['speaker']
+    return None
+
+
+def test_detect_speech_finds_regions():
+    pcm = np.concatenate([silence(1), voice(2, 120, [700, 1200]), silence(1), voice(1, 120, [700, 1200])])
+    regions = detect_speech(pcm, SR)
+    assert len(regions) == 2
+    assert abs(regions[0][0] - 1.0) < 0.2 and abs(regions[0][1] - 3.0) < 0.2
+    assert abs(regions[1][0] - 4.0) < 0.2
+
+
+def test_detect_speech_silence_and_continuous_speech():
+    assert detect_speech(silence(3), SR) == []
+    assert detect_speech(voice(3, 120, [700, 1200]), SR) == [(0.0, 3.0)]
+
+
+def test_agglomerative_cluster_respects_num_speakers():
+    points = np.array([[0, 0], [0.1, 0], [5, 5], [5.1, 5], [10, 0]], dtype=np.float32)
+    assert list(agglomerative_cluster(points, threshold=1.0)) == [0, 0, 1, 1, 2]
+    assert len(set(agglomerative_cluster(points, threshold=1.0, num_speakers=2))) == 2
+
+
+def test_two_speakers_are_separated():
+    a = lambda s, seed: voice(s, 110, [600, 1000, 2400], seed)
+    b = lambda s, seed: voice(s, 220, [400, 2000, 2900], seed)
+    pcm = np.concatenate([a(4, 1), silence(0.5), b(4, 2), silence(0.5), a(4, 3), silence(0.5), b(4, 4)])
+    segments = FastDiarizer().diarize_pcm(pcm, SR)
+
+    assert {s['speaker'] for s in segments} == {'SPEAKER_00', 'SPEAKER_01'}
+    assert speaker_at(segments, 2.0) == speaker_at(segments, 11.0) == 'SPEAKER_00'
+    assert speaker_at(segments, 6.5) == speaker_at(segments, 15.5) == 'SPEAKER_01'
+    for segment in segments:
+        assert set(segment) == {'start', 'end', 'speaker', 'duration'}
+        assert segment['duration'] > 0
+
+
+def test_single_speaker_and_silence():
+    diarizer = FastDiarizer()
+    segments = diarizer.diarize_pcm(np.concatenate([voice(5, 130, [700, 1200], 5), silence(0.5), voice(5, 130, [700, 1200], 6)]), SR)
+    assert {s['speaker'] for s in segments} == {'SPEAKER_00'}
+    assert diarizer.diarize_pcm(silence(3), SR) == []
+
+
+def test_speech_timeline_compacts_and_maps_back():
+    from voice_activity import SpeechTimeline
+
+    pcm = np.concatenate([silence(3), voice(2, 120, [700, 1200]), silence(5), voice(1, 120, [700, 1200]), silence(2)])
+    timeline = SpeechTimeline.detect(pcm, SR)
+    compact = timeline.compact(pcm)
+    assert len(compact) == timeline.length
+    assert timeline.speech_seconds < 4.0  # 13 s recording, 3 s of speech plus padding
+
+    first_start = timeline.regions[0][0] / SR
+    second_start = timeline.regions[1][0] / SR
+    second_offset = timeline.offsets[1] / SR
+    assert abs(first_start - 3.0) < 0.2 and abs(second_start - 10.0) < 0.2
+    assert timeline.to_original(0.5) == pytest.approx(first_start + 0.5)
+    assert timeline.to_original(second_offset + 0.25) == pytest.approx(second_start + 0.25)
+    # A time inside the inserted gap snaps to the end of the region before it
+    assert timeline.to_original(second_offset - 0.05) == pytest.approx(timeline.regions[0][1] / SR)
+
+    segments = timeline.map_segments([{'start': second_offset, 'end': second_offset + 0.5, 'text': 'hi',
+                                       'words': [{'word': 'hi', 'start': second_offset, 'end': second_offset + 0.5}]}])
+    assert segments[0]['start'] == pytest.approx(second_start)
+    assert segments[0]['words'][0]['end'] == pytest.approx(second_start + 0.5)
+
+
+def test_speech_timeline_skips_mostly_speech_and_silent_audio():
+    from voice_activity import SpeechTimeline
+
+    assert SpeechTimeline.detect(voice(5, 120, [700, 1200]), SR) is None
+    assert SpeechTimeline.detect(silence(5), SR) is None
+
+
+def test_mfcc_is_independent_of_dtype_and_layout():
+    pcm = voice(1.0, 140, (700, 1200))
+    features, energy = mfcc(pcm)
+    for other in (pcm.astype(np.float64), np.repeat(pcm, 2)[::2]):
+        other_features, other_energy = mfcc(other)
+        np.testing.assert_allclose(other_features, features, atol=1e-4)
+        np.testing.assert_allclose(other_energy, energy, atol=1e-4)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled HTTP clients against a local keep-alive server
+"""
+
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_clients import HttpClients
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(0.5)
+        self._send({"path": self.path})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self._send(json.loads(self.rfile.read(length) or b'{}'))
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_sync_requests_reuse_one_connection_per_host(base_url):
+    clients = HttpClients(pool_size=2)
+    for i in range(5):
+        response = clients.request('POST', f'{base_url}/v1/chat', json={"n": i})
+        assert response.json() == {"n": i}
+    assert clients.session(f'{base_url}/other') is clients.session(base_url)
+    stats = clients.get_stats()["hosts"][base_url]
+    assert stats == {"requests": 5, "connections_opened": 1, "connections_reused": 4}
+
+
+def test_sessions_are_per_origin_and_default_timeout_applies(base_url):
+    clients = HttpClients(connect_timeout=3, read_timeout=7)
+    other = base_url.replace('127.0.0.1', 'localhost')
+    assert clients.session(base_url) is not clients.session(other)
+    assert clients.session(base_url).default_timeout == (3, 7)
+    assert clients.request('GET', f'{base_url}/models', timeout=1).json() == {"path": "/models"}
+
+
+def test_default_read_timeout_does_not_apply_to_streams(base_url):
+    clients = HttpClients(read_timeout=0.2)
+    with pytest.raises(requests.ReadTimeout):
+        clients.request('GET', f'{base_url}/slow')
+    response = clients.request('GET', f'{base_url}/slow', stream=True)
+    assert response.json() == {"path": "/slow"}
+
+
+def test_threads_share_pooled_connections(base_url):
+    clients = HttpClients(pool_size=3)
+    threads = [threading.Thread(target=lambda: [clients.request('GET', base_url) for _ in range(5)])
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = clients.get_stats()["hosts"][base_url]
+    assert stats["requests"] == 15
+    assert stats["connections_opened"] <= 3
+
+
+def test_async_requests_share_the_loop_session(base_url):
+    pytest.importorskip('aiohttp')
+    clients = HttpClients()
+
+    async def run():
+        for i in range(4):
+            session = clients.async_session()
+            async with session.post(f'{base_url}/v1/chat', json={"n": i}) as response:
+                assert (await response.json()) == {"n": i}
+        assert clients.async_session() is session
+        await clients.close_async_session()
+
+    asyncio.run(run())
+    stats = clients.get_stats()["async"]
+    assert stats["requests"] == 4
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 3
+    assert stats["sessions"] == 0
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the inference server protocol with stand-in handlers
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from inference_server import InferenceServer, InferenceClient, InferenceError, LocalEngines
+
+
+def start_server(address):
+    server = InferenceServer(address)
+    server.register('echo', lambda pcm, scale=1.0: {"sum": float(np.sum(pcm) * scale), "pid": "server"})
+
+    def slow(seconds, progress_callback=None):
+        for step in range(3):
+            if progress_callback:
+                progress_callback(step * 50.0)
+            time.sleep(seconds / 3)
+        return "done"
+
+    def fail():
+        raise ValueError("model exploded")
+
+    server.register('slow', slow)
+    server.register('fail', fail)
+    server.bind()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def address(tmp_path):
+    return str(tmp_path / 'inference.sock')
+
+
+def test_call_returns_handler_result(address):
+    server = start_server(address)
+    client = InferenceClient(address, connect_timeout=2)
+    try:
+        result = client.call('echo', pcm=np.ones(16000, dtype=np.float32), scale=2.0)
+        assert result["sum"] == pytest.approx(32000.0)
+        assert client.ping()
+        assert server.get_stats()["requests"] == 2
+    finally:
+        client.close()
+        server.close()
+
+
+def test_progress_is_forwarded_before_the_reply(address):
+    server = start_server(address)
+    client = InferenceClient(address, connect_timeout=2)
+    seen = []
+    try:
+        assert client.call('slow', seen.append, seconds=0.06) == "done"
+        assert seen == [0.0, 50.0, 100.0]
+    finally:
+        client.close()
+        server.close()
+
+
+def test_handler_errors_and_unknown_ops_raise(address):
+    server = start_server(address)
+    client = InferenceClient(address, connect_timeout=2)
+    try:
+        with pytest.raises(InferenceError, match="model exploded"):
+            client.call('fail')
+        with pytest.raises(InferenceError, match="Unknown"):
+            client.call('missing')
+        # The connection is still usable after an error reply
+        assert client.call('slow', seconds=0) == "done"
+        assert client.get_stats()["errors"] == 2
+    finally:
+        client.close()
+        server.close()
+
+
+def test_concurrent_calls_use_separate_connections(address):
+    server = start_server(address)
+    client = InferenceClient(address, connect_timeout=2)
+    results = []
+    try:
+        threads = [threading.Thread(target=lambda: results.append(client.call('slow', seconds=0.3)))
+                   for _ in range(4)]
+        started = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == ["done"] * 4
+        assert time.time() - started < 1.0
+        assert client.get_stats()["idle_connections"] == 4
+    finally:
+        client.close()
+        server.close()
+
+
+def test_timeout_and_reconnect_after_server_restart(address):
+    server = start_server(address)
+    client = InferenceClient(address, connect_timeout=2)
+    try:
+        with pytest.raises(InferenceError, match="did not answer"):
+            client.call('slow', seconds=1.0, timeout=0.1)
+        assert client.call('slow', seconds=0) == "done"
+    finally:
+        server.close()
+    # A new server on the same socket; the pooled connection is stale
+    server = start_server(address)
+    try:
+        assert client.call('slow', seconds=0) == "done"
+        assert client.get_stats()["reconnects"] == 1
+    finally:
+        client.close()
+        server.close()
+
+
+def test_unreachable_server_raises(address):
+    client = InferenceClient(address, connect_timeout=0.2)
+    with pytest.raises(InferenceError, match="not reachable"):
+        client.call('ping')
+
+
+def test_stop_model_reaches_the_server_side_whisper_pool(address, tmp_path):
+    from whisper_server_pool import WhisperServerPool
+    from test_whisper_server_pool import _make_server
+
+    whisper_server, model, audio = _make_server(tmp_path)
+    engines = LocalEngines.__new__(LocalEngines)
+    engines.whisper = SimpleNamespace(pool=WhisperServerPool(whisper_server, threads=1))
+    server = InferenceServer(address)
+    server.register('stop_model', engines.stop_model)
+    server.bind()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = InferenceClient(address, connect_timeout=2)
+    try:
+        engines.whisper.pool.transcribe(model, str(audio))
+        worker = engines.whisper.pool._workers[str(model.resolve())][0]
+        client.call('stop_model', model_path=str(model))
+        assert not worker.is_alive()
+    finally:
+        client.close()
+        server.close()
+        engines.whisper.pool.shutdown()
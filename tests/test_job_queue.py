@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, QueueFullError, JOB_DONE, JOB_FAILED, JOB_QUEUED
+
+
+def test_submit_runs_handler_and_persists_result(tmp_path):
+    jq = JobQueue(str(tmp_path), workers=1)
+    jq.register_handler('echo', lambda job, path: open(path, 'rb').read().decode() + job.params['suffix'])
+    jq.start()
+
+    job = jq.submit('echo', 'alice', {'suffix': '!'}, b'hola')
+    job.done_event.wait(5)
+
+    assert job.status == JOB_DONE
+    assert job.result == 'hola!'
+    assert not (tmp_path / f"{job.id}.input").exists()
+    # Another process sees the persisted state
+    other = JobQueue(str(tmp_path))
+    assert other.get(job.id).result == 'hola!'
+
+
+def test_backpressure_and_sync_errors(tmp_path):
+    jq = JobQueue(str(tmp_path), workers=1, max_queued=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+        return 'ok'
+
+    runner = threading.Thread(target=lambda: jq.run_sync(block))
+    jq.start()
+    runner.start()
+    started.wait(5)
+    waiting = threading.Thread(target=lambda: jq.run_sync(lambda: None))
+    waiting.start()
+    while jq.get_status()['queued'] < 1:
+        time.sleep(0.01)
+    with pytest.raises(QueueFullError):
+        jq.run_sync(lambda: None)
+    release.set()
+    runner.join(5)
+    waiting.join(5)
+
+    with pytest.raises(ZeroDivisionError):
+        jq.run_sync(lambda: 1 / 0)
+
+
+def test_unfinished_jobs_are_requeued_after_restart(tmp_path):
+    first = JobQueue(str(tmp_path))
+    first.register_handler('echo', lambda job, path: 'done')
+    job = first.submit('echo', 'bob', {}, b'audio')  # workers never started
+    assert first.get(job.id).status == JOB_QUEUED
+
+    second = JobQueue(str(tmp_path), workers=1)
+    second.register_handler('echo', lambda job, path: open(path, 'rb').read().decode())
+    second.start()
+    recovered = second.get(job.id)
+    recovered.done_event.wait(5)
+    assert recovered.result == 'audio'
+
+    lost = first.submit('echo', 'bob', {}, None)
+    third = JobQueue(str(tmp_path))
+    third.start()
+    assert third.get(lost.id).status == JOB_FAILED
+
+
+def test_jobs_of_live_worker_processes_are_not_taken_over(tmp_path):
+    import os
+
+    owner = JobQueue(str(tmp_path))
+    owner.register_handler('echo', lambda job, path: 'done')
+    job = owner.submit('echo', 'bob', {}, b'audio')
+    # Pretend the job belongs to another worker process that is still running
+    job.pid = os.getppid()
+    owner._persist(job)
+
+    other = JobQueue(str(tmp_path), workers=1)
+    other.register_handler('echo', lambda job, path: 'stolen')
+    other.start()
+    time.sleep(0.1)
+    assert other.get(job.id).status == JOB_QUEUED
+    assert 'pid' not in other.get(job.id).public_dict()
+
+
+def test_state_dir_is_created_on_first_use(tmp_path):
+    state_dir = tmp_path / 'job_state'
+    jq = JobQueue(str(state_dir), workers=1)
+    assert not state_dir.exists()
+    jq.start()
+    assert state_dir.is_dir()
@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_concurrent_requests_share_a_batch():
+    batches = []
+
+    def run(group, items):
+        batches.append((group, list(items)))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher('test', run, window_seconds=0.2, max_batch=4)
+    results = {}
+    start = threading.Barrier(4)
+
+    def call(value):
+        start.wait()
+        results[value] = batcher.submit(value, group='en')
+
+    threads = [threading.Thread(target=call, args=(v,)) for v in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {0: 0, 1: 2, 2: 4, 3: 6}
+    assert len(batches) == 1 and sorted(batches[0][1]) == [0, 1, 2, 3]
+    stats = batcher.get_stats()
+    assert stats['requests'] == 4 and stats['avg_batch_size'] == 4.0
+
+
+def test_groups_are_batched_separately_and_errors_reach_callers():
+    def run(group, items):
+        if group == 'bad':
+            raise ValueError('boom')
+        return [group] * len(items)
+
+    batcher = MicroBatcher('test', run, window_seconds=0)
+    assert batcher.submit(1, group='zh') == 'zh'
+    with pytest.raises(ValueError):
+        batcher.submit(1, group='bad')
+    assert batcher.get_stats()['failed'] == 1
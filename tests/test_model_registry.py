@@ -0,0 +1,53 @@
+import time
+
+from model_registry import ModelRegistry, process_rss_bytes
+
+
+def _register(registry, name, size, unloaded):
+    registry.register(name, 'test', lambda: unloaded.append(name), size_bytes=size)
+
+
+def test_reserve_evicts_least_recently_used():
+    registry = ModelRegistry(budget_bytes=100)
+    unloaded = []
+    _register(registry, 'a', 40, unloaded)
+    _register(registry, 'b', 40, unloaded)
+    with registry.use('a'):
+        pass  # 'b' is now least recently used
+
+    registry.reserve('c', 40)
+
+    assert unloaded == ['b']
+    assert registry.is_resident('a') and not registry.is_resident('b')
+
+
+def test_pinned_and_busy_models_are_kept():
+    registry = ModelRegistry(budget_bytes=100, pinned=['a'])
+    unloaded = []
+    _register(registry, 'a', 60, unloaded)
+    _register(registry, 'b', 30, unloaded)
+    with registry.use('b'):
+        registry.reserve('c', 50)
+        assert unloaded == []
+    assert not registry.evict('a')
+    assert registry.evict('b')
+    assert unloaded == ['b']
+
+
+def test_idle_eviction():
+    registry = ModelRegistry(idle_timeout=3600)
+    unloaded = []
+    _register(registry, 'old', 1, unloaded)
+    _register(registry, 'fresh', 1, unloaded)
+    registry._models['old'].last_used = time.time() - 7200
+
+    registry.evict_idle()
+
+    assert unloaded == ['old']
+    status = registry.get_status()
+    assert [m['name'] for m in status['models']] == ['fresh']
+    assert status['evictions'] == 1
+
+
+def test_process_rss_bytes_of_missing_process():
+    assert process_rss_bytes(2 ** 30) == 0
@@ -0,0 +1,41 @@
+import time
+
+from model_warmup import ModelWarmup, warmup_pcm
+
+
+def wait_finished(warmup, timeout=5):
+    deadline = time.time() + timeout
+    while not warmup.get_status()['finished'] and time.time() < deadline:
+        time.sleep(0.01)
+    return warmup.get_status()
+
+
+def test_warmup_reports_per_model_state():
+    warmed = []
+    warmup = ModelWarmup()
+    warmup.register('sensevoice', lambda _: warmed.append('sensevoice'))
+    warmup.register('whisper:', lambda model: warmed.append(model))
+
+    def broken(_):
+        raise RuntimeError('no model')
+    warmup.register('pyannote', broken)
+
+    warmup.start(['sensevoice', 'whisper:ggml-base.bin'])
+    status = wait_finished(warmup)
+    assert status['ready']
+    assert warmed == ['sensevoice', 'ggml-base.bin']
+    assert status['models']['whisper:ggml-base.bin']['status'] == 'ready'
+
+    failing = ModelWarmup()
+    failing.register('pyannote', broken)
+    failing.start(['pyannote', 'unknown'])
+    status = wait_finished(failing)
+    assert status['finished'] and not status['ready']
+    assert status['models']['pyannote']['error'] == 'no model'
+    assert status['models']['unknown']['status'] == 'failed'
+
+
+def test_warmup_pcm_is_short_and_quiet():
+    pcm = warmup_pcm(0.5)
+    assert len(pcm) == 8000 and pcm.dtype.name == 'float32'
+    assert 0 < abs(pcm).max() < 0.1
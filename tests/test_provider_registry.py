@@ -0,0 +1,31 @@
+from provider_registry import ProviderRegistry
+
+
+def test_checks_are_cached_until_invalidated():
+    calls = []
+
+    def check():
+        calls.append(1)
+        return len(calls) > 1
+
+    registry = ProviderRegistry()
+    registry.register('sensevoice', check)
+    assert registry.is_available('sensevoice') is False
+    assert registry.is_available('sensevoice') is False
+    assert len(calls) == 1
+
+    registry.invalidate('sensevoice')
+    assert registry.is_available('sensevoice') is True
+    assert registry.refresh() == {'sensevoice': True}
+    assert len(calls) == 3
+
+
+def test_failing_check_is_cached_as_unavailable():
+    registry = ProviderRegistry()
+
+    def broken():
+        raise OSError('no models dir')
+    registry.register('local', broken)
+    assert registry.get('local') is None
+    assert not registry.is_available('missing')
+    assert registry.get_status()['checks_run'] == 1
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests for remote transcription dispatch against several local worker node
+processes running stand-in engines
+"""
+
+import os
+import time
+import socket
+import threading
+import multiprocessing
+
+import numpy as np
+import pytest
+import requests
+
+from remote_transcription import RemoteWorkerPool, RemoteWorkerError
+
+
+class FakeEngines:
+    def __init__(self, name, models, delay):
+        self.name = name
+        self.models = models
+        self.delay = delay
+
+    def transcribe(self, pcm, provider, language=None, model_path=None, detect_emotion=True,
+                   detect_events=True, use_itn=True, progress_callback=None):
+        if progress_callback:
+            progress_callback(50.0)
+        time.sleep(self.delay)
+        model = os.path.basename(model_path) if model_path else 'SenseVoiceSmall'
+        return {"success": True, "transcription": f"{self.name}:{len(pcm)}", "model": model}
+
+    def available(self):
+        return {"local": True, "sensevoice": True}
+
+    def whisper_models(self):
+        return self.models
+
+
+def _serve(port, name, models, delay, capacity):
+    from werkzeug.serving import make_server
+    from worker_node import create_app
+    app = create_app(FakeEngines(name, models, delay), name=name, capacity=capacity, token='secret')
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def start_node():
+    processes = []
+
+    def start(name, models=(), delay=0.0, capacity=2):
+        port = _free_port()
+        process = multiprocessing.get_context('fork').Process(
+            target=_serve, args=(port, name, list(models), delay, capacity), daemon=True)
+        process.start()
+        processes.append(process)
+        url = f'http://127.0.0.1:{port}'
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                requests.get(f'{url}/health', headers={'Authorization': 'Bearer secret'}, timeout=1)
+                return url
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        raise RuntimeError(f'worker node {name} did not start')
+
+    yield start
+    for process in processes:
+        process.terminate()
+        process.join(5)
+
+
+PCM = np.zeros(1600, dtype=np.float32)
+
+
+def test_jobs_spread_over_least_loaded_nodes(start_node):
+    urls = [start_node('a', delay=0.3), start_node('b', delay=0.3)]
+    pool = RemoteWorkerPool(urls, token='secret')
+    pool.check_health()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.transcribe(PCM, 'sensevoice')))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    nodes = sorted(r["transcription"].split(':')[0] for r in results)
+    assert nodes == ['a', 'a', 'b', 'b']
+    assert all(n["active"] == 0 for n in pool.get_stats()["nodes"])
+
+
+def test_progress_is_streamed(start_node):
+    pool = RemoteWorkerPool([start_node('a')], token='secret')
+    seen = []
+    result = pool.transcribe(PCM, 'sensevoice', progress_callback=seen.append)
+    assert result == {"success": True, "transcription": "a:1600", "model": "SenseVoiceSmall"}
+    assert seen == [50.0]
+
+
+def test_retries_on_another_node_when_one_is_down(start_node):
+    dead = f'http://127.0.0.1:{_free_port()}'
+    pool = RemoteWorkerPool([dead, start_node('b')], token='secret')
+    result = pool.transcribe(PCM, 'sensevoice')
+    assert result["transcription"] == "b:1600"
+    dead_node = pool.get_stats()["nodes"][0]
+    assert dead_node["dispatched"] == 1 and not dead_node["healthy"]
+    assert pool.get_stats()["retries"] == 1
+    # Skipped from now on, without another failed attempt
+    assert pool.transcribe(PCM, 'sensevoice')["transcription"] == "b:1600"
+    assert pool.get_stats()["nodes"][0]["dispatched"] == 1
+
+
+def test_busy_node_hands_the_job_to_another(start_node):
+    busy = start_node('busy', delay=1.0, capacity=1)
+    pool = RemoteWorkerPool([busy], token='secret')
+    blocker = threading.Thread(target=pool.transcribe, args=(PCM, 'sensevoice'))
+    blocker.start()
+    time.sleep(0.3)
+    # A second web process that does not know about the running job
+    other = RemoteWorkerPool([busy, start_node('free')], token='secret')
+    other.nodes[1].dispatched = 1  # make the busy node the first choice
+    assert other.transcribe(PCM, 'sensevoice')["transcription"] == "free:1600"
+    assert other.get_stats()["retries"] == 1
+    blocker.join()
+
+
+def test_whisper_models_are_routed_to_nodes_that_have_them(start_node):
+    pool = RemoteWorkerPool([start_node('a', models=['ggml-tiny.bin']),
+                             start_node('b', models=['ggml-base.bin'])], token='secret')
+    pool.check_health()
+    assert pool.models() == ['ggml-base.bin', 'ggml-tiny.bin']
+    for _ in range(3):
+        result = pool.transcribe(PCM, 'local', 'ggml-base.bin')
+        assert result["transcription"] == "b:1600"
+        assert result["model"] == "ggml-base.bin"
+    with pytest.raises(RemoteWorkerError, match="no worker node"):
+        pool.transcribe(PCM, 'local', 'ggml-large.bin')
+
+
+def test_wrong_token_is_not_retried_forever(start_node):
+    pool = RemoteWorkerPool([start_node('a'), start_node('b')], token='wrong', max_attempts=3)
+    with pytest.raises(RemoteWorkerError, match="401"):
+        pool.transcribe(PCM, 'sensevoice')
+    assert sum(n["failures"] for n in pool.get_stats()["nodes"]) == 2
+
+
+def test_worker_node_requires_a_token_unless_anonymous_is_allowed(monkeypatch):
+    from worker_node import create_app
+
+    monkeypatch.delenv('WORKER_NODE_TOKEN', raising=False)
+    monkeypatch.delenv('WORKER_NODE_ALLOW_ANONYMOUS', raising=False)
+    engines = FakeEngines('a', [], 0.0)
+    with pytest.raises(ValueError, match="WORKER_NODE_TOKEN"):
+        create_app(engines)
+    client = create_app(engines, allow_anonymous=True).test_client()
+    assert client.get('/health').status_code == 200
+
+    client = create_app(engines, token='secret').test_client()
+    assert client.get('/health').status_code == 401
+    assert client.get('/health', headers={'Authorization': 'Bearer secre'}).status_code == 401
+    assert client.get('/health', headers={'Authorization': 'Bearer secret'}).status_code == 200
@@ -0,0 +1,121 @@
+import numpy as np
+
+import sensevoice_onnx
+from sensevoice_onnx import SenseVoiceOnnxModel, is_exported
+
+
+class FakeTokenizer:
+    def decode(self, ids):
+        return " ".join(str(i) for i in ids)
+
+
+class FakeSession:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __call__(self, inputs):
+        batch = inputs[0].shape[0]
+        logits = np.zeros((batch, len(self.ids), 10), dtype=np.float32)
+        for t, token in enumerate(self.ids):
+            logits[:, t, token] = 1.0
+        return logits, np.full(batch, len(self.ids), dtype=np.int32)
+
+
+def make_model(ids):
+    model = SenseVoiceOnnxModel.__new__(SenseVoiceOnnxModel)
+    model.session = FakeSession(ids)
+    model.tokenizer = FakeTokenizer()
+    model.blank_id = 0
+    model._features = lambda pcm: (np.zeros((len(pcm) // 160, 560), dtype=np.float32), len(pcm) // 160)
+    return model
+
+
+def test_greedy_ctc_collapses_repeats_and_blanks():
+    model = make_model([3, 3, 0, 5, 5, 0, 0, 3])
+    texts = model.infer_batch([np.zeros(16000, dtype=np.float32), np.zeros(8000, dtype=np.float32)])
+    assert texts == ["3 5 3", "3 5 3"]
+
+
+def test_is_exported_requires_graph_and_assets(tmp_path):
+    for name in ('config.yaml', 'am.mvn', sensevoice_onnx.BPE_MODEL, 'model.onnx'):
+        (tmp_path / name).write_bytes(b'')
+    assert is_exported(str(tmp_path))
+    assert not is_exported(str(tmp_path), quantize=True)
+
+
+def test_generate_list_returns_one_result_per_input(monkeypatch):
+    model = make_model([4, 0, 6])
+    calls = []
+    original = model.infer_batch
+    monkeypatch.setattr(model, 'infer_batch', lambda w, l, i: calls.append(len(w)) or original(w, l, i))
+    res = model.generate([np.zeros(16000, dtype=np.float32), np.zeros(32000, dtype=np.float32)])
+    assert [r['text'] for r in res] == ["4 6", "4 6"]
+    assert calls == [2]
+
+
+def test_onnx_engine_finds_models_outside_whisper_cpp_models(tmp_path, monkeypatch):
+    import sensevoice_wrapper
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setattr(sensevoice_wrapper, 'SENSEVOICE_ENGINE', 'onnx')
+    wrapper = sensevoice_wrapper.SenseVoiceWrapper()
+    assert not wrapper.is_available()
+
+    # A checkpoint in the FunASR cache can be exported and used
+    cache_dir = tmp_path / '.cache' / 'funasr' / 'iic' / 'SenseVoiceSmall'
+    cache_dir.mkdir(parents=True)
+    for name in ('config.yaml', 'model.pt'):
+        (cache_dir / name).write_bytes(b'')
+    assert wrapper.is_available()
+    assert wrapper._find_onnx_model_dir(False) == str(cache_dir)
+
+    # An exported graph elsewhere takes precedence over exporting again
+    exported_dir = tmp_path / 'models' / 'SenseVoiceSmall'
+    exported_dir.mkdir(parents=True)
+    for name in ('config.yaml', 'am.mvn', sensevoice_onnx.BPE_MODEL, 'model.onnx'):
+        (exported_dir / name).write_bytes(b'')
+    assert wrapper._find_onnx_model_dir(False) == str(exported_dir)
+
+
+class FakeOnlineFbank:
+    def __init__(self):
+        self.samples = 0
+        self.frames_read = []
+
+    def accept_waveform(self, sample_rate, samples):
+        self.samples += len(samples)
+
+    @property
+    def num_frames_ready(self):
+        return self.samples // 160
+
+    def get_frame(self, i):
+        self.frames_read.append(i)
+        return np.full(4, i, dtype=np.float32)
+
+
+class FakeFrontend:
+    def __init__(self):
+        from types import SimpleNamespace
+        self.opts = SimpleNamespace(frame_opts=SimpleNamespace(samp_freq=16000))
+        self.reset_status()
+
+    def reset_status(self):
+        self.fbank_fn = FakeOnlineFbank()
+
+    def lfr_cmvn(self, feat):
+        return feat, np.int32(len(feat))
+
+
+def test_online_features_read_each_frame_once():
+    features = sensevoice_onnx.OnlineFeatures.__new__(sensevoice_onnx.OnlineFeatures)
+    features.frontend = FakeFrontend()
+    features.reset()
+    assert features.features() is None
+    for _ in range(10):
+        features.accept(np.zeros(1600, dtype=np.float32))
+        feat, length = features.features()
+    assert length == 100
+    assert np.array_equal(feat[:, 0], np.arange(100))
+    assert features.frontend.fbank_fn.frames_read == list(range(100))
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+
+from sensevoice_streaming import StreamingRecognizer, StreamSessionManager
+
+SR = 16000
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * SR)) / SR
+    return (0.3 * np.sin(2 * np.pi * 300 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+def feed(recognizer, pcm, chunk=0.25):
+    events = []
+    step = int(chunk * SR)
+    for i in range(0, len(pcm), step):
+        events.extend(recognizer.accept(pcm[i:i + step]))
+    return events
+
+
+def test_partials_then_endpointed_final():
+    decoded = []
+
+    def recognize(pcm, features):
+        decoded.append(len(pcm) / SR)
+        return f"seg{len(decoded)}"
+
+    recognizer = StreamingRecognizer(recognize, partial_interval=1.0, endpoint_silence=0.6)
+    events = feed(recognizer, np.concatenate([silence(0.5), tone(2.5), silence(1.0)]))
+    kinds = [e['type'] for e in events]
+    assert 'partial' in kinds and kinds[-1] == 'final'
+    # The committed segment excludes most of the trailing silence
+    assert decoded[-1] < 3.5
+
+    # Only the open segment is decoded when recording stops
+    feed(recognizer, tone(1.0))
+    calls = len(decoded)
+    final = recognizer.finish()
+    assert len(decoded) == calls + 1
+    assert final['transcript'].startswith(events[-1]['text'])
+
+
+def test_silence_is_never_decoded():
+    recognizer = StreamingRecognizer(lambda pcm, f: 'x')
+    assert feed(recognizer, silence(5)) == []
+    assert recognizer.finish()['transcript'] == ''
+    assert len(recognizer._segment) < SR
+
+
+def test_session_limit_and_owner_check():
+    manager = StreamSessionManager(max_sessions=1)
+    session = manager.create('alice', StreamingRecognizer(lambda p, f: ''))
+    assert manager.create('bob', StreamingRecognizer(lambda p, f: '')) is None
+    with manager.open(session.id, 'bob') as other:
+        assert other is None
+    with manager.open(session.id, 'alice') as held:
+        assert held is session
+    manager.close(session.id)
+    assert manager.count() == 0
+
+
+def test_shared_sessions_resume_in_another_manager(tmp_path):
+    def factory(params):
+        return StreamingRecognizer(lambda pcm, f: f"{params['tag']}{len(pcm) // SR}",
+                                   partial_interval=10, endpoint_silence=0.6)
+
+    # Two managers on one directory stand in for two worker processes
+    first = StreamSessionManager(max_sessions=1, state_dir=str(tmp_path), factory=factory)
+    second = StreamSessionManager(max_sessions=1, state_dir=str(tmp_path), factory=factory)
+    session = first.create('alice', factory({'tag': 's'}), {'tag': 's'})
+    assert second.create('bob', factory({'tag': 's'}), {'tag': 's'}) is None
+
+    with first.open(session.id, 'alice') as held:
+        feed(held.recognizer, np.concatenate([tone(2.0), silence(1.0)]))
+        feed(held.recognizer, tone(1.0))
+    with second.open(session.id, 'bob') as other:
+        assert other is None
+    with second.open(session.id, 'alice') as held:
+        assert held.recognizer.segments == ['s2']
+        final = held.recognizer.finish()
+        second.close(session.id)
+    assert final['transcript'] == 's2 s1'
+    assert first.count() == 0
+
+
+def test_shared_state_dir_and_ids_are_checked(tmp_path):
+    factory = lambda params: StreamingRecognizer(lambda pcm, f: '')
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(RuntimeError, match="writable by other users"):
+        StreamSessionManager(state_dir=str(shared), factory=factory)
+
+    state_dir = tmp_path / 'streams'
+    manager = StreamSessionManager(state_dir=str(state_dir), factory=factory)
+    assert os.stat(state_dir).st_mode & 0o777 == 0o700
+    for bad in ('', 'abc', '../' + 'a' * 29):
+        with pytest.raises(ValueError):
+            manager._path(bad)
+
+    # Session files hold no pickled objects, and a corrupt one is treated as missing
+    session = manager.create('alice', factory({}), {})
+    with np.load(manager._path(session.id), allow_pickle=False) as data:
+        assert '__meta__' in data.files
+    with open(manager._path(session.id), 'wb') as f:
+        f.write(b'not a session')
+    with manager.open(session.id, 'alice') as held:
+        assert held is None
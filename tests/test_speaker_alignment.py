@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for timestamp-based speaker alignment
+"""
+
+import pytest
+
+from whisper_cpp_wrapper import _tokens_to_words
+
+pytest.importorskip("torch")
+from speaker_diarization import SpeakerIntervalIndex, SpeakerDiarizationWrapper  # noqa: E402
+
+TURNS = [
+    {'start': 0.0, 'end': 4.0, 'speaker': 'SPEAKER_01'},
+    {'start': 4.0, 'end': 9.0, 'speaker': 'SPEAKER_00'},
+    {'start': 11.0, 'end': 15.0, 'speaker': 'SPEAKER_01'},
+]
+
+
+def test_tokens_to_words_merges_subwords():
+    tokens = [('[_BEG_]', 0.0, 0.0), (' Hel', 0.0, 0.2), ('lo', 0.2, 0.4), (' world', 0.5, 0.9), ('.', 0.9, 1.0)]
+    assert _tokens_to_words(tokens) == [
+        {'word': 'Hello', 'start': 0.0, 'end': 0.4},
+        {'word': 'world.', 'start': 0.5, 'end': 1.0},
+    ]
+
+
+def test_interval_index_lookup():
+    index = SpeakerIntervalIndex(TURNS)
+    assert index.speaker_for(1.0, 2.0) == 'SPEAKER_01'
+    assert index.speaker_for(3.5, 6.0) == 'SPEAKER_00'  # larger overlap wins
+    assert index.speaker_for(9.2, 9.4) == 'SPEAKER_00'  # gap: nearest turn
+    assert index.speaker_for(10.8, 10.9) == 'SPEAKER_01'
+    assert index.speaker_number('SPEAKER_00') == 1
+
+
+def test_interval_index_lookup_stays_logarithmic_after_a_long_turn():
+    # A long opening monologue overlapped by many short turns
+    turns = [{'start': 0.0, 'end': 3000.0, 'speaker': 'SPEAKER_00'}]
+    turns += [{'start': 1.0 + i, 'end': 1.5 + i, 'speaker': f'SPEAKER_{1 + i % 2:02d}'} for i in range(4000)]
+    index = SpeakerIntervalIndex(turns)
+
+    def brute_force(start, end):
+        overlaps = [(min(end, t['end']) - max(start, t['start']), t['start'], t['speaker']) for t in turns]
+        return max(o for o in overlaps if o[0] >= 0)[2]
+
+    for start in (0.2, 1.1, 1.6, 1500.2, 2999.0, 3500.0):
+        index.visits = 0
+        assert index.speaker_for(start, start + 0.3) == brute_force(start, start + 0.3)
+        assert index.visits <= 40
+
+
+def test_apply_diarization_to_segments_groups_words():
+    asr_segments = [
+        {'start': 0.0, 'end': 8.0, 'text': ' Hi there. Hello back.', 'words': [
+            {'word': 'Hi', 'start': 0.5, 'end': 1.0},
+            {'word': 'there.', 'start': 1.0, 'end': 1.5},
+            {'word': 'Hello', 'start': 5.0, 'end': 5.5},
+            {'word': 'back.', 'start': 5.5, 'end': 6.0},
+        ]},
+        {'start': 12.0, 'end': 13.0, 'text': ' Bye.', 'words': []},
+    ]
+    text = SpeakerDiarizationWrapper().apply_diarization_to_segments(asr_segments, TURNS)
+    assert text == "[SPEAKER 2] Hi there.\n\n[SPEAKER 1] Hello back.\n\n[SPEAKER 2] Bye."
+
+
+def test_pipeline_batch_sizes_come_from_environment(monkeypatch):
+    class FakePipeline:
+        segmentation_batch_size = 1
+        embedding_batch_size = 1
+
+    monkeypatch.setenv('DIARIZATION_SEGMENTATION_BATCH_SIZE', '16')
+    monkeypatch.setenv('DIARIZATION_EMBEDDING_BATCH_SIZE', '')
+    wrapper = SpeakerDiarizationWrapper()
+    wrapper.pipeline = FakePipeline()
+    wrapper._configure_pipeline()
+    assert wrapper.pipeline.segmentation_batch_size == 16
+    assert wrapper.pipeline.embedding_batch_size == 1
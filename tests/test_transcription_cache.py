@@ -0,0 +1,40 @@
+import os
+
+from transcription_cache import TranscriptionCache
+
+
+def test_key_depends_on_audio_and_options():
+    base = TranscriptionCache.make_key('abc', 'sensevoice', None, 'es', itn=True)
+    assert base == TranscriptionCache.make_key('abc', 'sensevoice', None, 'es', itn=True)
+    assert base != TranscriptionCache.make_key('abd', 'sensevoice', None, 'es', itn=True)
+    assert base != TranscriptionCache.make_key('abc', 'sensevoice', None, 'es', itn=False)
+    assert base != TranscriptionCache.make_key('abc', 'local', None, 'es', itn=True)
+    assert TranscriptionCache.make_key('abc', 'local', 'm', None) == TranscriptionCache.make_key('abc', 'local', 'm', 'auto')
+
+
+def test_hit_miss_and_persistence(tmp_path):
+    cache = TranscriptionCache(str(tmp_path))
+    key = TranscriptionCache.make_key('abc', 'local', 'ggml-base.bin', 'en')
+    assert cache.get(key) is None
+    cache.put(key, {"transcription": "hola", "result": {"success": True}})
+    assert cache.get(key)["transcription"] == "hola"
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+    reopened = TranscriptionCache(str(tmp_path))
+    assert reopened.get(key)["result"] == {"success": True}
+
+
+def test_lru_eviction(tmp_path):
+    cache = TranscriptionCache(str(tmp_path), max_bytes=250)
+    keys = [TranscriptionCache.make_key(str(i), 'local', 'm', 'en') for i in range(3)]
+    for key in keys[:2]:
+        cache.put(key, {"transcription": "x" * 80})
+    cache.get(keys[0])  # keys[1] becomes least recently used
+    cache.put(keys[2], {"transcription": "x" * 80})
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert not os.path.exists(cache._path(keys[1]))
+    assert cache.get_stats()["evictions"] == 1
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the stage DAG executor used by the transcription endpoints
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from transcription_pipeline import StagePipeline, TranscriptionProgress
+
+
+def test_independent_stages_run_in_parallel():
+    pipeline = StagePipeline(ThreadPoolExecutor(max_workers=4))
+    pipeline.add_stage('decode', lambda _: 'pcm')
+    pipeline.add_stage('asr', lambda i: time.sleep(0.3) or f"text from {i['decode']}", depends_on=['decode'])
+    pipeline.add_stage('diarization', lambda i: time.sleep(0.3) or ['spk'], depends_on=['decode'])
+    pipeline.add_stage('alignment', lambda i: (i['asr'], i['diarization']), depends_on=['asr', 'diarization'])
+
+    results = pipeline.run()
+
+    assert results['alignment'] == ('text from pcm', ['spk'])
+    assert set(pipeline.timings) == {'decode', 'asr', 'diarization', 'alignment', 'total'}
+    # Wall time is close to the slowest branch, not the sum of both
+    assert pipeline.timings['total'] < 0.55
+
+
+def test_stage_errors_propagate():
+    pipeline = StagePipeline(ThreadPoolExecutor(max_workers=2))
+    pipeline.add_stage('decode', lambda _: 1 / 0)
+    pipeline.add_stage('asr', lambda i: i['decode'], depends_on=['decode'])
+    with pytest.raises(ZeroDivisionError):
+        pipeline.run()
+
+
+def test_unknown_dependency_rejected():
+    pipeline = StagePipeline(ThreadPoolExecutor(max_workers=1))
+    with pytest.raises(ValueError):
+        pipeline.add_stage('alignment', lambda i: None, depends_on=['asr'])
+
+
+def test_progress_reports_rtf_and_drops_stale_updates():
+    emitted = []
+    progress = TranscriptionProgress(60.0, emitted.append)
+    progress.started -= 3.0  # pretend 3 s of compute elapsed
+
+    info = progress.update(50)
+    assert progress.update(40) is None
+    progress.update(100)
+
+    assert [e['percent'] for e in emitted] == [50.0, 100.0]
+    assert info['audio_seconds'] == 60.0
+    assert 0.09 < info['rtf'] < 0.2  # ~3 s for 30 s of audio
+    assert info['eta'] > 0
@@ -0,0 +1,58 @@
+import os
+import io
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("ADMIN_PASSWORD", "secret")
+
+import backend
+from backend import app, HASHER
+from db import pool, init_db, create_user
+from whisper_server_pool import WhisperServerPool
+from test_whisper_server_pool import _make_server
+
+
+@pytest.fixture(autouse=True)
+def setup_env(tmp_path, monkeypatch):
+    init_db()
+    with pool.connection() as conn:
+        conn.execute('DELETE FROM users')
+        conn.commit()
+    create_user('admin', HASHER.hash('secret'), True, [], [])
+
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    server, model, audio = _make_server(bin_dir)
+    models_dir = tmp_path / 'whisper-cpp-models'
+    models_dir.mkdir()
+    model = model.rename(models_dir / model.name)
+    server_pool = WhisperServerPool(server, threads=1)
+    monkeypatch.setattr(backend, 'whisper_wrapper', SimpleNamespace(pool=server_pool))
+
+    old_cwd = os.getcwd()
+    os.chdir(tmp_path)
+    yield {'pool': server_pool, 'model': model, 'audio': audio}
+    os.chdir(old_cwd)
+    server_pool.shutdown()
+    with pool.connection() as conn:
+        conn.execute('DELETE FROM users')
+        conn.commit()
+
+
+def test_reupload_model_stops_its_workers(setup_env):
+    server_pool, model = setup_env['pool'], setup_env['model']
+    server_pool.transcribe(model, str(setup_env['audio']))
+    worker = server_pool._workers[str(model.resolve())][0]
+
+    client = app.test_client()
+    resp = client.post('/api/login', json={'username': 'admin', 'password': 'secret'})
+    token = resp.get_json()['token']
+
+    resp = client.post('/api/upload-model', headers={'Authorization': token},
+                       data={'model': (io.BytesIO(b'new weights'), model.name)},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 200
+    assert resp.get_json()['overwritten'] is True
+    assert not worker.is_alive()
+    assert model.read_bytes() == b'new weights'
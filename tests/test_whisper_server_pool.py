@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests for the whisper.cpp worker pool using a stand-in whisper-server script
+"""
+
+import sys
+import stat
+import time
+import threading
+import textwrap
+
+import pytest
+
+from whisper_server_pool import WhisperServerPool, WhisperServerError
+
+FAKE_SERVER = textwrap.dedent('''\
+    #!{python}
+    import argparse, json, os, sys, time
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('-t')
+    parser.add_argument('-pp', action='store_true')
+    args = parser.parse_args()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def _send(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._send({{'status': 'ok'}})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            if b'CRASH' in body:
+                os._exit(1)
+            if b'SLOW' in body:
+                time.sleep(5)
+            if args.pp:
+                for pct in (50, 100):
+                    print(f'whisper_print_progress_callback: progress = {{pct:3d}}%', file=sys.stderr, flush=True)
+                time.sleep(0.2)
+            self._send({{'text': ' hello from ' + os.path.basename(args.m) + ' pid ' + str(os.getpid())}})
+
+    HTTPServer((args.host, args.port), Handler).serve_forever()
+''')
+
+
+def _make_server(tmp_path):
+    path = tmp_path / 'whisper-server'
+    path.write_text(FAKE_SERVER.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    model = tmp_path / 'ggml-test.bin'
+    model.write_bytes(b'model')
+    audio = tmp_path / 'audio.wav'
+    audio.write_bytes(b'RIFF....WAVE')
+    return path, model, audio
+
+
+def test_pool_reuses_warm_worker(tmp_path):
+    server, model, audio = _make_server(tmp_path)
+    pool = WhisperServerPool(server, threads=1)
+    try:
+        first = pool.transcribe(model, str(audio))
+        second = pool.transcribe(model, str(audio))
+        assert first['text'] == second['text']
+        assert 'ggml-test.bin' in first['text']
+        status = pool.get_status()
+        worker = status['models']['ggml-test.bin']['workers'][0]
+        assert worker['jobs_completed'] == 2
+        assert status['queue_depth'] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_pool_restarts_crashed_worker(tmp_path):
+    server, model, audio = _make_server(tmp_path)
+    crash = tmp_path / 'crash.wav'
+    crash.write_bytes(b'CRASH')
+    pool = WhisperServerPool(server, threads=1)
+    try:
+        before = pool.transcribe(model, str(audio))['text']
+        with pytest.raises(WhisperServerError):
+            pool.transcribe(model, str(crash))
+        after = pool.transcribe(model, str(audio))['text']
+        assert before != after  # served by a new process
+        worker = pool.get_status()['models']['ggml-test.bin']['workers'][0]
+        assert worker['restarts'] >= 1
+        assert worker['alive']
+    finally:
+        pool.shutdown()
+
+
+def test_pool_forwards_progress(tmp_path):
+    server, model, audio = _make_server(tmp_path)
+    pool = WhisperServerPool(server, threads=1)
+    seen = []
+    try:
+        pool.transcribe(model, str(audio), progress_callback=seen.append)
+        assert seen == [50.0, 100.0]
+    finally:
+        pool.shutdown()
+
+
+def test_stop_model_stops_its_workers(tmp_path):
+    server, model, audio = _make_server(tmp_path)
+    pool = WhisperServerPool(server, threads=1)
+    try:
+        before = pool.transcribe(model, str(audio))['text']
+        worker = pool._workers[str(model.resolve())][0]
+        pool.stop_model(model)
+        assert not worker.is_alive()
+        assert 'ggml-test.bin' not in pool.get_status()['models']
+        # The next request starts a fresh process on the new weights
+        assert pool.transcribe(model, str(audio))['text'] != before
+    finally:
+        pool.shutdown()
+
+
+def test_stop_model_during_a_job_does_not_restart_the_worker(tmp_path):
+    server, model, audio = _make_server(tmp_path)
+    slow = tmp_path / 'slow.wav'
+    slow.write_bytes(b'SLOW')
+    pool = WhisperServerPool(server, threads=1)
+    errors = []
+
+    def run():
+        try:
+            pool.transcribe(model, str(slow))
+        except WhisperServerError as e:
+            errors.append(e)
+
+    try:
+        pool.transcribe(model, str(audio))
+        worker = pool._workers[str(model.resolve())][0]
+        job = threading.Thread(target=run)
+        job.start()
+        time.sleep(0.3)
+        pool.stop_model(model)
+        job.join(10)
+        assert not job.is_alive()
+        assert len(errors) == 1
+        assert worker.retired and not worker.is_alive()
+        assert worker.restarts == 0
+    finally:
+        pool.shutdown()
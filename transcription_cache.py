@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+WhisPad transcription result cache
+On-disk LRU cache of finished transcriptions, keyed by the SHA-256 of the
+audio plus every option that changes the output (provider, model, language,
+SenseVoice flags, diarization).
+"""
+
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """Content-addressed LRU cache stored as one JSON file per entry"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @staticmethod
+    def make_key(audio_hash: str, provider: str, model: Optional[str], language: Optional[str],
+                 **options) -> str:
+        """Build a cache key from the audio hash and all output-affecting options"""
+        payload = json.dumps({
+            "audio": audio_hash,
+            "provider": provider,
+            "model": model or '',
+            "language": language or 'auto',
+            "options": options,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files left by previous runs"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, name[:-5], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result and mark it most recently used"""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                # Another worker process may have written it since the index was built
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    self.misses += 1
+                    return None
+                self._entries[key] = size
+                self._total_bytes += size
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+                # The file mtime keeps the LRU order across restarts
+                os.utime(path)
+            except (OSError, ValueError):
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a result, evicting least recently used entries over budget"""
+        path = self._path(key)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Could not write transcription cache entry: {e}")
+                return
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._entries and self._total_bytes > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_transcription_cache = None
+
+
+def get_transcription_cache() -> Optional[TranscriptionCache]:
+    """Get the global cache instance, or None when disabled"""
+    global _transcription_cache
+    if os.getenv('TRANSCRIPTION_CACHE_ENABLED', 'true').lower() == 'false':
+        return None
+    if _transcription_cache is None:
+        _transcription_cache = TranscriptionCache(
+            os.getenv('TRANSCRIPTION_CACHE_DIR') or os.path.join(os.getcwd(), 'transcription_cache'),
+            max_bytes=int(os.getenv('TRANSCRIPTION_CACHE_MAX_MB', '512')) * 1024 * 1024,
+        )
+    return _transcription_cache
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+WhisPad transcription pipeline
+A small stage DAG executor: stages declare the stages they depend on and
+independent stages (e.g. ASR and speaker diarization) run in parallel on a
+shared worker pool. Per-stage timings are recorded for the response, and
+engine progress is turned into percent, elapsed time and real-time factor.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_pipeline_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool shared by all pipelines"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv('PIPELINE_WORKERS', '4'))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pipeline')
+        return _executor
+
+
+class PipelineStage:
+    """A named unit of work and the stages whose results it needs"""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                 depends_on: Optional[List[str]] = None):
+        self.name = name
+        self.func = func
+        self.depends_on = depends_on or []
+
+
+class StagePipeline:
+    """
+    Run stages as a DAG. Each stage function receives a dict with the results
+    of the stages it depends on and returns its own result. A stage starts as
+    soon as all of its dependencies have finished.
+    """
+
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None):
+        self.executor = executor or get_pipeline_executor()
+        self.stages: Dict[str, PipelineStage] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add_stage(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                  depends_on: Optional[List[str]] = None) -> 'StagePipeline':
+        if name in self.stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        for dep in depends_on or []:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = PipelineStage(name, func, depends_on)
+        return self
+
+    def _timed(self, stage: PipelineStage, inputs: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            return stage.func(inputs)
+        finally:
+            self.timings[stage.name] = round(time.perf_counter() - started, 3)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Execute all stages and return their results by stage name.
+        The first stage exception is re-raised after running stages finish.
+        """
+        started = time.perf_counter()
+        futures = {}
+        # Stages are added in dependency order, so submitting them in order
+        # guarantees every dependency future exists already
+        for stage in self.stages.values():
+            dep_futures = {dep: futures[dep] for dep in stage.depends_on}
+            futures[stage.name] = self.executor.submit(self._run_stage, stage, dep_futures)
+
+        results = {}
+        error = None
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+        self.timings['total'] = round(time.perf_counter() - started, 3)
+        if error is not None:
+            raise error
+        return results
+
+    def _run_stage(self, stage: PipelineStage, dep_futures: Dict[str, Any]):
+        # Waiting on dependencies inside a pool thread is safe here because
+        # dependencies are always submitted before their dependents
+        inputs = {dep: future.result() for dep, future in dep_futures.items()}
+        return self._timed(stage, inputs)
+
+
+class TranscriptionProgress:
+    """
+    Convert engine progress percentages into the progress payload sent to
+    clients: percent, elapsed seconds, real-time factor and ETA.
+    """
+
+    def __init__(self, audio_seconds: float, emit: Callable[[Dict[str, Any]], None]):
+        self.audio_seconds = audio_seconds
+        self.emit = emit
+        self.started = time.perf_counter()
+        self.percent = 0.0
+
+    def update(self, percent: float) -> Optional[Dict[str, Any]]:
+        """Report progress; updates that do not move forward are dropped"""
+        percent = min(100.0, max(0.0, float(percent)))
+        if percent <= self.percent and percent < 100:
+            return None
+        self.percent = percent
+        elapsed = time.perf_counter() - self.started
+        processed = self.audio_seconds * percent / 100
+        info = {
+            "percent": round(percent, 1),
+            "elapsed": round(elapsed, 2),
+            "audio_seconds": round(self.audio_seconds, 2),
+            # Seconds of compute per second of audio; below 1 is faster than real time
+            "rtf": round(elapsed / processed, 3) if processed > 0 else None,
+            "eta": round(elapsed * (100 - percent) / percent, 1) if percent > 0 else None,
+        }
+        try:
+            self.emit(info)
+        except Exception as e:
+            logger.error(f"Error reporting progress: {e}")
+        return info
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+WhisPad energy voice activity detection
+A dependency-free detector (NumPy only) that finds speech regions from frame
+energy against an adaptive noise floor, with hangover smoothing so short
+pauses inside a sentence do not split it. SpeechTimeline uses it as a
+pre-pass that hands ASR engines only the speech and maps their timestamps
+back to the original recording.
+"""
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE
+
+
+def frame_energy_db(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                    frame_seconds: float = 0.03) -> np.ndarray:
+    """Energy of consecutive non-overlapping frames in dBFS"""
+    frame = max(1, int(frame_seconds * sample_rate))
+    n_frames = len(pcm) // frame
+    if not n_frames:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(pcm[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    return (10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)).astype(np.float32)
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """(start, end) frame indices of the True runs in a boolean mask"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def detect_speech(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                  frame_seconds: float = 0.03, margin_db: float = 10.0,
+                  floor_db: float = -50.0, min_speech: float = 0.25,
+                  min_silence: float = 0.3, pad: float = 0.1) -> List[Tuple[float, float]]:
+    """
+    Find speech regions in mono PCM.
+
+    A frame is speech when it is margin_db above the noise floor (the 10th
+    percentile of frame energies) and above floor_db; recordings whose
+    energy never drops that far below its 95th percentile are speech
+    wherever they are above floor_db. Pauses shorter than
+    min_silence are bridged, bursts shorter than min_speech are dropped and
+    every region is padded by `pad` seconds on both sides.
+
+    Returns:
+        Sorted, non-overlapping (start, end) times in seconds
+    """
+    energy = frame_energy_db(pcm, sample_rate, frame_seconds)
+    if not len(energy):
+        return []
+    noise, loud = np.percentile(energy, [10, 95])
+    # Without a clear noise floor (speech throughout) only floor_db applies
+    threshold = max(floor_db, float(noise) + margin_db) if loud - noise > margin_db else floor_db
+    speech = energy > threshold
+
+    # Bridge short pauses, then drop short bursts
+    gap = int(round(min_silence / frame_seconds))
+    for start, end in _runs(~speech):
+        if start > 0 and end < len(speech) and end - start < gap:
+            speech[start:end] = True
+    shortest = int(round(min_speech / frame_seconds))
+    for start, end in _runs(speech):
+        if end - start < shortest:
+            speech[start:end] = False
+
+    duration = len(pcm) / sample_rate
+    regions: List[Tuple[float, float]] = []
+    for start, end in _runs(speech):
+        begin = max(0.0, start * frame_seconds - pad)
+        finish = min(duration, end * frame_seconds + pad)
+        if regions and begin <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], finish)
+        else:
+            regions.append((begin, finish))
+    return regions
+
+
+class SpeechTimeline:
+    """
+    Speech regions of a recording joined into one shorter buffer.
+
+    Regions are concatenated with gap_seconds of silence between them, so
+    the engine still sees sentence boundaries; to_original() maps a time in
+    the joined audio back to the recording.
+    """
+
+    def __init__(self, regions: List[Tuple[float, float]], sample_rate: int = SAMPLE_RATE,
+                 gap_seconds: float = 0.2):
+        self.sample_rate = sample_rate
+        self.gap = int(gap_seconds * sample_rate)
+        self.regions = [(int(start * sample_rate), int(end * sample_rate)) for start, end in regions]
+        # Sample where each region starts in the joined buffer
+        self.offsets = []
+        position = 0
+        for start, end in self.regions:
+            self.offsets.append(position)
+            position += end - start + self.gap
+        self.length = max(0, position - self.gap)
+
+    @classmethod
+    def detect(cls, pcm: np.ndarray, sample_rate: int = SAMPLE_RATE,
+               min_silence_ratio: float = 0.1, **vad_options) -> Optional['SpeechTimeline']:
+        """
+        Timeline of the speech in pcm, or None when trimming is not worth it
+        (less than min_silence_ratio of silence, or no speech found at all, in
+        which case the engine should see everything rather than nothing)
+        """
+        regions = detect_speech(pcm, sample_rate, **vad_options)
+        if not regions:
+            return None
+        timeline = cls(regions, sample_rate)
+        if 1 - timeline.length / max(1, len(pcm)) < min_silence_ratio:
+            return None
+        return timeline
+
+    @property
+    def speech_seconds(self) -> float:
+        return self.length / self.sample_rate
+
+    def compact(self, pcm: np.ndarray) -> np.ndarray:
+        """Only the speech regions of pcm, separated by short silences"""
+        out = np.zeros(self.length, dtype=np.float32)
+        for (start, end), offset in zip(self.regions, self.offsets):
+            out[offset:offset + end - start] = pcm[start:end]
+        return out
+
+    def to_original(self, seconds: float) -> float:
+        """Map a time in the joined audio to the recording's timeline"""
+        if not self.regions:
+            return seconds
+        sample = seconds * self.sample_rate
+        i = max(0, bisect.bisect_right(self.offsets, sample) - 1)
+        start, end = self.regions[i]
+        # Times inside an inserted gap snap to the end of the region before it
+        return (start + min(max(0.0, sample - self.offsets[i]), end - start)) / self.sample_rate
+
+    def map_segments(self, segments: List[Dict]) -> List[Dict]:
+        """Copy of ASR segments (and their words) with original timestamps"""
+        mapped = []
+        for segment in segments:
+            segment = dict(segment)
+            for key in ('start', 'end'):
+                if segment.get(key) is not None:
+                    segment[key] = self.to_original(segment[key])
+            if segment.get('words'):
+                segment['words'] = self.map_segments(segment['words'])
+            mapped.append(segment)
+        return mapped
@@ -5,12 +5,21 @@ This module provides a Python wrapper for whisper.cpp local transcription
 """
 
 import os
+import re
+import uuid
 import subprocess
 import tempfile
 import json
 import logging
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, Union
+
+import numpy as np
+
+from audio_decode import decode_audio_bytes, pcm_to_wav_bytes
+from whisper_server_pool import WhisperServerPool, WhisperServerError, PROGRESS_LINE
+from compute_scheduler import get_compute_scheduler
 
 # Audio processing imports
 try:
@@ -27,6 +36,32 @@ except ImportError as e:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "[00:00:01.000 --> 00:00:04.000]  " prefix of whisper-cli stdout lines
+TIMESTAMP_PREFIX = re.compile(r'^\[[^\]]*-->[^\]]*\]\s*', re.MULTILINE)
+
+
+def _tokens_to_words(tokens: list) -> list:
+    """
+    Merge whisper sub-word tokens into words with start/end times.
+
+    Args:
+        tokens: (text, start_seconds, end_seconds) tuples in order
+
+    Returns:
+        List of {"word", "start", "end"} dicts
+    """
+    words = []
+    for text, start, end in tokens:
+        # Skip special tokens such as [_BEG_], [_TT_150] or <|endoftext|>
+        if not text or text.startswith('[_') or text.startswith('<|'):
+            continue
+        if words and not text.startswith(' '):
+            words[-1]["word"] += text
+            words[-1]["end"] = end
+        else:
+            words.append({"word": text.strip(), "start": start, "end": end})
+    return [w for w in words if w["word"]]
+
 class WhisperCppWrapper:
     """Wrapper class for whisper.cpp local transcription"""
     
@@ -51,6 +86,18 @@ class WhisperCppWrapper:
             self.whisper_cpp_path = self.base_dir / "whisper.cpp-main" / "build" / "bin" / "whisper-cli"
         else:
             self.whisper_cpp_path = Path(whisper_cpp_path)
+
+        # Long-lived whisper.cpp server workers keep models loaded between
+        # requests. Falls back to spawning whisper-cli when unavailable.
+        self.whisper_server_path = self.whisper_cpp_path.parent / "whisper-server"
+        self.threads = int(os.getenv('WHISPER_THREADS', '4'))
+        self.pool = None
+        if os.getenv('WHISPER_SERVER_ENABLED', 'true').lower() != 'false':
+            self.pool = WhisperServerPool(
+                self.whisper_server_path,
+                threads=self.threads,
+                workers_per_model=int(os.getenv('WHISPER_SERVER_WORKERS', '1')),
+            )
             
         # Check if whisper.cpp executable exists
         self._check_prerequisites()
@@ -98,14 +145,18 @@ class WhisperCppWrapper:
             return False
     
     def transcribe_audio(self, audio_file_path: str, language: str = None,
-                        output_format: str = "json", model_path: Optional[str] = None) -> Dict[str, Any]:
+                        output_format: str = "json", model_path: Optional[str] = None,
+                        audio_data: Optional[bytes] = None,
+                        progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
         """
         Transcribe audio using whisper.cpp
         
         Args:
-            audio_file_path: Path to the audio file
+            audio_file_path: Path to the audio file, or "-" to read audio_data
             language: Language code (e.g., 'en', 'es', 'fr') or None for auto-detect
             output_format: Output format ('json', 'txt', 'srt', 'vtt')
+            audio_data: In-memory WAV bytes, used when audio_file_path is "-"
+            progress_callback: Called with the percent done as whisper.cpp reports it
             
         Returns:
             Dictionary with transcription results
@@ -122,36 +173,58 @@ class WhisperCppWrapper:
             if used_model is None or not used_model.exists():
                 raise Exception(f"Model file not found: {used_model}")
 
-            # Prepare command - simpler approach with direct stdout output
-            cmd = [
-                str(self.whisper_cpp_path),
-                "-m", str(used_model),
-                "-f", str(audio_file_path),
-                "--no-timestamps",
-                "--no-prints",  # Suppress debug prints to stderr
-                "-t", "4"  # Use 4 threads
-            ]
+            if self.pool and self.pool.is_available():
+                try:
+                    audio = audio_data if audio_data is not None else audio_file_path
+                    return self._transcribe_with_pool(audio, language, used_model, progress_callback)
+                except WhisperServerError as e:
+                    logger.warning(f"whisper.cpp worker pool failed ({e}), falling back to whisper-cli")
+
+            # Threads come from the shared budget, so concurrent engines do not oversubscribe
+            with get_compute_scheduler().threads('whisper-cli', self.threads) as threads:
+                # Prepare command - full JSON output (-ojf) carries segment and
+                # token timestamps used for speaker alignment. whisper-cli only
+                # writes it to "<prefix>.json" (stdout has no token times), so
+                # this fallback is the one transcription path with a temp file;
+                # it is removed however the run ends
+                json_prefix = os.path.join(tempfile.gettempdir(), f"whispad-{uuid.uuid4().hex}")
+                cmd = [
+                    str(self.whisper_cpp_path),
+                    "-m", str(used_model),
+                    "-f", str(audio_file_path),
+                    "--no-prints",  # Suppress debug prints to stderr
+                    "-t", str(threads),
+                    "-ojf",
+                    "-of", json_prefix
+                ]
+                if progress_callback:
+                    cmd.append("-pp")
             
-            # Add language if specified
-            if language and language != 'auto':
-                cmd.extend(["-l", language])
+                # Add language if specified
+                if language and language != 'auto':
+                    cmd.extend(["-l", language])
             
-            logger.info(f"Running whisper.cpp with command: {' '.join(cmd)}")
+                logger.info(f"Running whisper.cpp with command: {' '.join(cmd)}")
             
-            # Run whisper.cpp
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=120  # 2 minutes timeout
-            )
+                # Run whisper.cpp (audio_data is streamed through stdin for "-f -")
+                try:
+                    result = self._run_cli(cmd, audio_data, timeout=120, progress_callback=progress_callback)
+                except BaseException:
+                    # A killed or failed run may still have left the JSON file
+                    if os.path.exists(json_prefix + ".json"):
+                        os.unlink(json_prefix + ".json")
+                    raise
+            segments = self._read_cli_json(json_prefix + ".json")
             
             if result.returncode == 0:
-                # With --no-prints and --no-timestamps, whisper.cpp outputs clean text to stdout
-                transcription_text = result.stdout.strip()
+                if segments:
+                    transcription_text = "".join(seg["text"] for seg in segments).strip()
+                else:
+                    # With --no-prints, whisper.cpp prints "[t0 --> t1]  text" lines to stdout
+                    transcription_text = TIMESTAMP_PREFIX.sub('', result.stdout).strip()
                 
                 # If stdout is empty, try the output file approach as fallback
-                if not transcription_text:
+                if not transcription_text and audio_file_path != "-":
                     logger.info("No stdout transcription, checking for output file...")
                     
                     # Check if there's an output .txt file
@@ -213,6 +286,7 @@ class WhisperCppWrapper:
                 return {
                     "success": True,
                     "transcription": transcription_text,
+                    "segments": segments,
                     "language": language or "auto",
                     "model": used_model.name
                 }
@@ -239,6 +313,137 @@ class WhisperCppWrapper:
                 "transcription": ""
             }
     
+    def _run_cli(self, cmd: list, audio_data: Optional[bytes], timeout: float,
+                 progress_callback: Optional[Callable[[float], None]] = None) -> subprocess.CompletedProcess:
+        """
+        Run whisper-cli, reading stderr line by line so progress is reported
+        while the model runs. Raises subprocess.TimeoutExpired on timeout.
+        """
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if audio_data is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        stdout_chunks = []
+
+        def feed_stdin():
+            try:
+                process.stdin.write(audio_data)
+            except (BrokenPipeError, OSError):
+                pass
+            finally:
+                process.stdin.close()
+
+        def read_stdout():
+            stdout_chunks.append(process.stdout.read())
+
+        helpers = [threading.Thread(target=read_stdout, daemon=True)]
+        if audio_data is not None:
+            helpers.append(threading.Thread(target=feed_stdin, daemon=True))
+        for helper in helpers:
+            helper.start()
+
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        stderr_lines = []
+        try:
+            for raw_line in process.stderr:
+                line = raw_line.decode('utf-8', errors='replace')
+                match = PROGRESS_LINE.search(line)
+                if match and progress_callback:
+                    try:
+                        progress_callback(float(match.group(1)))
+                    except Exception as e:
+                        logger.error(f"Progress callback failed: {e}")
+                    continue
+                stderr_lines.append(line)
+            returncode = process.wait()
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
+        for helper in helpers:
+            helper.join()
+        if timed_out:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        stdout = b''.join(stdout_chunks).decode('utf-8', errors='replace')
+        return subprocess.CompletedProcess(cmd, returncode, stdout, ''.join(stderr_lines))
+
+    def _transcribe_with_pool(self, audio: Union[str, bytes], language: Optional[str],
+                              model_path: Path,
+                              progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """Transcribe using a warm whisper.cpp server worker"""
+        result = self.pool.transcribe(model_path, audio, language, progress_callback)
+        transcription_text = result.get("text", "").strip()
+        if not transcription_text:
+            return {
+                "success": False,
+                "error": "No transcription text found in whisper.cpp output",
+                "transcription": ""
+            }
+        segments = []
+        for seg in result.get("segments", []):
+            if "start" not in seg:
+                continue
+            words = [
+                (w.get("word", ""), w.get("start"), w.get("end"))
+                for w in seg.get("words", [])
+                if w.get("start") is not None
+            ]
+            segments.append({
+                "start": seg["start"],
+                "end": seg["end"],
+                "text": seg.get("text", ""),
+                "words": _tokens_to_words(words),
+            })
+        return {
+            "success": True,
+            "transcription": transcription_text,
+            "segments": segments,
+            "language": language or "auto",
+            "model": model_path.name
+        }
+
+    def _read_cli_json(self, json_path: str) -> list:
+        """Parse (and remove) the -ojf output of whisper-cli into timed segments"""
+        if not os.path.exists(json_path):
+            return []
+        try:
+            with open(json_path, 'r', encoding='utf-8', errors='replace') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading whisper.cpp JSON output: {e}")
+            return []
+        finally:
+            try:
+                os.unlink(json_path)
+            except OSError:
+                pass
+
+        segments = []
+        for seg in data.get("transcription", []):
+            offsets = seg.get("offsets", {})
+            tokens = [
+                (tok.get("text", ""), tok["offsets"]["from"] / 1000.0, tok["offsets"]["to"] / 1000.0)
+                for tok in seg.get("tokens", [])
+                if "offsets" in tok
+            ]
+            segments.append({
+                "start": offsets.get("from", 0) / 1000.0,
+                "end": offsets.get("to", 0) / 1000.0,
+                "text": seg.get("text", ""),
+                "words": _tokens_to_words(tokens),
+            })
+        return segments
+
+    def get_pool_status(self) -> Dict[str, Any]:
+        """Report worker pool state and queue depth"""
+        if not self.pool:
+            return {"enabled": False}
+        status = self.pool.get_status()
+        status["enabled"] = True
+        return status
+    
     def transcribe_audio_from_bytes(self, audio_bytes: bytes, filename: str = "audio.wav",
                                    language: str = None, model_path: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -246,30 +451,16 @@ class WhisperCppWrapper:
         
         Args:
             audio_bytes: Audio data as bytes
-            filename: Filename for the temporary file
+            filename: Original filename (kept for logging)
             language: Language code or None for auto-detect
             
         Returns:
             Dictionary with transcription results
         """
         try:
-            # Create temporary file for original audio
-            with tempfile.NamedTemporaryFile(suffix=f".{filename.split('.')[-1]}", delete=False) as temp_file:
-                temp_file.write(audio_bytes)
-                original_temp_path = temp_file.name
-            
-            # Convert to WAV format if needed
-            wav_temp_path = self._convert_to_wav(original_temp_path, filename)
-            
-            # Transcribe using the WAV file
-            result = self.transcribe_audio(wav_temp_path, language, model_path=model_path)
-            
-            # Clean up temporary files
-            os.unlink(original_temp_path)
-            if wav_temp_path != original_temp_path:
-                os.unlink(wav_temp_path)
-            
-            return result
+            logger.info(f"Decoding {filename} in memory for whisper.cpp")
+            pcm = decode_audio_bytes(audio_bytes)
+            return self.transcribe_pcm(pcm, language, model_path=model_path)
             
         except Exception as e:
             logger.error(f"Error transcribing from bytes: {e}")
@@ -279,6 +470,24 @@ class WhisperCppWrapper:
                 "transcription": ""
             }
     
+    def transcribe_pcm(self, pcm: np.ndarray, language: str = None,
+                       model_path: Optional[str] = None,
+                       progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """
+        Transcribe decoded 16 kHz mono PCM without writing it to disk
+        
+        Args:
+            pcm: float32 samples from audio_decode.decode_audio_bytes
+            language: Language code or None for auto-detect
+            progress_callback: Called with the percent done as whisper.cpp reports it
+            
+        Returns:
+            Dictionary with transcription results
+        """
+        return self.transcribe_audio("-", language, model_path=model_path,
+                                     audio_data=pcm_to_wav_bytes(pcm),
+                                     progress_callback=progress_callback)
+
     def _convert_to_wav(self, input_path: str, original_filename: str) -> str:
         """
         Convert audio file to WAV format if needed
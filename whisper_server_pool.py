@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+WhisPad whisper.cpp worker pool
+Keeps long-lived whisper.cpp server processes (examples/server) warm, one
+group per model, so the ggml model is loaded once instead of on every request.
+"""
+
+import os
+import re
+import socket
+import subprocess
+import threading
+import time
+import logging
+import atexit
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional, Dict, Any, List, Union
+
+import requests
+
+from model_registry import get_model_registry, process_rss_bytes
+from compute_scheduler import get_compute_scheduler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# "whisper_print_progress_callback: progress =  45%" lines printed with -pp
+PROGRESS_LINE = re.compile(r'progress\s*=\s*(\d+)%')
+
+
+class WhisperServerError(Exception):
+    """Raised when a whisper.cpp server worker cannot serve a request"""
+
+
+def _find_free_port(host: str) -> int:
+    """Ask the OS for a free TCP port on the given host"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class WhisperServerWorker:
+    """A single whisper.cpp server process with one model loaded"""
+
+    def __init__(self, server_path: Path, model_path: Path, threads: int = 4,
+                 host: str = "127.0.0.1", startup_timeout: float = 120):
+        self.server_path = Path(server_path)
+        self.model_path = Path(model_path)
+        self.threads = threads
+        self.host = host
+        self.startup_timeout = startup_timeout
+
+        self.process: Optional[subprocess.Popen] = None
+        self.port: Optional[int] = None
+        self.restarts = 0
+        self.jobs_completed = 0
+        self.pending = 0
+        self.started_at: Optional[float] = None
+        self.last_used: Optional[float] = None
+        # Set once the pool drops this worker; it must never start a process again
+        self.retired = False
+
+        # whisper-server serializes inference internally; this lock keeps
+        # our own bookkeeping and restarts consistent as well
+        self.lock = threading.Lock()
+        self._stderr_tail = deque(maxlen=50)
+        # Receives percent updates for the job currently being served
+        self._progress_callback: Optional[Callable[[float], None]] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def is_alive(self) -> bool:
+        """Check if the server process is still running"""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Launch the server process and wait until the model is loaded"""
+        self.port = _find_free_port(self.host)
+        cmd = [
+            str(self.server_path),
+            "-m", str(self.model_path),
+            "--host", self.host,
+            "--port", str(self.port),
+            "-t", str(self.threads),
+            "-pp",  # Progress lines on stderr, forwarded to the running job
+        ]
+        logger.info(f"Starting whisper.cpp worker: {' '.join(cmd)}")
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._drain_stderr, args=(self.process,), daemon=True).start()
+        self._wait_until_ready()
+        self.started_at = time.time()
+        logger.info(f"whisper.cpp worker ready on port {self.port} (model {self.model_path.name})")
+
+    def _drain_stderr(self, process: subprocess.Popen):
+        """Keep the stderr pipe empty, forward progress and remember the last lines for diagnostics"""
+        try:
+            for line in process.stderr:
+                match = PROGRESS_LINE.search(line)
+                if match:
+                    callback = self._progress_callback
+                    if callback:
+                        try:
+                            callback(float(match.group(1)))
+                        except Exception as e:
+                            logger.error(f"Progress callback failed: {e}")
+                    continue
+                self._stderr_tail.append(line.rstrip())
+        except Exception:
+            pass
+
+    def _wait_until_ready(self):
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if not self.is_alive():
+                raise WhisperServerError(
+                    f"whisper.cpp worker exited during startup: {' | '.join(list(self._stderr_tail)[-5:])}"
+                )
+            try:
+                resp = requests.get(f"{self.base_url}/health", timeout=2)
+                if resp.status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise WhisperServerError("whisper.cpp worker did not become ready in time")
+
+    def _check_not_retired(self):
+        if self.retired:
+            raise WhisperServerError(f"whisper.cpp worker for {self.model_path.name} was stopped")
+
+    def ensure_running(self):
+        """Start the process if it never ran, restart it if it crashed"""
+        if self.is_alive():
+            return
+        self._check_not_retired()
+        if self.process is not None:
+            self.restarts += 1
+            logger.warning(
+                f"whisper.cpp worker for {self.model_path.name} is not running "
+                f"(exit code {self.process.returncode}), restarting"
+            )
+        self.start()
+
+    def restart(self):
+        self.stop()
+        self._check_not_retired()
+        self.restarts += 1
+        self.start()
+
+    def retire(self):
+        """
+        Stop the process for good. A job running on it fails instead of
+        restarting a process the pool no longer tracks.
+        """
+        self.retired = True
+        # Terminating first makes a running job fail fast rather than waiting for it
+        self.stop()
+        with self.lock:
+            # Catches a restart that was already past its retired check
+            self.stop()
+
+    def stop(self):
+        """Terminate the server process"""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def transcribe(self, audio: Union[str, bytes], language: Optional[str] = None,
+                   timeout: float = 600,
+                   progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """
+        Send one audio clip to the warm server and return its JSON response
+
+        Args:
+            audio: Path to a WAV file, or in-memory WAV bytes
+            language: Language code or None for the server default
+            progress_callback: Called with the percent done as the server reports it
+        """
+        with self.lock:
+            self.ensure_running()
+            self._progress_callback = progress_callback
+            try:
+                # The server was started with -t threads; hold that many while it decodes
+                with get_compute_scheduler().threads('whisper-server', self.threads, self.threads):
+                    return self._post_inference(audio, language, timeout)
+            finally:
+                self._progress_callback = None
+
+    def _post_inference(self, audio: Union[str, bytes], language: Optional[str],
+                        timeout: float) -> Dict[str, Any]:
+        data = {"response_format": "verbose_json"}
+        if language and language != 'auto':
+            data["language"] = language
+        if isinstance(audio, (bytes, bytearray)):
+            resp = requests.post(
+                f"{self.base_url}/inference",
+                files={"file": ("audio.wav", audio, "audio/wav")},
+                data=data,
+                timeout=timeout,
+            )
+        else:
+            with open(audio, 'rb') as audio_file:
+                resp = requests.post(
+                    f"{self.base_url}/inference",
+                    files={"file": (os.path.basename(audio), audio_file, "audio/wav")},
+                    data=data,
+                    timeout=timeout,
+                )
+        self.last_used = time.time()
+        if resp.status_code != 200:
+            raise WhisperServerError(f"whisper.cpp worker returned HTTP {resp.status_code}: {resp.text[:200]}")
+        result = resp.json()
+        if "error" in result:
+            raise WhisperServerError(result["error"])
+        self.jobs_completed += 1
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "pid": self.process.pid if self.process else None,
+            "port": self.port,
+            "alive": self.is_alive(),
+            "busy": self.lock.locked(),
+            "pending": self.pending,
+            "restarts": self.restarts,
+            "jobs_completed": self.jobs_completed,
+            "started_at": self.started_at,
+            "last_used": self.last_used,
+        }
+
+
+class WhisperServerPool:
+    """Pool of warm whisper.cpp workers, grouped by model file"""
+
+    def __init__(self, server_path: Path, threads: int = 4, workers_per_model: int = 1,
+                 request_timeout: float = 600):
+        self.server_path = Path(server_path)
+        self.threads = threads
+        self.workers_per_model = max(1, workers_per_model)
+        self.request_timeout = request_timeout
+        self._workers: Dict[str, List[WhisperServerWorker]] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def is_available(self) -> bool:
+        return self.server_path.exists()
+
+    @staticmethod
+    def registry_name(model_path: Path) -> str:
+        """Name of a model's workers in the residency registry"""
+        return f"whisper:{Path(model_path).name}"
+
+    def _get_workers(self, model_path: Path) -> List[WhisperServerWorker]:
+        key = str(Path(model_path).resolve())
+        with self._lock:
+            workers = self._workers.get(key)
+        if workers is not None:
+            return workers
+
+        registry = get_model_registry()
+        name = self.registry_name(model_path)
+        try:
+            # Each worker maps the whole model file
+            estimate = os.path.getsize(model_path) * self.workers_per_model
+        except OSError:
+            estimate = 0
+        registry.reserve(name, estimate)
+        with self._lock:
+            if key not in self._workers:
+                self._workers[key] = [
+                    WhisperServerWorker(self.server_path, Path(model_path), threads=self.threads)
+                    for _ in range(self.workers_per_model)
+                ]
+                worker_list = self._workers[key]
+                registry.register(
+                    name, 'whisper.cpp',
+                    unload=lambda: self.stop_model(model_path),
+                    size_bytes=estimate,
+                    size_func=lambda: sum(
+                        process_rss_bytes(w.process.pid) for w in worker_list if w.is_alive()
+                    ) or estimate,
+                )
+            return self._workers[key]
+
+    def _acquire_worker(self, model_path: Path) -> WhisperServerWorker:
+        """Pick the least loaded worker for the model and reserve a slot on it"""
+        workers = self._get_workers(model_path)
+        with self._lock:
+            worker = min(workers, key=lambda w: w.pending)
+            worker.pending += 1
+        return worker
+
+    def _release_worker(self, worker: WhisperServerWorker):
+        with self._lock:
+            worker.pending -= 1
+
+    def transcribe(self, model_path: Path, audio: Union[str, bytes],
+                   language: Optional[str] = None,
+                   progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """Dispatch a job to a warm worker, restarting it once if it crashed"""
+        # Keep the model's workers resident while this job runs
+        with get_model_registry().use(self.registry_name(model_path)):
+            return self._transcribe(model_path, audio, language, progress_callback)
+
+    def _transcribe(self, model_path: Path, audio: Union[str, bytes],
+                    language: Optional[str],
+                    progress_callback: Optional[Callable[[float], None]]) -> Dict[str, Any]:
+        worker = self._acquire_worker(model_path)
+        try:
+            try:
+                return worker.transcribe(audio, language, timeout=self.request_timeout,
+                                         progress_callback=progress_callback)
+            except requests.ConnectionError:
+                logger.warning(f"Lost connection to whisper.cpp worker on port {worker.port}, retrying")
+                with worker.lock:
+                    worker.restart()
+                try:
+                    return worker.transcribe(audio, language, timeout=self.request_timeout,
+                                             progress_callback=progress_callback)
+                except requests.ConnectionError as e:
+                    raise WhisperServerError(f"whisper.cpp worker crashed twice on this job: {e}")
+        except requests.Timeout:
+            # A timed out worker is still busy with the job; recycle it so the
+            # next request does not queue behind it
+            with worker.lock:
+                worker.restart()
+            raise WhisperServerError("Transcription timed out")
+        finally:
+            self._release_worker(worker)
+
+    def queue_depth(self, model_path: Optional[Path] = None) -> int:
+        """Number of jobs waiting or running, for one model or for the whole pool"""
+        with self._lock:
+            if model_path is not None:
+                key = str(Path(model_path).resolve())
+                return sum(w.pending for w in self._workers.get(key, []))
+            return sum(w.pending for workers in self._workers.values() for w in workers)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {
+                Path(key).name: {
+                    "queue_depth": sum(w.pending for w in workers),
+                    "workers": [w.get_status() for w in workers],
+                }
+                for key, workers in self._workers.items()
+            }
+        return {
+            "server_path": str(self.server_path),
+            "available": self.is_available(),
+            "threads_per_worker": self.threads,
+            "workers_per_model": self.workers_per_model,
+            "queue_depth": sum(m["queue_depth"] for m in models.values()),
+            "models": models,
+        }
+
+    def stop_model(self, model_path: Path):
+        """Stop the workers serving a model (e.g. after the model file was deleted)"""
+        key = str(Path(model_path).resolve())
+        with self._lock:
+            workers = self._workers.pop(key, [])
+        get_model_registry().unregister(self.registry_name(model_path))
+        for worker in workers:
+            worker.retire()
+
+    def shutdown(self):
+        with self._lock:
+            workers = [w for ws in self._workers.values() for w in ws]
+            self._workers = {}
+        for worker in workers:
+            worker.retire()
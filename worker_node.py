@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+WhisPad worker node
+Slim HTTP entry point for extra CPU boxes. It loads only whisper.cpp and
+SenseVoice (no database, users or notes) and transcribes decoded PCM sent by
+the web tier's "remote" provider, streaming progress and the result back as
+newline-delimited JSON.
+
+    GET  /health      load, capacity and the engines/models this node serves
+    POST /transcribe  raw 16 kHz mono PCM body (s16le, or f32le with ?format=f32)
+"""
+
+import os
+import sys
+import hmac
+import json
+import queue
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+from flask import Flask, Response, jsonify, request
+
+from audio_decode import pcm_from_bytes
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENGINES = ('local', 'sensevoice')
+
+
+class NodeState:
+    """Admission control: a node runs at most `capacity` transcriptions at once"""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.active >= self.capacity:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self, success: bool):
+        with self._lock:
+            self.active -= 1
+            if success:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "node": self.name,
+                "active": self.active,
+                "capacity": self.capacity,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+
+def create_app(engines=None, name: Optional[str] = None, capacity: Optional[int] = None,
+               token: Optional[str] = None, allow_anonymous: Optional[bool] = None) -> Flask:
+    """
+    Build the worker node app.
+
+    Args:
+        engines: object with transcribe(), available() and whisper_models()
+            (defaults to inference_server.LocalEngines)
+        name: node name reported to the web tier (default: WORKER_NODE_NAME or hostname)
+        capacity: concurrent transcriptions (default: WORKER_NODE_CAPACITY)
+        token: shared secret expected as a Bearer token (default: WORKER_NODE_TOKEN)
+        allow_anonymous: serve without a token (default: WORKER_NODE_ALLOW_ANONYMOUS)
+
+    Raises:
+        ValueError: when no token is set and anonymous access was not allowed
+    """
+    if engines is None:
+        from inference_server import LocalEngines
+        engines = LocalEngines()
+    name = name or os.getenv('WORKER_NODE_NAME') or os.uname().nodename
+    capacity = capacity or int(os.getenv('WORKER_NODE_CAPACITY', '2'))
+    token = token if token is not None else os.getenv('WORKER_NODE_TOKEN', '')
+    if allow_anonymous is None:
+        allow_anonymous = os.getenv('WORKER_NODE_ALLOW_ANONYMOUS', 'false').lower() == 'true'
+    if not token and not allow_anonymous:
+        raise ValueError("WORKER_NODE_TOKEN is not set; set it (and REMOTE_WORKER_TOKEN on the web tier) "
+                         "or WORKER_NODE_ALLOW_ANONYMOUS=true on a trusted network")
+    models_dir = os.path.join(os.getcwd(), 'whisper-cpp-models')
+    state = NodeState(name, capacity)
+    app = Flask(__name__)
+
+    def authorized() -> bool:
+        if not token:
+            return True
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        if not authorized():
+            return jsonify({"error": "Unauthorized"}), 401
+        stats = state.get_stats()
+        stats.update(status="ok", engines=engines.available(), models=engines.whisper_models())
+        return jsonify(stats)
+
+    @app.route('/transcribe', methods=['POST'])
+    def transcribe():
+        if not authorized():
+            return jsonify({"error": "Unauthorized"}), 401
+        engine = request.args.get('engine', 'sensevoice')
+        if engine not in ENGINES:
+            return jsonify({"error": f"Unknown engine: {engine}"}), 400
+        model_path = None
+        if engine == 'local':
+            model = os.path.basename(request.args.get('model') or '')
+            if model not in engines.whisper_models():
+                return jsonify({"error": f"Model {model} not available on {name}"}), 404
+            model_path = os.path.join(models_dir, model)
+        try:
+            pcm = pcm_from_bytes(request.get_data(), request.args.get('format', 's16'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not state.try_acquire():
+            return jsonify({"error": f"{name} is at capacity"}), 503, {'Retry-After': '1'}
+
+        flag = lambda key: request.args.get(key, 'true').lower() == 'true'
+        kwargs = dict(language=request.args.get('language') or None, model_path=model_path,
+                      detect_emotion=flag('detect_emotion'), detect_events=flag('detect_events'),
+                      use_itn=flag('use_itn'))
+        events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+
+        def run():
+            # The slot is held until the engine finishes, even if the client went away
+            result = {"success": False}
+            try:
+                result = engines.transcribe(pcm, engine, progress_callback=lambda p: events.put({"progress": p}),
+                                            **kwargs)
+            except Exception as e:
+                logger.error(f"Transcription failed on {name}: {e}")
+                result = {"success": False, "error": str(e)}
+            finally:
+                state.release(bool(result.get('success')))
+                events.put({"result": result})
+
+        threading.Thread(target=run, daemon=True).start()
+
+        def generate():
+            while True:
+                event = events.get()
+                yield json.dumps(event) + '\n'
+                if 'result' in event:
+                    return
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    return app
+
+
+def main():
+    try:
+        app = create_app()
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    port = int(os.getenv('WORKER_NODE_PORT', '8100'))
+    logger.info(f"Worker node listening on port {port}")
+    app.run(host=os.getenv('WORKER_NODE_HOST', '0.0.0.0'), port=port, threaded=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())